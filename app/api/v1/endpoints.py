@@ -1,17 +1,40 @@
 import asyncio
-import json
+import time
 import uuid
-from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect, Body
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect, Body
+from fastapi.responses import Response, StreamingResponse
+from starlette.background import BackgroundTask
 from typing import Dict, Any, AsyncGenerator
 from starlette.websockets import WebSocketState
 
 from langchain_core.messages import HumanMessage
+from pydantic import ValidationError
 
-from app.graph import app_graph
+from app.graph import get_app_graph, get_graph_fingerprint
+from app.graph.artifacts import artifact_store
+from app.core.config import settings
+from app.core.metrics import render_metrics
+from app.graph.jobs import Job, QueueFull, job_queue
+from app.graph.llm_cache import llm_call_cache
+from app.graph.router import router as fast_path_router
+from app.graph.runs import RunCancelled, run_registry
+from app.graph.threads import thread_expiry
+from .limits import AdmissionRejected, acquire_run_slot, admission, client_key, rate_limit, rate_limiter
+from .response_cache import ToolUseRecorder, cache_headers, replay_events, response_cache
+from .serialization import WIRE_FORMATS, SerializedJSONResponse, decode, dumps, encode
+from .streaming import format_sse, stream_graph_events
 from .schemas import (
     InvocationRequest,
     StreamRequest,
+    WebSocketRunRequest,
+    WebSocketCancelRequest,
+    InterruptRequest,
+    InterruptResponse,
+    RunInfo,
+    JobRequest,
+    JobInfo,
+    JobResult,
+    AdmissionStats,
     ThreadStateResponse,
     GraphOutput,
     HealthResponse,
@@ -21,7 +44,9 @@ from .schemas import (
 router = APIRouter()
 
 def _get_thread_id(request_thread_id: str | None) -> str:
-    return request_thread_id or str(uuid.uuid4())
+    thread_id = request_thread_id or str(uuid.uuid4())
+    thread_expiry.touch(thread_id)
+    return thread_id
 
 def _prepare_graph_input(api_input: Dict[str, Any]) -> Dict[str, Any]:
     if "messages" in api_input:
@@ -33,69 +58,233 @@ def _prepare_graph_input(api_input: Dict[str, Any]) -> Dict[str, Any]:
         return {"messages": [HumanMessage(content=input_str)], "input": input_str}
     raise HTTPException(status_code=400, detail="Invalid input. Must contain 'messages' or 'input' field.")
 
+def _cache_key(request: InvocationRequest, graph_input: Dict[str, Any]) -> str | None:
+    if not request.cache or request.thread_id or not response_cache.enabled:
+        return None
+    return response_cache.key(graph_input, get_graph_fingerprint())
 
-@router.post("/invocations", response_model=GraphOutput)
+def _record_tools(config: Dict[str, Any], cache_key: str | None) -> ToolUseRecorder | None:
+    """For a run whose answer is cached, record the tools it calls; they decide the cache TTL."""
+    if not cache_key:
+        return None
+    recorder = ToolUseRecorder()
+    config["callbacks"] = [recorder]
+    return recorder
+
+def _cache_status_headers(request: InvocationRequest, cache_key: str | None) -> Dict[str, str] | None:
+    if cache_key:
+        return cache_headers("MISS")
+    return cache_headers("BYPASS") if request.cache else None
+
+@router.post("/invocations", response_model=GraphOutput, dependencies=[Depends(rate_limit)])
 async def invoke_agent(request: InvocationRequest):
     thread_id = _get_thread_id(request.thread_id)
     config = {"configurable": {"thread_id": thread_id}}
     graph_input = _prepare_graph_input(request.input)
+    cache_key = _cache_key(request, graph_input)
+    if cache_key and (cached := response_cache.get(cache_key)):
+        return SerializedJSONResponse({"final_state": cached.final_state}, headers=cache_headers("HIT", cached))
+    release = await acquire_run_slot()
+    tools_used = _record_tools(config, cache_key)
     try:
-        result = await app_graph.ainvoke(graph_input, config=config)
-        return GraphOutput(final_state=result)
+        result = await run_registry.run(get_app_graph().ainvoke(graph_input, config=config), thread_id, "invoke")
+        if cache_key:
+            response_cache.put(cache_key, result, tools_used.tool_names)
+        return SerializedJSONResponse({"final_state": result}, headers=_cache_status_headers(request, cache_key))
+    except RunCancelled as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except Exception as e:
         print(f"Error during agent invocation for thread {thread_id}: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        release()
 
-@router.post("/stream") # SSE Streaming
+@router.post("/stream", dependencies=[Depends(rate_limit)]) # SSE Streaming
 async def stream_agent_sse(request: StreamRequest):
     thread_id = _get_thread_id(request.thread_id)
     config = {"configurable": {"thread_id": thread_id}}
     graph_input = _prepare_graph_input(request.input)
+    cache_key = _cache_key(request, graph_input)
+    if cache_key and (cached := response_cache.get(cache_key)):
+        replay = (format_sse(event, data) for event, data in replay_events(cached, request.events))
+        return StreamingResponse(replay, media_type="text/event-stream", headers=cache_headers("HIT", cached))
+    # Held until the stream ends; the background task covers responses that never start streaming.
+    release = await acquire_run_slot()
+    tools_used = _record_tools(config, cache_key)
 
-    async def event_generator() -> AsyncGenerator[str, None]:
+    async def event_generator() -> AsyncGenerator[bytes, None]:
         try:
-            async for event in app_graph.astream_events(graph_input, config=config, version="v1"):
-                yield f"event: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
-                await asyncio.sleep(0.01)
+            async for event, data in stream_graph_events(
+                get_app_graph(),
+                graph_input,
+                config,
+                events=request.events,
+                include_names=request.include_names,
+                coalesce_ms=request.coalesce_ms,
+            ):
+                yield format_sse(event, data)
+            if cache_key:
+                response_cache.put(cache_key, (await get_app_graph().aget_state(config)).values, tools_used.tool_names)
+        except RunCancelled:
+            yield format_sse("cancelled", {"thread_id": thread_id})
         except Exception as e:
             print(f"Error during SSE streaming for thread {thread_id}: {e}")
-            error_event = {"event": "error", "data": {"detail": str(e)}}
-            yield f"event: {error_event['event']}\ndata: {json.dumps(error_event['data'])}\n\n"
+            yield format_sse("error", {"detail": str(e)})
+        finally:
+            release()
 
-    return StreamingResponse(event_generator(), media_type="text/event-stream")
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        headers=_cache_status_headers(request, cache_key),
+        background=BackgroundTask(release),
+    )
+
+class _WebSocketSession:
+    """
+    Runs of one multiplexed WebSocket connection. Every run is its own task and
+    tags its events with the request id; sends are serialized with a lock.
+    """
+
+    def __init__(self, websocket: WebSocket, wire_format: str):
+        self.websocket = websocket
+        self.wire_format = wire_format
+        self.client = client_key(websocket)
+        self.runs: Dict[str, asyncio.Task] = {}
+        self.run_threads: Dict[str, str] = {}
+        # Used by runs that do not name a thread, so a plain client keeps one conversation.
+        self.default_thread_id: str | None = None
+        self._send_lock = asyncio.Lock()
+
+    async def send(self, request_id: str | None, event: str, data: Any) -> None:
+        frame = encode({"id": request_id, "event": event, "data": data}, self.wire_format)
+        async with self._send_lock:
+            if self.wire_format == "msgpack":
+                await self.websocket.send_bytes(frame)
+            else:
+                await self.websocket.send_text(frame.decode())
+
+    async def handle(self, payload: Any) -> None:
+        if not isinstance(payload, dict):
+            raise ValueError("Messages must be objects with a 'type' of 'run' or 'cancel'.")
+        if payload.get("type") == "cancel":
+            request = WebSocketCancelRequest.model_validate(payload)
+            task = self.runs.get(request.id)
+            if task is None:
+                await self.send(request.id, "error", {"detail": f"No active run with id '{request.id}'."})
+            else:
+                task.cancel()
+            return
+
+        request = WebSocketRunRequest.model_validate(payload)
+        request_id = request.id or str(uuid.uuid4())
+        retry_after = rate_limiter.check(self.client)
+        if retry_after:
+            await self.send(request_id, "error", {"detail": "Rate limit exceeded.", "retry_after": retry_after})
+            return
+        if request_id in self.runs:
+            await self.send(request_id, "error", {"detail": f"Run id '{request_id}' is already active."})
+            return
+        if len(self.runs) >= settings.ws_max_concurrent_runs:
+            await self.send(request_id, "error", {"detail": f"Too many concurrent runs (max {settings.ws_max_concurrent_runs})."})
+            return
+        if request.cache and request.thread_id is None:
+            # Cacheable questions are answered on a fresh thread, as over HTTP.
+            thread_id = _get_thread_id(None)
+        else:
+            if request.thread_id is None:
+                self.default_thread_id = self.default_thread_id or str(uuid.uuid4())
+            thread_id = _get_thread_id(request.thread_id or self.default_thread_id)
+        if thread_id in self.run_threads.values():
+            await self.send(request_id, "error", {"detail": f"Thread '{thread_id}' already has an active run."})
+            return
+        graph_input = _prepare_graph_input(request.input)
+        self.run_threads[request_id] = thread_id
+        self.runs[request_id] = asyncio.create_task(self._run(request_id, thread_id, graph_input, request))
+
+    async def _run(self, request_id: str, thread_id: str, graph_input: Dict[str, Any], request: WebSocketRunRequest) -> None:
+        config = {"configurable": {"thread_id": thread_id}}
+        cache_key = _cache_key(request, graph_input)
+        admitted = False
+        try:
+            if cache_key and (cached := response_cache.get(cache_key)):
+                await self.send(request_id, "run_start", {"thread_id": thread_id, "cached": True})
+                for event, data in replay_events(cached, request.events):
+                    await self.send(request_id, event, data)
+                await self.send(request_id, "run_end", {"thread_id": thread_id})
+                return
+            await admission.acquire()
+            admitted = True
+            tools_used = _record_tools(config, cache_key)
+            await self.send(request_id, "run_start", {"thread_id": thread_id})
+            async for event, data in stream_graph_events(
+                get_app_graph(),
+                graph_input,
+                config,
+                events=request.events,
+                include_names=request.include_names,
+                coalesce_ms=request.coalesce_ms,
+                run_kind="ws",
+            ):
+                await self.send(request_id, event, data)
+            if cache_key:
+                response_cache.put(cache_key, (await get_app_graph().aget_state(config)).values, tools_used.tool_names)
+            await self.send(request_id, "run_end", {"thread_id": thread_id})
+        except (asyncio.CancelledError, RunCancelled):
+            if self.websocket.client_state == WebSocketState.CONNECTED:
+                await self.send(request_id, "cancelled", {"thread_id": thread_id})
+        except AdmissionRejected as e:
+            await self.send(request_id, "error", {"detail": str(e)})
+        except Exception as e:
+            print(f"WebSocket run {request_id} failed for thread_id: {thread_id}: {e}")
+            if self.websocket.client_state == WebSocketState.CONNECTED:
+                await self.send(request_id, "error", {"detail": str(e)})
+        finally:
+            if admitted:
+                admission.release()
+            self.runs.pop(request_id, None)
+            self.run_threads.pop(request_id, None)
+
+    async def close(self) -> None:
+        for task in self.runs.values():
+            task.cancel()
+        await asyncio.gather(*self.runs.values(), return_exceptions=True)
 
 @router.websocket("/ws/stream")
 async def websocket_stream_agent(websocket: WebSocket):
+    # ?format=msgpack switches both directions to binary MessagePack frames
+    wire_format = websocket.query_params.get("format", "json")
+    if wire_format not in WIRE_FORMATS:
+        await websocket.close(code=1003, reason=f"Unsupported format: {wire_format}")
+        return
+    if rate_limiter.check(client_key(websocket)):
+        await websocket.close(code=1008, reason="Rate limit exceeded.")
+        return
     await websocket.accept()
-    ws_thread_id: str | None = None
+    session = _WebSocketSession(websocket, wire_format)
 
     try:
         while True:
-            data = await websocket.receive_text()
-            payload = json.loads(data)
-            
-            api_input = payload.get("input", {})
-            request_thread_id = payload.get("thread_id")
-
-            if ws_thread_id is None:
-                ws_thread_id = _get_thread_id(request_thread_id)
-            elif request_thread_id and request_thread_id != ws_thread_id:
-                await websocket.send_json({"event": "error", "data": {"detail": "Thread ID cannot be changed mid-session."}})
-                continue
-            
-            current_config = {"configurable": {"thread_id": ws_thread_id}}
-            graph_input = _prepare_graph_input(api_input)
-
-            async for event in app_graph.astream_events(graph_input, config=current_config, version="v1"):
-                await websocket.send_json(event)
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            payload = None
+            try:
+                payload = decode(message.get("bytes") or message.get("text"), wire_format)
+                await session.handle(payload)
+            except (ValueError, ValidationError, HTTPException) as e:
+                request_id = payload.get("id") if isinstance(payload, dict) else None
+                detail = e.detail if isinstance(e, HTTPException) else str(e)
+                await session.send(request_id, "error", {"detail": detail})
 
     except WebSocketDisconnect:
-        print(f"WebSocket disconnected for thread_id: {ws_thread_id}")
+        print(f"WebSocket disconnected ({len(session.runs)} active runs cancelled)")
     except Exception as e:
-        print(f"WebSocket error for thread_id: {ws_thread_id}: {e}")
+        print(f"WebSocket error: {e}")
         if websocket.client_state == WebSocketState.CONNECTED:
-            await websocket.send_json({"event": "error", "data": {"detail": str(e)}})
+            await session.send(None, "error", {"detail": str(e)})
     finally:
+        await session.close()
         if websocket.client_state == WebSocketState.CONNECTED:
              await websocket.close()
 
@@ -103,18 +292,209 @@ async def websocket_stream_agent(websocket: WebSocket):
 async def get_thread_state(thread_id_path: str):
     config = {"configurable": {"thread_id": thread_id_path}}
     try:
-        graph_state = await app_graph.aget_state(config)
+        graph_state = await get_app_graph().aget_state(config)
         if graph_state is None:
              raise HTTPException(status_code=404, detail=f"Thread '{thread_id_path}' not found.")
-        return ThreadStateResponse(thread_id=thread_id_path, values=graph_state.values)
+        return SerializedJSONResponse({"thread_id": thread_id_path, "values": graph_state.values})
     except Exception as e:
         print(f"Error getting state for thread {thread_id_path}: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.post("/threads/{thread_id_path}/interrupt")
-async def interrupt_thread(thread_id_path: str, command_data: Dict[str, Any] = Body(...)):
-    print(f"Received interrupt for thread_id: {thread_id_path} with command: {command_data}")
-    return {"thread_id": thread_id_path, "status": "interrupt_received", "detail": "Interrupt handling is a placeholder."}
+@router.post("/threads/{thread_id_path}/interrupt", response_model=InterruptResponse)
+async def interrupt_thread(thread_id_path: str, request: InterruptRequest = Body(...)):
+    """
+    "cancel" stops the active runs of the thread (or only `run_id`) on this worker.
+    "resume" continues the thread with a LangGraph Command(resume, update, goto).
+    """
+    if request.action == "cancel":
+        cancelled = run_registry.cancel(thread_id_path, request.run_id)
+        return InterruptResponse(
+            thread_id=thread_id_path,
+            status="cancelled" if cancelled else "no_active_runs",
+            cancelled_runs=[run.run_id for run in cancelled],
+        )
+
+    if run_registry.list(thread_id_path):
+        raise HTTPException(status_code=409, detail=f"Thread '{thread_id_path}' has an active run; cancel it before resuming.")
+    thread_expiry.touch(thread_id_path)
+    config = {"configurable": {"thread_id": thread_id_path}}
+    from langgraph.types import Command
+
+    command = Command(resume=request.resume, update=request.update, goto=request.goto or ())
+    release = await acquire_run_slot()
+    try:
+        result = await run_registry.run(get_app_graph().ainvoke(command, config=config), thread_id_path, "resume")
+        return SerializedJSONResponse({"thread_id": thread_id_path, "status": "resumed", "final_state": result})
+    except RunCancelled as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        print(f"Error resuming thread {thread_id_path}: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        release()
+
+@router.get("/runs", response_model=list[RunInfo])
+async def list_runs(thread_id: str | None = None):
+    """Active runs on this worker, longest-running first."""
+    runs = sorted(run_registry.list(thread_id), key=lambda run: run.elapsed, reverse=True)
+    return [RunInfo(**run.info()) for run in runs]
+
+async def _run_job(job: Job) -> Dict[str, Any]:
+    config = {"configurable": {"thread_id": job.thread_id}}
+    graph = get_app_graph()
+    if not job.events:
+        return await graph.ainvoke(job.graph_input, config=config)
+    async for event, data in stream_graph_events(
+        graph, job.graph_input, config, events=job.events, include_names=job.include_names, run_kind="job",
+        # The job queue registers the job's task; cancelling it also stops this stream.
+        register_run=False,
+    ):
+        await job_queue.record_event(job, event, data)
+    return (await graph.aget_state(config)).values
+
+def _get_job(job_id: str) -> Job:
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found (unknown or expired).")
+    return job
+
+async def _get_stored_job(job_id: str) -> tuple:
+    """(info, encoded result) of a job from the shared job store, for jobs run by another worker."""
+    stored = await job_queue.store.load(job_id) if job_queue.store is not None else None
+    if stored is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found (unknown or expired).")
+    return stored
+
+def _is_done(info: Dict[str, Any]) -> bool:
+    return info["status"] in ("succeeded", "failed", "cancelled")
+
+@router.post("/jobs", response_model=JobInfo, status_code=202, dependencies=[Depends(rate_limit)])
+async def submit_job(request: JobRequest):
+    """Queue a graph run and return immediately; poll GET /jobs/{job_id} or stream its events."""
+    if settings.web_concurrency > 1 and job_queue.store is None:
+        # Without a shared store only the accepting worker could answer for the job.
+        raise HTTPException(status_code=503, detail="/jobs with WEB_CONCURRENCY > 1 needs JOB_STORE_SQLITE_PATH.")
+    job = Job(
+        thread_id=_get_thread_id(request.thread_id),
+        graph_input=_prepare_graph_input(request.input),
+        priority=request.priority,
+        events=request.events,
+        include_names=request.include_names,
+    )
+    job_queue.start(_run_job, encode=dumps)
+    try:
+        await job_queue.submit(job)
+    except QueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    return JobInfo(**job.info())
+
+@router.get("/jobs/{job_id}", response_model=JobResult)
+async def get_job(job_id: str):
+    job = job_queue.get(job_id)
+    if job is not None:
+        return SerializedJSONResponse({**job.info(), "result": job.result})
+    info, result = await _get_stored_job(job_id)
+    return SerializedJSONResponse({**info, "result": decode(result) if result is not None else None})
+
+@router.delete("/jobs/{job_id}", response_model=JobInfo)
+async def cancel_job(job_id: str):
+    job = job_queue.get(job_id)
+    if job is None:
+        return await _cancel_stored_job(job_id)
+    if not await job_queue.cancel(job):
+        raise HTTPException(status_code=409, detail=f"Job '{job_id}' already finished with status '{job.status}'.")
+    # A running job stops at its next await; give it a moment so the response shows the final status.
+    try:
+        async with job.changed:
+            await asyncio.wait_for(job.changed.wait_for(lambda: job.done), timeout=5)
+    except asyncio.TimeoutError:
+        pass
+    return JobInfo(**job.info())
+
+async def _cancel_stored_job(job_id: str) -> JobInfo:
+    """Ask the worker running the job to cancel it and wait up to 5s for it to finish."""
+    info, _ = await _get_stored_job(job_id)
+    if _is_done(info):
+        raise HTTPException(status_code=409, detail=f"Job '{job_id}' already finished with status '{info['status']}'.")
+    await job_queue.store.request_cancel(job_id)
+    deadline = time.monotonic() + 5
+    while not _is_done(info) and time.monotonic() < deadline:
+        await asyncio.sleep(job_queue.store.poll_interval)
+        info, _ = await _get_stored_job(job_id)
+    return JobInfo(**info)
+
+@router.get("/jobs/{job_id}/events")
+async def stream_job_events(job_id: str):
+    """SSE: replays the events recorded so far, follows the job and ends with a job_end event."""
+    job = job_queue.get(job_id)
+    if job is None:
+        await _get_stored_job(job_id)
+        return StreamingResponse(_stored_job_events(job_id), media_type="text/event-stream")
+
+    async def event_generator() -> AsyncGenerator[bytes, None]:
+        seen = 0 # events sent, counting ones dropped from the log
+        while True:
+            async with job.changed:
+                await job.changed.wait_for(lambda: job.dropped_events + len(job.event_log) > seen or job.done)
+            finished = job.done
+            pending = job.event_log[max(seen - job.dropped_events, 0):]
+            seen = job.dropped_events + len(job.event_log)
+            for event, data in pending:
+                yield format_sse(event, data)
+            if finished:
+                break
+        yield format_sse("job_end", {**job.info(), "result": job.result})
+
+    return StreamingResponse(event_generator(), media_type="text/event-stream")
+
+async def _stored_job_events(job_id: str) -> AsyncGenerator[bytes, None]:
+    """Same events as above for a job run by another worker, polled from the job store."""
+    seen = 0
+    while True:
+        stored = await job_queue.store.load(job_id)
+        # Read the status first: a job that was done before this read has all its events stored.
+        finished = stored is None or _is_done(stored[0])
+        for seq, event, data in await job_queue.store.events(job_id, seen):
+            yield format_sse(event, decode(data))
+            seen = seq + 1
+        if finished:
+            break
+        await asyncio.sleep(job_queue.store.poll_interval)
+    if stored is not None:
+        info, result = stored
+        yield format_sse("job_end", {**info, "result": decode(result) if result is not None else None})
+
+@router.get("/artifacts/{artifact_id}")
+async def get_artifact(artifact_id: str):
+    """A large tool output referenced from a stream event or a compacted message, with its content type."""
+    artifact = await artifact_store.aget(artifact_id)
+    if artifact is None:
+        raise HTTPException(status_code=404, detail=f"Artifact '{artifact_id}' not found or expired.")
+    content = artifact.content
+    if not isinstance(content, (bytes, str)):
+        # Compacted history keeps the message content itself
+        content = dumps(content)
+    # Artifacts never change; let the client cache them for their lifetime.
+    headers = {"Cache-Control": f"private, max-age={int(artifact_store.ttl)}"}
+    return Response(content=content, media_type=artifact.content_type, headers=headers)
+
+@router.get("/admission", response_model=AdmissionStats)
+async def admission_stats():
+    """Run slots, waiting requests, rate limiting and cache counters of this worker, for capacity sizing."""
+    return AdmissionStats(
+        admission=admission.stats(),
+        rate_limit=rate_limiter.stats(),
+        jobs=job_queue.stats(),
+        response_cache=response_cache.stats(),
+        llm_cache=llm_call_cache.stats(),
+        fast_path=fast_path_router.stats() if fast_path_router else None,
+    )
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics: node/LLM/tool latency, tokens, time to first token, in-flight runs, cache lookups."""
+    content, content_type = render_metrics()
+    return Response(content=content, media_type=content_type)
 
 @router.get("/health", response_model=HealthResponse)
 async def health_check():
@@ -0,0 +1,186 @@
+import asyncio
+import math
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Callable, Dict, Optional
+
+from fastapi import HTTPException, Request, WebSocket
+
+from app.core.config import settings
+from app.core.metrics import admission_queue_depth, rejected_requests
+
+
+class AdmissionRejected(Exception):
+    """No run slot became free within the wait timeout."""
+
+
+class AdmissionController:
+    """
+    Caps the number of graph runs executing at once in this worker. Callers wait up
+    to `wait_timeout` seconds for a slot (0: as long as it takes) and are rejected
+    after that, so bursts queue briefly instead of fanning out to the LLM and Grafana
+    all at once.
+    """
+
+    def __init__(self, max_in_flight: int, wait_timeout: float):
+        self.max_in_flight = max_in_flight
+        self.wait_timeout = wait_timeout
+        self._semaphore = asyncio.Semaphore(max_in_flight) if max_in_flight > 0 else None
+        self.in_flight = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+
+    async def acquire(self) -> None:
+        if self._semaphore is not None:
+            started = time.monotonic()
+            self.waiting += 1
+            admission_queue_depth.inc()
+            try:
+                if self.wait_timeout > 0:
+                    await asyncio.wait_for(self._semaphore.acquire(), timeout=self.wait_timeout)
+                else:
+                    # wait_for(timeout=0) times out even when a slot is free
+                    await self._semaphore.acquire()
+            except asyncio.TimeoutError:
+                self.rejected += 1
+                rejected_requests.labels("admission").inc()
+                raise AdmissionRejected(
+                    f"Server is at capacity ({self.max_in_flight} runs in flight); retry later."
+                ) from None
+            finally:
+                self.waiting -= 1
+                admission_queue_depth.dec()
+            self.total_wait += time.monotonic() - started
+        self.in_flight += 1
+        self.admitted += 1
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        if self._semaphore is not None:
+            self._semaphore.release()
+
+    @asynccontextmanager
+    async def slot(self):
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> dict:
+        return {
+            "max_in_flight": self.max_in_flight,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "avg_wait_seconds": round(self.total_wait / self.admitted, 4) if self.admitted else 0.0,
+        }
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated_at = time.monotonic()
+
+    def take(self) -> float:
+        """Take one token. Returns 0 on success, else the seconds until one is available."""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """
+    Token bucket per client (API key, or client address without one). `quotas`
+    overrides the per-minute rate for individual API keys. At most `max_clients`
+    buckets are kept; the least recently used one is dropped first.
+    """
+
+    def __init__(self, per_minute: float, burst: int, quotas: Optional[Dict[str, float]] = None, max_clients: int = 10000):
+        self.per_minute = per_minute
+        self.burst = burst
+        self.quotas = quotas or {}
+        self.max_clients = max_clients
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self.limited = 0
+
+    def check(self, client: str) -> float:
+        """Returns 0 when the request may proceed, else seconds to wait before retrying."""
+        per_minute = self.quotas.get(client, self.per_minute)
+        if per_minute <= 0:
+            return 0.0
+        bucket = self._buckets.get(client)
+        if bucket is None:
+            bucket = self._buckets[client] = TokenBucket(per_minute / 60, max(self.burst, 1))
+            while len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        self._buckets.move_to_end(client)
+        retry_after = bucket.take()
+        if retry_after:
+            self.limited += 1
+            rejected_requests.labels("rate_limit").inc()
+        return retry_after
+
+    def stats(self) -> dict:
+        return {"per_minute": self.per_minute, "burst": self.burst, "clients": len(self._buckets), "limited": self.limited}
+
+
+admission = AdmissionController(settings.max_in_flight_runs, settings.admission_wait_timeout)
+rate_limiter = RateLimiter(settings.rate_limit_per_minute, settings.rate_limit_burst, settings.api_key_quotas)
+
+
+def client_key(connection: Request | WebSocket) -> str:
+    """
+    The rate limit bucket of a caller: its API key when the key is configured in
+    API_KEY_QUOTAS, else its address. Unknown keys are ignored, so sending a new key
+    with every request does not get a new bucket.
+    """
+    api_key = connection.headers.get(settings.api_key_header)
+    if api_key and api_key in rate_limiter.quotas:
+        return api_key
+    return f"ip:{connection.client.host if connection.client else 'unknown'}"
+
+
+def rate_limit(request: Request) -> None:
+    """Dependency: 429 when the caller's token bucket is empty."""
+    retry_after = rate_limiter.check(client_key(request))
+    if retry_after:
+        raise HTTPException(
+            status_code=429,
+            detail="Rate limit exceeded.",
+            headers={"Retry-After": str(math.ceil(retry_after))},
+        )
+
+
+async def acquire_run_slot() -> Callable[[], None]:
+    """
+    Wait for a run slot, raising 503 after settings.admission_wait_timeout.
+    Returns a release function that is safe to call more than once.
+    """
+    try:
+        await admission.acquire()
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(math.ceil(admission.wait_timeout))},
+        )
+    released = False
+
+    def release() -> None:
+        nonlocal released
+        if not released:
+            released = True
+            admission.release()
+
+    return release
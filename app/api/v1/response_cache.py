@@ -0,0 +1,135 @@
+import fnmatch
+import hashlib
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import AIMessage, HumanMessage
+
+from app.core.config import settings
+from app.core.metrics import cache_lookups
+from .streaming import ToolOutputSplitter
+
+
+@dataclass
+class CachedResponse:
+    final_state: Dict[str, Any]
+    stored_at: float
+    expires_at: float
+
+    @property
+    def age(self) -> int:
+        return int(time.time() - self.stored_at)
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase, collapse whitespace and drop trailing punctuation."""
+    return " ".join(text.lower().split()).rstrip(" ?!.")
+
+
+class ResponseCache:
+    """
+    Final graph states of single-question runs, keyed by the normalized question and
+    the graph fingerprint (model, agents, tools, prompt).
+
+    Answers that used a time-sensitive tool (panel data, renders, queries) expire
+    after `volatile_ttl`; everything else after `ttl`. The tools a run used come from
+    a ToolUseRecorder: agent tool messages never reach the supervisor's final state.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, volatile_ttl: float, time_sensitive_tools: List[str]):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.volatile_ttl = volatile_ttl
+        self.time_sensitive_tools = time_sensitive_tools
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.maxsize > 0
+
+    def key(self, graph_input: Dict[str, Any], fingerprint: str) -> Optional[str]:
+        """Cache key for a graph input, or None if the input is not a single text question."""
+        messages = graph_input.get("messages", [])
+        if len(messages) != 1 or not isinstance(messages[0], HumanMessage) or not isinstance(messages[0].content, str):
+            return None
+        question = normalize_text(messages[0].content)
+        return hashlib.sha256(f"{fingerprint}\0{question}".encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at <= time.time():
+            del self._entries[key]
+            entry = None
+        if entry is None:
+            self.misses += 1
+            cache_lookups.labels("response", "miss").inc()
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        cache_lookups.labels("response", "hit").inc()
+        return entry
+
+    def put(self, key: str, final_state: Dict[str, Any], tool_names: Iterable[str] = ()) -> CachedResponse:
+        """Store the final state of a run that called `tool_names`."""
+        now = time.time()
+        ttl = self.volatile_ttl if self._any_time_sensitive(tool_names) else self.ttl
+        entry = CachedResponse(final_state=final_state, stored_at=now, expires_at=now + ttl)
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+        return entry
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
+
+    def _any_time_sensitive(self, tool_names: Iterable[str]) -> bool:
+        return any(
+            fnmatch.fnmatch(name, pattern) for name in tool_names for pattern in self.time_sensitive_tools
+        )
+
+
+class ToolUseRecorder(BaseCallbackHandler):
+    """Collects the names of the tools a run calls, in the agent subgraphs too."""
+
+    run_inline = True
+
+    def __init__(self):
+        self.tool_names: Set[str] = set()
+
+    def on_tool_start(self, serialized, input_str, **kwargs: Any) -> None:
+        name = kwargs.get("name") or (serialized or {}).get("name")
+        if name:
+            self.tool_names.add(name)
+
+
+def replay_events(entry: CachedResponse, events: Optional[List[str]]) -> List[Tuple[str, Any]]:
+    """Stream events for a cache hit: the answer as one token (if requested) and the final state."""
+    replay = []
+    if events and "tokens" in events:
+        answer = next((m for m in reversed(entry.final_state.get("messages", [])) if isinstance(m, AIMessage)), None)
+        if answer is not None:
+            replay.append(("token", {"agent": answer.name, "run_id": None, "content": answer.content}))
+    final_state = ToolOutputSplitter(settings.stream_max_inline_bytes).split(entry.final_state)
+    replay.append(("cache_hit", {"age": entry.age, "final_state": final_state}))
+    return replay
+
+
+def cache_headers(status: str, entry: Optional[CachedResponse] = None) -> Dict[str, str]:
+    headers = {"X-Cache": status}
+    if entry is not None:
+        headers["Age"] = str(entry.age)
+    return headers
+
+
+response_cache = ResponseCache(
+    maxsize=settings.response_cache_size,
+    ttl=settings.response_cache_ttl,
+    volatile_ttl=settings.response_cache_volatile_ttl,
+    time_sensitive_tools=settings.response_cache_time_sensitive_tools,
+)
@@ -1,33 +1,100 @@
 from pydantic import BaseModel, Field
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Literal, Optional, Union
 from langchain_core.messages import BaseMessage
 
 # Pydantic model for BaseMessage to allow serialization
 class MessageModel(BaseModel):
     type: str
-    content: str
-    # Add other common fields if needed, e.g., name for ToolMessage, tool_calls for AIMessage
+    # Plain text, or a list of content blocks (text, images, ...) for multimodal messages
+    content: Union[str, List[Union[str, Dict[str, Any]]]]
+    id: Optional[str] = None
     name: Optional[str] = None
     tool_calls: Optional[List[Dict[str, Any]]] = None 
     tool_call_id: Optional[str] = None # For ToolMessage
+    additional_kwargs: Optional[Dict[str, Any]] = None
 
     @classmethod
     def from_core_message(cls, message: BaseMessage) -> "MessageModel":
-        # A more robust conversion might be needed depending on message types
-        return cls(
+        return cls.model_construct(
             type=message.type,
-            content=str(message.content),
+            content=message.content,
+            id=message.id,
             name=getattr(message, 'name', None),
-            tool_calls=getattr(message, 'tool_calls', None),
-            tool_call_id=getattr(message, 'tool_call_id', None)
+            tool_calls=getattr(message, 'tool_calls', None) or None,
+            tool_call_id=getattr(message, 'tool_call_id', None),
+            additional_kwargs=message.additional_kwargs or None,
         )
 
 class InvocationRequest(BaseModel):
     input: Dict[str, Any] # Typically expects {"messages": [HumanMessage(...)]} or {"input": "user query"}
     thread_id: Optional[str] = None
+    # Opt in to the response cache (only single questions without a thread_id are cached)
+    cache: bool = False
 
 class StreamRequest(InvocationRequest):
-    pass
+    # Event kinds to stream; None streams every astream_events event unfiltered.
+    events: Optional[List[Literal["tokens", "updates", "tools"]]] = None
+    # Only events of these runs or graph nodes (e.g. "grafana_agent")
+    include_names: Optional[List[str]] = None
+    # Token chunks are merged over this window (defaults to settings.stream_coalesce_ms)
+    coalesce_ms: Optional[float] = Field(default=None, ge=0)
+
+class WebSocketRunRequest(StreamRequest):
+    type: Literal["run"] = "run"
+    # Client-chosen id echoed on every event of this run; generated if omitted
+    id: Optional[str] = None
+
+class WebSocketCancelRequest(BaseModel):
+    type: Literal["cancel"]
+    id: str
+
+class InterruptRequest(BaseModel):
+    action: Literal["cancel", "resume"] = "cancel"
+    run_id: Optional[str] = None # cancel only this run
+    # Command fields for "resume"
+    resume: Any = None
+    update: Optional[Dict[str, Any]] = None
+    goto: Optional[Union[str, List[str]]] = None
+
+class InterruptResponse(BaseModel):
+    thread_id: str
+    status: str
+    cancelled_runs: List[str] = Field(default_factory=list)
+    final_state: Optional[Dict[str, Any]] = None
+
+class RunInfo(BaseModel):
+    run_id: str
+    thread_id: str
+    kind: str
+    started_at: float
+    elapsed_seconds: float
+
+class JobRequest(InvocationRequest):
+    priority: int = 0 # higher runs first
+    # Record these stream events for GET /jobs/{job_id}/events (see StreamRequest)
+    events: Optional[List[Literal["tokens", "updates", "tools"]]] = None
+    include_names: Optional[List[str]] = None
+
+class JobInfo(BaseModel):
+    job_id: str
+    thread_id: str
+    status: Literal["queued", "running", "succeeded", "failed", "cancelled"]
+    priority: int
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    error: Optional[str] = None
+
+class JobResult(JobInfo):
+    result: Optional[Dict[str, Any]] = None # final state once the job succeeded
+
+class AdmissionStats(BaseModel):
+    admission: Dict[str, Any] # in_flight, waiting (queue length), admitted, rejected, ...
+    rate_limit: Dict[str, Any]
+    jobs: Dict[str, Any]
+    response_cache: Dict[str, Any]
+    llm_cache: Dict[str, Any]
+    fast_path: Optional[Dict[str, Any]] = None # routed per agent, fallbacks, llm_calls_saved (None when disabled)
 
 class ThreadStateResponse(BaseModel):
     thread_id: str
@@ -0,0 +1,72 @@
+import base64
+from typing import Any, Union
+
+import orjson
+import ormsgpack
+from fastapi.responses import JSONResponse
+from langchain_core.messages import BaseMessage
+from pydantic import BaseModel
+
+from .schemas import MessageModel
+
+WIRE_FORMATS = ("json", "msgpack")
+
+_JSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+# No OPT_SERIALIZE_PYDANTIC: it would pack messages field by field and bypass
+# _msgpack_default, so msgpack frames would differ from the JSON ones.
+_MSGPACK_OPTIONS = ormsgpack.OPT_NON_STR_KEYS
+
+
+def _default(value: Any) -> Any:
+    """
+    Convert the objects orjson/ormsgpack cannot encode natively. Called lazily for
+    unknown types only, and recursively on whatever it returns.
+    """
+    if isinstance(value, BaseMessage):
+        return MessageModel.from_core_message(value).model_dump(exclude_none=True)
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    if isinstance(value, bytes):
+        return base64.b64encode(value).decode("ascii")
+    return str(value)
+
+
+def _msgpack_default(value: Any) -> Any:
+    """Like _default, but bytes are left to ormsgpack, which packs them as binary."""
+    if isinstance(value, BaseMessage):
+        return MessageModel.from_core_message(value).model_dump(exclude_none=True)
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    return str(value)
+
+
+def dumps(value: Any) -> bytes:
+    """Encode graph state or stream event data as JSON."""
+    return orjson.dumps(value, default=_default, option=_JSON_OPTIONS)
+
+
+def packb(value: Any) -> bytes:
+    """Encode graph state or stream event data as MessagePack (bytes stay binary)."""
+    return ormsgpack.packb(value, default=_msgpack_default, option=_MSGPACK_OPTIONS)
+
+
+def encode(value: Any, wire_format: str = "json") -> bytes:
+    return packb(value) if wire_format == "msgpack" else dumps(value)
+
+
+def decode(data: Union[str, bytes], wire_format: str = "json") -> Any:
+    """Decode a client message; binary frames are MessagePack when wire_format is "msgpack"."""
+    if isinstance(data, bytes) and wire_format == "msgpack":
+        return ormsgpack.unpackb(data)
+    return orjson.loads(data)
+
+
+class SerializedJSONResponse(JSONResponse):
+    """JSONResponse that encodes LangChain messages and other state values with dumps()."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,287 @@
+import asyncio
+import base64
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from langchain_core.messages import ToolMessage
+
+from app.core.config import settings
+from app.core.metrics import time_to_first_token
+from app.graph.artifacts import ArtifactStore, artifact_store
+from app.graph.router import SUPERVISOR_NODE
+from app.graph.runs import RunCancelled, run_registry
+from .serialization import dumps
+
+# Event kinds a client can subscribe to, and the run types they need from astream_events.
+EVENT_KINDS = {
+    "tokens": "chat_model",
+    "updates": "chain",
+    "tools": "tool",
+}
+
+_DONE = object()
+
+
+def _event_path(event: Dict[str, Any]) -> List[str]:
+    """Names of the graph nodes the event is nested in, outermost first."""
+    metadata = event.get("metadata", {})
+    namespace = metadata.get("langgraph_checkpoint_ns") or metadata.get("checkpoint_ns") or ""
+    path = [part.split(":", 1)[0] for part in namespace.split("|") if part]
+    if not path and metadata.get("langgraph_node"):
+        path = [metadata["langgraph_node"]]
+    if len(path) > 1 and path[0] == SUPERVISOR_NODE:
+        # Behind the fast-path router: attribute events to the supervisor's agents.
+        path = path[1:]
+    return path
+
+
+def _matches_names(event: Dict[str, Any], names: List[str]) -> bool:
+    return event.get("name") in names or any(node in names for node in _event_path(event))
+
+
+def _chunk_text(chunk: Any) -> str:
+    content = getattr(chunk, "content", chunk)
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "".join(part if isinstance(part, str) else part.get("text", "") for part in content)
+    return ""
+
+
+def _to_stream_event(event: Dict[str, Any]) -> Optional[Tuple[str, Dict[str, Any]]]:
+    """Map a v2 astream_events event to one of the client-facing event kinds."""
+    kind = event["event"]
+    path = _event_path(event)
+    agent = path[0] if path else None
+    if kind == "on_chat_model_stream":
+        text = _chunk_text(event["data"].get("chunk"))
+        if not text:
+            return None
+        return "token", {"agent": agent, "run_id": event["run_id"], "content": text}
+    if kind == "on_tool_start":
+        return "tool_start", {"agent": agent, "run_id": event["run_id"], "name": event["name"], "input": event["data"].get("input")}
+    if kind == "on_tool_end":
+        return "tool_end", {"agent": agent, "run_id": event["run_id"], "name": event["name"], "output": event["data"].get("output")}
+    if kind == "on_chain_end" and event["name"] == event.get("metadata", {}).get("langgraph_node"):
+        return "update", {"agent": agent, "node": event["name"], "output": event["data"].get("output")}
+    return None
+
+
+def _wants(stream_event: str, events: List[str]) -> bool:
+    if stream_event == "token":
+        return "tokens" in events
+    if stream_event == "update":
+        return "updates" in events
+    return "tools" in events
+
+
+def format_sse(event: str, data: Any) -> bytes:
+    return b"event: " + event.encode() + b"\ndata: " + dumps(data) + b"\n\n"
+
+
+class TokenCoalescer:
+    """Buffers token chunks per run and releases them at most once per `window` seconds."""
+
+    def __init__(self, window: float):
+        self.window = window
+        self._buffers: Dict[str, Dict[str, Any]] = {}
+        self._first_at: Optional[float] = None
+
+    def add(self, token: Dict[str, Any]) -> None:
+        buffered = self._buffers.get(token["run_id"])
+        if buffered is None:
+            self._buffers[token["run_id"]] = dict(token)
+        else:
+            buffered["content"] += token["content"]
+        if self._first_at is None:
+            self._first_at = time.monotonic()
+
+    def time_left(self) -> Optional[float]:
+        """Seconds until the buffer is due, or None when it is empty."""
+        if self._first_at is None:
+            return None
+        return max(self._first_at + self.window - time.monotonic(), 0.0)
+
+    def flush(self) -> List[Dict[str, Any]]:
+        tokens = list(self._buffers.values())
+        self._buffers.clear()
+        self._first_at = None
+        return tokens
+
+
+# Served by GET /api/v1/artifacts/{artifact_id}
+ARTIFACTS_PATH = "/api/v1/artifacts"
+# Characters of a large text output kept in the event next to its artifact reference.
+ARTIFACT_PREVIEW_CHARS = 200
+
+
+class ToolOutputSplitter:
+    """
+    Replaces large tool outputs in stream events with references to the artifact
+    store, so events stay small and clients fetch images and query results from
+    ARTIFACTS_PATH (in parallel, with their content type) instead of receiving them
+    base64/JSON-encoded inline.
+
+    Every content block of a ToolMessage larger than `max_inline_bytes` becomes
+    {"type": "artifact", "kind", "id", "url", "content_type", "size"} (text blocks
+    keep a short "preview"). A message is split once per stream and reused when it
+    shows up again, e.g. in the node update after its tool_end event.
+    """
+
+    def __init__(self, max_inline_bytes: int, store: ArtifactStore = artifact_store):
+        self.max_inline_bytes = max_inline_bytes
+        self.store = store
+        self._split: Dict[str, ToolMessage] = {}
+
+    def split(self, value: Any) -> Any:
+        """`value` with large ToolMessage contents replaced; unchanged containers are returned as is."""
+        if not self.max_inline_bytes:
+            return value
+        if isinstance(value, ToolMessage):
+            return self._split_message(value)
+        if isinstance(value, dict):
+            items = {key: self.split(item) for key, item in value.items()}
+            return items if any(items[key] is not value[key] for key in value) else value
+        if isinstance(value, (list, tuple)):
+            items = [self.split(item) for item in value]
+            return type(value)(items) if any(a is not b for a, b in zip(items, value)) else value
+        return value
+
+    def _split_message(self, message: ToolMessage) -> ToolMessage:
+        # tool_call_id, not id: the message only gets an id once it is added to the state
+        key = message.tool_call_id
+        if key in self._split:
+            return self._split[key]
+        blocks = [message.content] if isinstance(message.content, str) else message.content
+        split = [self._split_block(block) for block in blocks]
+        if all(a is b for a, b in zip(split, blocks)):
+            result = message
+        else:
+            result = message.model_copy(update={"content": split})
+        self._split[key] = result
+        return result
+
+    def _split_block(self, block: Any) -> Any:
+        text = block if isinstance(block, str) else block.get("text") if block.get("type") == "text" else None
+        if text is not None:
+            if len(text) <= self.max_inline_bytes:
+                return block
+            payload = text.encode()
+            content_type = "application/json" if text.lstrip()[:1] in ("{", "[") else "text/plain"
+            reference = self._store(payload, content_type, "text")
+            reference["preview"] = text[:ARTIFACT_PREVIEW_CHARS]
+            return reference
+        encoded = block.get("base64") or block.get("data")
+        if isinstance(encoded, str) and len(encoded) > self.max_inline_bytes:
+            content_type = block.get("mime_type") or block.get("mimeType") or "application/octet-stream"
+            return self._store(base64.b64decode(encoded), content_type, block.get("type", "file"))
+        return block
+
+    def _store(self, payload: bytes, content_type: str, kind: str) -> Dict[str, Any]:
+        artifact = self.store.put(payload, content_type, len(payload))
+        return {
+            "type": "artifact",
+            "kind": kind,
+            "id": artifact.id,
+            "url": f"{ARTIFACTS_PATH}/{artifact.id}",
+            "content_type": content_type,
+            "size": artifact.size,
+        }
+
+
+async def stream_graph_events(
+    graph,
+    graph_input: Dict[str, Any],
+    config: Dict[str, Any],
+    events: Optional[List[str]] = None,
+    include_names: Optional[List[str]] = None,
+    coalesce_ms: Optional[float] = None,
+    run_kind: str = "stream",
+    register_run: bool = True,
+) -> AsyncIterator[Tuple[str, Any]]:
+    """
+    Yield (event, data) pairs for a graph run.
+
+    Without `events` every v2 event is forwarded as-is. With `events` (any of
+    EVENT_KINDS) only token, node update and tool events are produced, token chunks
+    are merged over `coalesce_ms`, and the graph is asked for the matching run types
+    only. `include_names` keeps events of the named runs or graph nodes (e.g. an agent).
+
+    Tool outputs larger than STREAM_MAX_INLINE_BYTES are replaced by artifact
+    references (see ToolOutputSplitter).
+
+    The graph runs in its own task and feeds a bounded queue, so a slow client pauses
+    the graph instead of buffering without limit. The task is registered in the run
+    registry under the config's thread_id; cancelling it there raises RunCancelled.
+    Pass register_run=False when the caller's task is registered already (jobs).
+    """
+    include_types = sorted({EVENT_KINDS[kind] for kind in events}) if events else None
+    window = (settings.stream_coalesce_ms if coalesce_ms is None else coalesce_ms) / 1000
+    queue: asyncio.Queue = asyncio.Queue(maxsize=settings.stream_queue_size)
+
+    closing = False
+    started = time.perf_counter()
+    first_token = True
+
+    async def produce() -> None:
+        nonlocal first_token
+        try:
+            async for event in graph.astream_events(graph_input, config=config, version="v2", include_types=include_types):
+                if first_token and event["event"] == "on_chat_model_stream" and _chunk_text(event["data"].get("chunk")):
+                    first_token = False
+                    time_to_first_token.labels(run_kind).observe(time.perf_counter() - started)
+                if include_names and not _matches_names(event, include_names):
+                    continue
+                await queue.put(event)
+            outcome = _DONE
+        except asyncio.CancelledError:
+            if closing:
+                raise
+            outcome = RunCancelled(f"Run on thread '{config['configurable']['thread_id']}' was cancelled.")
+        except Exception as e:
+            outcome = e
+        await queue.put(outcome)
+
+    producer = asyncio.create_task(produce())
+    if register_run:
+        run_registry.register(config["configurable"]["thread_id"], run_kind, producer)
+    coalescer = TokenCoalescer(window)
+    splitter = ToolOutputSplitter(settings.stream_max_inline_bytes)
+    try:
+        while True:
+            timeout = coalescer.time_left()
+            try:
+                item = await asyncio.wait_for(queue.get(), timeout) if timeout is not None else await queue.get()
+            except asyncio.TimeoutError:
+                for token in coalescer.flush():
+                    yield "token", token
+                continue
+
+            if item is _DONE or isinstance(item, Exception):
+                for token in coalescer.flush():
+                    yield "token", token
+                if isinstance(item, Exception):
+                    raise item
+                break
+
+            if not events:
+                yield item["event"], item["data"] if item["event"] == "on_chat_model_stream" else splitter.split(item["data"])
+                continue
+            mapped = _to_stream_event(item)
+            if mapped is None or not _wants(mapped[0], events):
+                continue
+            name, data = mapped
+            if name == "token" and window > 0:
+                coalescer.add(data)
+                if coalescer.time_left() == 0:
+                    for token in coalescer.flush():
+                        yield "token", token
+                continue
+            # Keep ordering: pending tokens go out before any other event.
+            for token in coalescer.flush():
+                yield "token", token
+            yield name, splitter.split(data)
+    finally:
+        closing = True
+        producer.cancel()
+        await asyncio.gather(producer, return_exceptions=True)
@@ -1,3 +1,5 @@
+from typing import Any, Dict, List
+
 from pydantic_settings import BaseSettings
 from dotenv import load_dotenv
 
@@ -10,11 +12,101 @@ class Settings(BaseSettings):
     google_cloud_location: str | None = None # e.g., "us-central1"
 
     gemini_api_key: str | None = None
+    llm_provider: str = "gemini" # "gemini" or "fake" (offline, for benchmarks)
+    llm_model: str = "gemini-2.5-flash-preview-04-17"
+    fake_llm_latency: float = 0.0 # seconds per fake LLM call
+    fake_llm_response: str = "This is a canned response from the fake LLM."
+    fake_llm_tokens_per_second: float = 0.0 # streaming rate of the fake LLM (0: all at once)
+    fake_llm_tool_calls: List[Dict[str, Any]] = [] # e.g. '[{"name": "list_dashboards", "args": {}}]', called when bound
+
+    # Serving (python -m app.serve)
+    host: str = "0.0.0.0"
+    port: int = 8000
+    web_concurrency: int = 1 # worker processes
     langsmith_tracing: bool = False
     langsmith_endpoint: str | None = None
     langsmith_api_key: str | None = None
     langsmith_project: str | None = None
 
+    # MCP servers (SSE endpoints are "<url>/sse")
+    grafana_mcp_url: str | None = None
+    grafana_renderer_mcp_url: str | None = None
+    mcp_connect_timeout: float = 10.0 # seconds to wait for each MCP server at startup
+    mcp_reconnect_initial_backoff: float = 1.0
+    mcp_reconnect_max_backoff: float = 30.0
+    mcp_health_check_interval: float = 30.0 # seconds between pings on idle sessions
+    mcp_max_concurrent_calls: int = 8 # parallel tool calls per MCP server (0: no cap)
+    mcp_tool_timeout: float = 30.0 # seconds per tool call (0: no timeout)
+    mcp_tool_timeouts: Dict[str, float] = {} # per-tool overrides, e.g. '{"render_dashboard": 60}'
+
+    # Checkpointer ("memory": in-process LRU, "sqlite": shared WAL database on this host)
+    checkpointer_backend: str = "memory"
+    checkpointer_max_threads: int = 1000
+    checkpointer_max_bytes: int | None = 256 * 1024 * 1024
+    checkpointer_sqlite_path: str = "checkpoints.sqlite"
+    checkpointer_sqlite_busy_timeout: float = 5.0 # seconds
+    checkpointer_prune: bool = True # after each run keep only a thread's latest checkpoint (no time travel)
+
+    # Per-thread limits (0 disables a limit)
+    history_max_messages: int = 40
+    history_max_tokens: int = 8000
+    history_max_tool_payload_chars: int = 4000 # larger tool outputs are stored as artifacts
+    thread_ttl_seconds: float = 24 * 60 * 60 # idle threads are deleted after this
+    thread_sweep_interval: float = 300.0
+    artifact_store_max_bytes: int = 64 * 1024 * 1024
+    artifact_ttl_seconds: float = 60 * 60
+    artifact_dir: str | None = None # e.g. "/tmp/agent-artifacts": shared by the workers so any of them serves /artifacts
+
+    # SSE streaming
+    stream_coalesce_ms: float = 50.0 # token chunks are merged over this window
+    stream_queue_size: int = 256 # events buffered before the graph waits for the client
+    stream_max_inline_bytes: int = 16 * 1024 # larger tool outputs are sent as /artifacts references (0: inline)
+    ws_max_concurrent_runs: int = 4 # per WebSocket connection
+
+    # Admission control and rate limiting (0 disables a limit)
+    max_in_flight_runs: int = 32 # concurrent graph runs per worker
+    admission_wait_timeout: float = 10.0 # seconds to wait for a run slot before 503
+    rate_limit_per_minute: float = 60.0 # requests per client (API key or address)
+    rate_limit_burst: int = 20
+    api_key_header: str = "X-API-Key"
+    api_key_quotas: Dict[str, float] = {} # per-key requests per minute, e.g. '{"team-a": 600}'
+
+    # LLM call cache shared by the supervisor and agents (size 0 disables)
+    llm_cache_size: int = 2048
+    llm_cache_ttl: float = 60 * 60
+    llm_cache_sqlite_path: str | None = None # e.g. "llm_cache.sqlite" to share across workers/restarts
+    llm_cache_exclude: List[str] = [] # agents that always call the model, e.g. ["grafana_agent"]
+
+    # Response cache for requests with "cache": true and no thread_id (size 0 disables)
+    response_cache_size: int = 1000
+    response_cache_ttl: float = 60 * 60
+    response_cache_volatile_ttl: float = 60.0 # answers that used a time-sensitive tool
+    response_cache_time_sensitive_tools: List[str] = ["render_*", "*_data", "*query*"]
+
+    # Fast-path routing: obvious questions skip the supervisor model
+    fast_path_enabled: bool = True
+    fast_path_rules: List[Dict[str, Any]] = [] # extra rules, e.g. '[{"agent": "grafana_agent", "patterns": ["알림|alert"]}]'
+    fast_path_embedding_model: str | None = None # e.g. "models/text-embedding-004" to also match rule examples
+    fast_path_similarity_threshold: float = 0.85
+
+    # Who gives the final answer after a handoff: "supervisor" restates the agent's answer
+    # with another model call, "passthrough" ends the run with the agent's streamed answer
+    answer_mode: str = "supervisor"
+
+    # Background jobs (/jobs)
+    job_workers: int = 4 # graph runs executed concurrently
+    job_queue_max_size: int = 100 # waiting jobs before /jobs answers 429
+    job_result_ttl_seconds: float = 60 * 60
+    job_max_retained: int = 1000 # finished jobs kept for polling
+    job_max_events: int = 2000 # stream events kept per job
+    # e.g. "jobs.sqlite": share job status, results and events so any worker can serve /jobs;
+    # required for /jobs when WEB_CONCURRENCY > 1
+    job_store_sqlite_path: str | None = None
+    job_store_poll_seconds: float = 0.5 # how often other workers' events and cancel requests are checked
+
+    # Prometheus metrics (/api/v1/metrics)
+    metrics_multiproc_dir: str | None = None # shared directory so /metrics aggregates all worker processes
+
     # Example of another API key if your tools need it
     # any_other_api_key: str | None = None
 
@@ -0,0 +1,211 @@
+"""
+Prometheus metrics of the API, exported by GET /api/v1/metrics.
+
+Graph runs report node, LLM and tool timings through MetricsCallbackHandler, which
+is attached to the compiled graph; HTTP latency comes from MetricsMiddleware. With
+several worker processes set METRICS_MULTIPROC_DIR so /metrics aggregates all of
+them (prometheus_client multiprocess mode).
+"""
+import os
+import time
+from typing import Any, Dict, Optional, Tuple
+from uuid import UUID
+
+from app.core.config import settings
+
+if settings.metrics_multiproc_dir:
+    # Must be set before prometheus_client is imported.
+    os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", settings.metrics_multiproc_dir)
+
+from langchain_core.callbacks import BaseCallbackHandler
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, generate_latest
+
+# Seconds; LLM calls and agent loops take far longer than typical web requests.
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+
+http_request_duration = Histogram(
+    "http_request_duration_seconds", "HTTP request latency until the response is complete.",
+    ["method", "route", "status"], buckets=LATENCY_BUCKETS,
+)
+graph_node_duration = Histogram(
+    "graph_node_duration_seconds", "Duration of a graph node run; node is the path of graph nodes, e.g. supervisor_graph/grafana_agent/tools.",
+    ["node"], buckets=LATENCY_BUCKETS,
+)
+llm_call_duration = Histogram(
+    "llm_call_duration_seconds", "Duration of a chat model call.",
+    ["node", "cached"], buckets=LATENCY_BUCKETS,
+)
+llm_tokens = Counter(
+    "llm_tokens_total", "Tokens reported by the chat model (cache hits excluded).",
+    ["node", "type"],
+)
+tool_call_duration = Histogram(
+    "tool_call_duration_seconds", "Duration of a tool call, including the MCP round trip.",
+    ["tool", "server", "status"], buckets=LATENCY_BUCKETS,
+)
+time_to_first_token = Histogram(
+    "stream_time_to_first_token_seconds", "Time from the start of a streamed run to its first token event.",
+    ["kind"], buckets=LATENCY_BUCKETS,
+)
+runs_in_flight = Gauge(
+    "graph_runs_in_flight", "Graph runs currently executing.", ["kind"], multiprocess_mode="livesum",
+)
+cache_lookups = Counter(
+    "cache_lookups_total", "Cache lookups by cache and result (hit, miss, disk_hit, coalesced).",
+    ["cache", "result"],
+)
+fast_path_decisions = Counter(
+    "fast_path_decisions_total", "Fast-path routing decisions by target (an agent or the supervisor).",
+    ["target"],
+)
+admission_queue_depth = Gauge(
+    "admission_queue_depth", "Requests waiting for a graph run slot (MAX_IN_FLIGHT_RUNS reached).",
+    multiprocess_mode="livesum",
+)
+rejected_requests = Counter(
+    "rejected_requests_total", "Requests rejected by admission control or rate limiting.",
+    ["reason"],
+)
+
+
+def _node_path(metadata: Optional[Dict[str, Any]]) -> str:
+    namespace = (metadata or {}).get("langgraph_checkpoint_ns") or ""
+    return "/".join(part.split(":", 1)[0] for part in namespace.split("|") if part) or "unknown"
+
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """Records graph node, LLM and tool timings of every run it is attached to."""
+
+    run_inline = True
+
+    def __init__(self):
+        self._started: Dict[UUID, Tuple[float, str]] = {}
+
+    def _start(self, run_id: UUID, label: str) -> None:
+        self._started[run_id] = (time.perf_counter(), label)
+
+    def _stop(self, run_id: UUID) -> Optional[Tuple[float, str]]:
+        started = self._started.pop(run_id, None)
+        if started is None:
+            return None
+        return time.perf_counter() - started[0], started[1]
+
+    def on_chain_start(self, serialized, inputs, *, run_id: UUID, parent_run_id: Optional[UUID] = None, metadata=None, name=None, **kwargs: Any) -> None:
+        if not metadata or name != metadata.get("langgraph_node") or name.startswith("__"):
+            return
+        node = _node_path(metadata)
+        parent = self._started.get(parent_run_id)
+        if parent is not None and parent[1] == node:
+            return  # a subgraph node runs the subgraph under the same name
+        self._start(run_id, node)
+
+    def on_chain_end(self, outputs, *, run_id: UUID, **kwargs: Any) -> None:
+        stopped = self._stop(run_id)
+        if stopped is not None:
+            graph_node_duration.labels(stopped[1]).observe(stopped[0])
+
+    def on_chain_error(self, error, *, run_id: UUID, **kwargs: Any) -> None:
+        self.on_chain_end(None, run_id=run_id)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, metadata=None, **kwargs: Any) -> None:
+        self._start(run_id, _node_path(metadata))
+
+    def on_llm_end(self, response, *, run_id: UUID, **kwargs: Any) -> None:
+        stopped = self._stop(run_id)
+        if stopped is None:
+            return
+        elapsed, node = stopped
+        message = getattr(response.generations[0][0], "message", None) if response.generations and response.generations[0] else None
+        cached = message is not None and message.response_metadata.get("llm_cache") == "hit"
+        llm_call_duration.labels(node, str(cached).lower()).observe(elapsed)
+        usage = getattr(message, "usage_metadata", None)
+        if usage and not cached:
+            llm_tokens.labels(node, "input").inc(usage.get("input_tokens", 0))
+            llm_tokens.labels(node, "output").inc(usage.get("output_tokens", 0))
+
+    def on_llm_error(self, error, *, run_id: UUID, **kwargs: Any) -> None:
+        self._stop(run_id)
+
+    def on_tool_start(self, serialized, input_str, *, run_id: UUID, metadata=None, **kwargs: Any) -> None:
+        name = kwargs.get("name") or (serialized or {}).get("name", "unknown")
+        self._start(run_id, f"{name}\0{(metadata or {}).get('mcp_server', '')}")
+
+    def _tool_done(self, run_id: UUID, status: str) -> None:
+        stopped = self._stop(run_id)
+        if stopped is not None:
+            tool, server = stopped[1].split("\0", 1)
+            tool_call_duration.labels(tool, server, status).observe(stopped[0])
+
+    def on_tool_end(self, output, *, run_id: UUID, **kwargs: Any) -> None:
+        self._tool_done(run_id, "error" if getattr(output, "status", None) == "error" else "ok")
+
+    def on_tool_error(self, error, *, run_id: UUID, **kwargs: Any) -> None:
+        self._tool_done(run_id, "error")
+
+
+metrics_callback = MetricsCallbackHandler()
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing HTTP requests until the last body chunk (so SSE streams count in full)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        started = time.perf_counter()
+        status = "500"
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_request_duration.labels(scope["method"], _route_label(scope), status).observe(time.perf_counter() - started)
+
+
+def _route_label(scope) -> str:
+    """Path template of the matched route including the router prefix, e.g. /api/v1/threads/{thread_id_path}/state."""
+    template = getattr(scope.get("route"), "path", None)
+    if template is None:
+        return "unmatched"
+    # Included routers only know their own paths; take the prefix from the request path.
+    parts = scope["path"].split("/")
+    prefix = "/".join(parts[:len(parts) - template.count("/")])
+    return prefix + template
+
+
+def reset_multiproc_dir() -> None:
+    """Create METRICS_MULTIPROC_DIR and drop files of earlier runs; call once in the parent process."""
+    directory = settings.metrics_multiproc_dir
+    if not directory:
+        return
+    os.makedirs(directory, exist_ok=True)
+    for name in os.listdir(directory):
+        if name.endswith(".db"):
+            os.remove(os.path.join(directory, name))
+
+
+def mark_worker_dead(pid: int) -> None:
+    """Drop the live gauges of a worker process that exited (multiprocess mode only)."""
+    if settings.metrics_multiproc_dir:
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(pid)
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """The Prometheus text exposition of this worker, or of all workers in multiprocess mode."""
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -1,3 +1,4 @@
-from .instance import app_graph, memory_saver
+from .instance import memory_saver, get_app_graph, get_graph_fingerprint, init_app_graph, close_app_graph
+from .mcp_registry import mcp_registry
 
-__all__ = ["app_graph", "memory_saver"] 
\ No newline at end of file
+__all__ = ["memory_saver", "get_app_graph", "get_graph_fingerprint", "init_app_graph", "close_app_graph", "mcp_registry"]
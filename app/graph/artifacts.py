@@ -0,0 +1,170 @@
+import asyncio
+import json
+import logging
+import os
+import re
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Artifact ids are uuid4 hex; anything else is never looked up on disk.
+_ARTIFACT_ID = re.compile(r"^[0-9a-f]{32}$")
+# Seconds between sweeps of expired files in the shared directory.
+SWEEP_INTERVAL = 60.0
+
+
+@dataclass
+class Artifact:
+    id: str
+    content: Any
+    content_type: str
+    size: int
+    created_at: float
+
+
+class ArtifactStore:
+    """
+    Bounded in-memory store for large payloads (tool outputs, images) that are kept
+    out of the message history and referenced by id instead.
+    Entries expire after `ttl` seconds; the oldest are dropped once `max_bytes` is exceeded.
+
+    With a `directory` (shared by the workers on this host) every artifact is also written
+    to a file there, so any worker can serve an id another worker created. Files follow
+    the same ttl and max_bytes limits, enforced by whichever worker sweeps next.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, ttl: float = 3600.0, directory: Optional[str] = None):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.directory = directory
+        self._items: "OrderedDict[str, Artifact]" = OrderedDict()
+        self._bytes = 0
+        self._last_sweep = 0.0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def put(self, content: Any, content_type: str, size: int) -> Artifact:
+        artifact = Artifact(
+            id=uuid.uuid4().hex,
+            content=content,
+            content_type=content_type,
+            size=size,
+            created_at=time.monotonic(),
+        )
+        self._items[artifact.id] = artifact
+        self._bytes += size
+        self._evict()
+        if self.directory:
+            self._write(artifact)
+        return artifact
+
+    def get(self, artifact_id: str) -> Optional[Artifact]:
+        artifact = self._items.get(artifact_id)
+        if artifact is not None and time.monotonic() - artifact.created_at > self.ttl:
+            self._remove(artifact_id)
+            return None
+        if artifact is None and self.directory:
+            return self._read(artifact_id)
+        return artifact
+
+    async def aget(self, artifact_id: str) -> Optional[Artifact]:
+        if artifact_id in self._items or not self.directory:
+            return self.get(artifact_id)
+        return await asyncio.to_thread(self.get, artifact_id)
+
+    def stats(self) -> dict:
+        return {"artifacts": len(self._items), "bytes": self._bytes, "max_bytes": self.max_bytes}
+
+    def _remove(self, artifact_id: str) -> None:
+        artifact = self._items.pop(artifact_id, None)
+        if artifact is not None:
+            self._bytes -= artifact.size
+
+    def _evict(self) -> None:
+        now = time.monotonic()
+        while self._items:
+            oldest_id, oldest = next(iter(self._items.items()))
+            over_budget = self._bytes > self.max_bytes and len(self._items) > 1
+            if over_budget or now - oldest.created_at > self.ttl:
+                self._remove(oldest_id)
+            else:
+                break
+
+    def _path(self, artifact_id: str) -> str:
+        return os.path.join(self.directory, artifact_id)
+
+    def _write(self, artifact: Artifact) -> None:
+        content = artifact.content
+        if isinstance(content, str):
+            content = content.encode()
+        elif not isinstance(content, bytes):
+            # Compacted history keeps the message content itself (text and content blocks)
+            content = json.dumps(content, ensure_ascii=False, default=str).encode()
+        path = self._path(artifact.id)
+        try:
+            # First line is the content type; write then rename so readers never see a partial file.
+            with open(f"{path}.tmp", "wb") as f:
+                f.write(artifact.content_type.encode() + b"\n" + content)
+            os.replace(f"{path}.tmp", path)
+        except OSError as e:
+            logger.warning("Could not write artifact %s: %s", artifact.id, e)
+        if time.monotonic() - self._last_sweep > SWEEP_INTERVAL:
+            self._last_sweep = time.monotonic()
+            self._sweep()
+
+    def _read(self, artifact_id: str) -> Optional[Artifact]:
+        if not _ARTIFACT_ID.match(artifact_id):
+            return None
+        path = self._path(artifact_id)
+        try:
+            age = time.time() - os.path.getmtime(path)
+            if age > self.ttl:
+                return None
+            with open(path, "rb") as f:
+                content_type, _, content = f.read().partition(b"\n")
+        except FileNotFoundError:
+            return None
+        return Artifact(
+            id=artifact_id,
+            content=content,
+            content_type=content_type.decode(),
+            size=len(content),
+            created_at=time.monotonic() - age,
+        )
+
+    def _sweep(self) -> None:
+        """Delete expired files, then the oldest ones while the directory exceeds max_bytes."""
+        now = time.time()
+        files = []
+        try:
+            with os.scandir(self.directory) as entries:
+                for entry in entries:
+                    if entry.is_file() and _ARTIFACT_ID.match(entry.name):
+                        stat = entry.stat()
+                        files.append((stat.st_mtime, stat.st_size, entry.path))
+        except OSError as e:
+            logger.warning("Could not sweep artifact directory %s: %s", self.directory, e)
+            return
+        files.sort()
+        total = sum(size for _, size, _ in files)
+        for mtime, size, path in files:
+            if now - mtime <= self.ttl and total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+artifact_store = ArtifactStore(
+    max_bytes=settings.artifact_store_max_bytes,
+    ttl=settings.artifact_ttl_seconds,
+    directory=settings.artifact_dir,
+)
@@ -0,0 +1,194 @@
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Any, Optional
+
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.checkpoint.memory import MemorySaver
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class LRUMemorySaver(MemorySaver):
+    """
+    In-memory checkpointer that caps the number of threads and the (approximate)
+    serialized size of their checkpoints. The least recently used thread is dropped
+    first when either limit is exceeded.
+    """
+
+    def __init__(self, *, max_threads: int = 1000, max_bytes: Optional[int] = None, **kwargs: Any):
+        super().__init__(**kwargs)
+        self.max_threads = max_threads
+        self.max_bytes = max_bytes
+        self._thread_bytes: "OrderedDict[str, int]" = OrderedDict()
+        self._total_bytes = 0
+        self.evicted_threads = 0
+
+    def get_tuple(self, config):
+        thread_id = config["configurable"]["thread_id"]
+        if thread_id in self._thread_bytes:
+            self._thread_bytes.move_to_end(thread_id)
+        return super().get_tuple(config)
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        next_config = super().put(config, checkpoint, metadata, new_versions)
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        serialized, serialized_metadata, _ = self.storage[thread_id][checkpoint_ns][checkpoint["id"]]
+        size = len(serialized[1]) + len(serialized_metadata[1])
+        for channel, version in new_versions.items():
+            size += len(self.blobs[(thread_id, checkpoint_ns, channel, version)][1])
+        self._track(thread_id, size)
+        return next_config
+
+    def put_writes(self, config, writes, task_id, task_path=""):
+        thread_id = config["configurable"]["thread_id"]
+        outer_key = (thread_id, config["configurable"].get("checkpoint_ns", ""), config["configurable"]["checkpoint_id"])
+        before = self._writes_size(outer_key)
+        super().put_writes(config, writes, task_id, task_path)
+        self._track(thread_id, self._writes_size(outer_key) - before)
+
+    def delete_thread(self, thread_id: str) -> None:
+        super().delete_thread(thread_id)
+        self._total_bytes -= self._thread_bytes.pop(thread_id, 0)
+
+    def prune_thread(self, thread_id: str) -> int:
+        """
+        Drop every checkpoint of a thread older than its latest root checkpoint, in all
+        namespaces, with their pending writes and the blobs only they referenced.
+        Returns the number of dropped checkpoints.
+        """
+        namespaces = self.storage.get(thread_id)
+        if not namespaces or not namespaces.get(""):
+            return 0
+        latest = max(namespaces[""])
+        removed = 0
+        for checkpoint_ns in list(namespaces):
+            checkpoints = namespaces[checkpoint_ns]
+            for checkpoint_id in [cid for cid in checkpoints if cid < latest]:
+                del checkpoints[checkpoint_id]
+                self.writes.pop((thread_id, checkpoint_ns, checkpoint_id), None)
+                removed += 1
+            if not checkpoints:
+                del namespaces[checkpoint_ns]
+        if not removed:
+            return 0
+        referenced = {
+            (checkpoint_ns, channel, version)
+            for checkpoint_ns, checkpoints in namespaces.items()
+            for serialized, _, _ in checkpoints.values()
+            for channel, version in self.serde.loads_typed(serialized)["channel_versions"].items()
+        }
+        for key in [key for key in self.blobs if key[0] == thread_id and key[1:] not in referenced]:
+            del self.blobs[key]
+        size = self._thread_size(thread_id)
+        self._total_bytes += size - self._thread_bytes.get(thread_id, 0)
+        self._thread_bytes[thread_id] = size
+        return removed
+
+    def stats(self) -> dict:
+        return {
+            "threads": len(self._thread_bytes),
+            "max_threads": self.max_threads,
+            "bytes": self._total_bytes,
+            "max_bytes": self.max_bytes,
+            "evicted_threads": self.evicted_threads,
+        }
+
+    def _thread_size(self, thread_id: str) -> int:
+        size = sum(
+            len(serialized[1]) + len(serialized_metadata[1])
+            for checkpoints in self.storage.get(thread_id, {}).values()
+            for serialized, serialized_metadata, _ in checkpoints.values()
+        )
+        size += sum(len(blob[1]) for key, blob in self.blobs.items() if key[0] == thread_id)
+        size += sum(self._writes_size(key) for key in self.writes if key[0] == thread_id)
+        return size
+
+    def _writes_size(self, outer_key) -> int:
+        return sum(len(write[2][1]) for write in self.writes.get(outer_key, {}).values())
+
+    def _track(self, thread_id: str, size: int) -> None:
+        self._thread_bytes[thread_id] = self._thread_bytes.get(thread_id, 0) + size
+        self._thread_bytes.move_to_end(thread_id)
+        self._total_bytes += size
+        # Never evict the thread that is being written right now.
+        while len(self._thread_bytes) > 1 and (
+            len(self._thread_bytes) > self.max_threads
+            or (self.max_bytes is not None and self._total_bytes > self.max_bytes)
+        ):
+            oldest = next(iter(self._thread_bytes))
+            self.delete_thread(oldest)
+            self.evicted_threads += 1
+            logger.info("Evicted checkpoints of thread %s (LRU).", oldest)
+
+
+def make_memory_saver() -> LRUMemorySaver:
+    return LRUMemorySaver(
+        max_threads=settings.checkpointer_max_threads,
+        max_bytes=settings.checkpointer_max_bytes,
+    )
+
+
+async def open_checkpointer(memory_saver: BaseCheckpointSaver) -> BaseCheckpointSaver:
+    """
+    Create the checkpointer selected by settings.checkpointer_backend.
+
+    "memory" reuses the given in-process saver. "sqlite" opens a WAL-mode database
+    that can be shared by every worker process on the host and survives restarts.
+    """
+    backend = settings.checkpointer_backend
+    if backend == "memory":
+        return memory_saver
+    if backend == "sqlite":
+        import aiosqlite
+        from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+        conn = await aiosqlite.connect(settings.checkpointer_sqlite_path)
+        # WAL lets readers in other workers proceed while one worker writes;
+        # busy_timeout makes concurrent writers wait instead of failing immediately.
+        await conn.execute("PRAGMA journal_mode=WAL")
+        await conn.execute("PRAGMA synchronous=NORMAL")
+        await conn.execute(f"PRAGMA busy_timeout={int(settings.checkpointer_sqlite_busy_timeout * 1000)}")
+        saver = AsyncSqliteSaver(conn)
+        await saver.setup()
+        logger.info("Using SQLite checkpointer at %s", settings.checkpointer_sqlite_path)
+        return saver
+    raise ValueError(f"Unknown checkpointer backend: {backend!r} (expected 'memory' or 'sqlite')")
+
+
+async def close_checkpointer(checkpointer: BaseCheckpointSaver) -> None:
+    conn = getattr(checkpointer, "conn", None)
+    if conn is not None:
+        await conn.close()
+
+
+async def prune_thread(checkpointer: BaseCheckpointSaver, thread_id: str) -> int:
+    """
+    Keep only the latest checkpoint of a thread whose run has finished. Older
+    checkpoints (earlier steps and runs, finished subgraph runs) are only needed for
+    time travel; without pruning a thread's storage grows with every run even though
+    its message history is compacted. Returns the number of dropped checkpoints.
+    """
+    if isinstance(checkpointer, LRUMemorySaver):
+        return checkpointer.prune_thread(thread_id)
+    conn = getattr(checkpointer, "conn", None)
+    lock = getattr(checkpointer, "lock", None)
+    if conn is None or not isinstance(lock, asyncio.Lock):
+        return 0
+    # AsyncSqliteSaver. Checkpoint ids are time-ordered, which LangGraph relies on too;
+    # a run that starts from the latest checkpoint only writes newer ids.
+    async with lock, conn.cursor() as cur:
+        await cur.execute(
+            "SELECT MAX(checkpoint_id) FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ''", (thread_id,)
+        )
+        row = await cur.fetchone()
+        if row is None or row[0] is None:
+            return 0
+        await cur.execute("DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_id < ?", (thread_id, row[0]))
+        removed = cur.rowcount
+        await cur.execute("DELETE FROM writes WHERE thread_id = ? AND checkpoint_id < ?", (thread_id, row[0]))
+        await conn.commit()
+    return removed
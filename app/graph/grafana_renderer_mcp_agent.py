@@ -1,33 +1,24 @@
-import os
+from .tool_node import make_tool_node
 
-from langgraph.prebuilt import create_react_agent
-from langchain_mcp_adapters.client import MultiServerMCPClient
+GRAFANA_RENDERER_MCP_SERVER = "grafana_renderer_mcp_client"
 
-from dotenv import load_dotenv
-
-load_dotenv()
-
-
-GRAFANA_RENDERER_MCP_URL = os.getenv("GRAFANA_RENDERER_MCP_URL")
-
-def get_grafana_renderer_mcp_client():
+def get_grafana_renderer_mcp_connection(url: str):
     """
-    Get a MultiServerMCPClient instance for Grafana MCP servers.
+    Get the MCP connection settings for the Grafana renderer MCP server.
     """
-    return MultiServerMCPClient(
-            {
-                "grafana_renderer_mcp_client": {
-                    "url": f"{GRAFANA_RENDERER_MCP_URL}/sse",
-                    "transport": "sse"
-                }
-            }
-        )
+    return {
+        "url": f"{url}/sse",
+        "transport": "sse"
+    }
+
+def make_grafana_renderer_agent(llm, tools, pre_model_hook=None):
+    from langgraph.prebuilt import create_react_agent
 
-def make_grafana_renderer_agent(llm):
     return create_react_agent(
         name="grafana_renderer_agent",
         model=llm,
-        tools=get_grafana_renderer_mcp_client().get_tools(),
+        pre_model_hook=pre_model_hook,
+        tools=make_tool_node(tools),
         prompt=(
             ""
         )
@@ -0,0 +1,132 @@
+import json
+import logging
+from typing import Any, Dict, List
+
+from langchain_core.messages import BaseMessage, HumanMessage, RemoveMessage, ToolMessage
+from langchain_core.messages.utils import count_tokens_approximately, trim_messages
+
+from app.core.config import settings
+from .artifacts import ArtifactStore, artifact_store
+
+logger = logging.getLogger(__name__)
+
+# Characters of a large tool payload kept inline next to its artifact reference.
+PAYLOAD_PREVIEW_CHARS = 200
+# Node of the top-level graph that compacts the thread history at the start of a run
+HISTORY_NODE = "compact_history"
+
+
+def _payload_size(content: Any) -> int:
+    if isinstance(content, str):
+        return len(content)
+    return len(json.dumps(content, ensure_ascii=False, default=str))
+
+
+def _compact_tool_message(message: ToolMessage, max_chars: int, store: ArtifactStore) -> ToolMessage:
+    """Move a large tool payload into the artifact store and keep a short reference."""
+    size = _payload_size(message.content)
+    if size <= max_chars:
+        return message
+    content_type = "text/plain" if isinstance(message.content, str) else "application/json"
+    artifact = store.put(message.content, content_type, size)
+    preview = message.content if isinstance(message.content, str) else json.dumps(message.content, ensure_ascii=False, default=str)
+    reference = (
+        f"[tool output of {size} chars stored as artifact {artifact.id} ({content_type})] "
+        f"{preview[:PAYLOAD_PREVIEW_CHARS]}..."
+    )
+    return message.model_copy(update={"content": reference, "artifact": None})
+
+
+def compact_messages(
+    messages: List[BaseMessage],
+    max_messages: int,
+    max_tokens: int,
+    max_tool_payload_chars: int,
+    store: ArtifactStore = artifact_store,
+) -> List[BaseMessage]:
+    """
+    Replace large tool payloads of earlier turns with artifact references and keep only
+    the most recent turns that fit into max_messages / max_tokens. Tool results of the
+    current turn (after the last human message) stay inline: the model has not read
+    them yet and has no tool to fetch an artifact. The kept history always starts on a
+    human message so tool calls are never separated from their results.
+    """
+    current_turn = max((i for i, m in enumerate(messages) if isinstance(m, HumanMessage)), default=0)
+    compacted = [
+        _compact_tool_message(m, max_tool_payload_chars, store)
+        if i < current_turn and isinstance(m, ToolMessage) and max_tool_payload_chars else m
+        for i, m in enumerate(messages)
+    ]
+
+    kept = compacted
+    if max_tokens:
+        kept = trim_messages(
+            kept,
+            max_tokens=max_tokens,
+            token_counter=count_tokens_approximately,
+            strategy="last",
+            start_on="human",
+            include_system=True,
+        )
+    if max_messages and len(kept) > max_messages:
+        kept = kept[-max_messages:]
+        while kept and not isinstance(kept[0], HumanMessage):
+            kept = kept[1:]
+
+    if not kept:
+        # The latest turn alone exceeds the limits: keep it rather than sending nothing.
+        last_human = max((i for i, m in enumerate(compacted) if isinstance(m, HumanMessage)), default=0)
+        kept = compacted[last_human:]
+    return kept
+
+
+def make_history_hook(
+    max_messages: int = settings.history_max_messages,
+    max_tokens: int = settings.history_max_tokens,
+    max_tool_payload_chars: int = settings.history_max_tool_payload_chars,
+):
+    """
+    Build a pre_model_hook that bounds the prompt of an agent.
+
+    The hook compacts the agent's own state, so a tool loop within one run does not
+    resend large payloads on every step. Agents run as subgraphs, so this never
+    reaches the checkpointed thread; make_history_node() bounds that.
+    """
+    from langgraph.graph.message import REMOVE_ALL_MESSAGES
+
+    def pre_model_hook(state: Dict[str, Any]) -> Dict[str, Any]:
+        messages = state["messages"]
+        kept = compact_messages(messages, max_messages, max_tokens, max_tool_payload_chars)
+        if len(kept) == len(messages) and all(a is b for a, b in zip(kept, messages)):
+            return {"llm_input_messages": messages}
+        logger.info("Compacted agent message history from %d to %d messages.", len(messages), len(kept))
+        # llm_input_messages is a state channel: set it on every return, or the model
+        # gets the list of an earlier step and keeps calling the same tool.
+        return {"messages": [RemoveMessage(id=REMOVE_ALL_MESSAGES), *kept], "llm_input_messages": kept}
+
+    return pre_model_hook
+
+
+def make_history_node(
+    max_messages: int = settings.history_max_messages,
+    max_tokens: int = settings.history_max_tokens,
+    max_tool_payload_chars: int = settings.history_max_tool_payload_chars,
+):
+    """
+    Build the node that compacts the thread history before everything else runs.
+
+    Add it first in the top-level graph, the one compiled with the checkpointer (see
+    build_top_graph): the node replaces the thread's messages in the checkpointed state,
+    so a thread keeps at most the limits plus the turn that is running.
+    """
+    from langgraph.graph.message import REMOVE_ALL_MESSAGES
+
+    def compact_history(state: Dict[str, Any]) -> Dict[str, Any]:
+        messages = state["messages"]
+        kept = compact_messages(messages, max_messages, max_tokens, max_tool_payload_chars)
+        if len(kept) == len(messages) and all(a is b for a, b in zip(kept, messages)):
+            return {}
+        logger.info("Compacted thread history from %d to %d messages.", len(messages), len(kept))
+        return {"messages": [RemoveMessage(id=REMOVE_ALL_MESSAGES), *kept]}
+
+    return compact_history
@@ -1,39 +1,237 @@
-import os
-from langgraph_supervisor import create_supervisor
-from langgraph.checkpoint.memory import MemorySaver
-from langchain_google_genai import ChatGoogleGenerativeAI
+import asyncio
+import hashlib
+import json
+import logging
 
-from .grafana_mcp_agent import make_grafana_agent
-from .grafana_renderer_mcp_agent import make_grafana_renderer_agent
+from app.core.config import settings
+from app.core.metrics import metrics_callback
+
+from .grafana_mcp_agent import GRAFANA_MCP_SERVER, make_grafana_agent
+from .grafana_renderer_mcp_agent import GRAFANA_RENDERER_MCP_SERVER, make_grafana_renderer_agent
 from .server_info_agent import make_server_info_agent
-from dotenv import load_dotenv
+from .mcp_registry import mcp_registry
+from .checkpointer import close_checkpointer, make_memory_saver, open_checkpointer, prune_thread
+from .history import make_history_hook, make_history_node
+from .threads import thread_expiry
+from .jobs import job_queue
+from .runs import run_registry
+from .llm import make_llm
+from .llm_cache import with_llm_cache
+from .router import build_top_graph, router
+
+logger = logging.getLogger(__name__)
+
+# LLM 클라이언트는 워커마다 처음 그래프를 만들 때 생성
+llm = None
+
+def get_llm():
+    global llm
+    if llm is None:
+        llm = make_llm()
+    return llm
 
-load_dotenv()
+def _warm_up():
+    """Import the graph builders and create the LLM client, the slow part of a cold start."""
+    import langgraph_supervisor  # noqa: F401
+    import langgraph.prebuilt  # noqa: F401
+    import langgraph.graph  # noqa: F401
 
-# init LLM
-llm = ChatGoogleGenerativeAI(
-    model="gemini-2.5-flash-preview-04-17",
-    google_api_key=os.getenv("GEMINI_API_KEY"),
-    temperature=0
+    get_llm()
+
+SUPERVISOR_PROMPT = (
+    "너는 명령을 듣고 답하는 에이전트야. 그라파나 대시보드를 보여달라고 요청받으면, grafana_renderer_agent에게 명령을 전달해줘. 그라파나 대시보드 관련 명령인데, 보여달라는 요청 외의 것은 grafana_agent에게 명령을 전달해줘."
 )
 
-# Grafana 에이전트
-#grafana_agent = make_grafana_agent(llm)
-#grafana_renderer_agent = make_grafana_renderer_agent(llm)
+# 현재 그래프 구성(모델, 에이전트, 도구, 프롬프트)의 해시. 응답 캐시 키에 사용
+graph_fingerprint = None
+
+def _fingerprint(agents, tools):
+    config = {
+        "llm": [settings.llm_provider, settings.llm_model],
+        "agents": [agent.name for agent in agents],
+        "tools": sorted(tool.name for tool in tools),
+        "prompt": SUPERVISOR_PROMPT,
+        "fast_path": router.describe() if router else None,
+        "answer_mode": settings.answer_mode,
+    }
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode()).hexdigest()[:16]
+
+ANSWER_MODES = ("supervisor", "passthrough")
+
+def _end_on_agent_answers(builder, agents):
+    """
+    Route each agent to END instead of back to the supervisor, whose next model call would only restate the answer.
+
+    create_supervisor has no option for this, so its agent -> supervisor edges are replaced.
+    langgraph-supervisor is pinned in requirements.txt and tests/test_answer_mode.py checks the
+    resulting edges; a release that wires agents differently fails here instead of silently.
+    """
+    from langgraph.graph import END
+
+    for agent in agents:
+        edge = (agent.name, "supervisor")
+        if edge not in builder.edges:
+            raise RuntimeError(f"create_supervisor did not add the edge {edge}; ANSWER_MODE=passthrough needs updating.")
+        builder.edges.discard(edge)
+        builder.add_edge(agent.name, END)
+
+def build_app_graph(checkpointer=None, grafana_tools=None, grafana_renderer_tools=None):
+    """
+    Build the supervisor graph. Grafana agents are only added when their MCP tools are available.
+    It runs as a node of the top-level graph, after the node that compacts the thread history.
+    With the fast path enabled, the router runs before it and may skip the supervisor.
+    With ANSWER_MODE=passthrough the agent's answer ends the run instead of going back to the supervisor.
+    """
+    from langgraph_supervisor import create_supervisor
+
+    global graph_fingerprint
+    llm = get_llm()
+    # 스레드별 메시지 수/토큰 제한
+    history_hook = make_history_hook()
+    cached_llm = with_llm_cache(llm)
+
+    def model_for(name):
+        # LLM_CACHE_EXCLUDE에 있는 에이전트는 항상 모델을 호출
+        return llm if name in settings.llm_cache_exclude else cached_llm
+
+    agents = []
+    # Grafana 에이전트
+    if grafana_tools:
+        agents.append(make_grafana_agent(model_for("grafana_agent"), grafana_tools, pre_model_hook=history_hook))
+    if grafana_renderer_tools:
+        agents.append(make_grafana_renderer_agent(model_for("grafana_renderer_agent"), grafana_renderer_tools, pre_model_hook=history_hook))
+    # Server Info 에이전트
+    agents.append(make_server_info_agent(model_for("server_info_agent"), pre_model_hook=history_hook))
 
-# Server Info 에이전트
-server_info_agent = make_server_info_agent(llm)
+    if settings.answer_mode not in ANSWER_MODES:
+        raise ValueError(f"Unknown ANSWER_MODE: {settings.answer_mode!r} (expected one of {ANSWER_MODES})")
+    passthrough = settings.answer_mode == "passthrough"
 
-# Supervisor 그래프
-supervisor_graph = create_supervisor(
-    #agents=[grafana_agent, grafana_renderer_agent, server_info_agent],
-    agents=[server_info_agent],    
-    model=llm,
-    prompt=(
-        "너는 명령을 듣고 답하는 에이전트야. 그라파나 대시보드를 보여달라고 요청받으면, grafana_renderer_agent에게 명령을 전달해줘. 그라파나 대시보드 관련 명령인데, 보여달라는 요청 외의 것은 grafana_agent에게 명령을 전달해줘."
+    # Supervisor 그래프
+    supervisor_graph = create_supervisor(
+        agents=agents,
+        model=model_for("supervisor"),
+        pre_model_hook=history_hook,
+        prompt=SUPERVISOR_PROMPT,
+        # passthrough: 에이전트 답변이 마지막 메시지가 되도록 "transfer back" 메시지를 넣지 않음
+        add_handoff_back_messages=not passthrough,
     )
-)
+    if passthrough:
+        _end_on_agent_answers(supervisor_graph, agents)
+    graph_fingerprint = _fingerprint(agents, [*(grafana_tools or []), *(grafana_renderer_tools or [])])
+    # 히스토리 압축 -> (라우터 -> 에이전트 | supervisor) 그래프. 체크포인터는 바깥 그래프에만 연결
+    # 체크포인트에 저장되는 스레드 히스토리는 바깥 그래프에서 압축 (에이전트의 hook은 서브그래프 상태만 바꿈)
+    top = build_top_graph(supervisor_graph.compile(), agents, router, history_node=make_history_node())
+    graph = top.compile(checkpointer=checkpointer)
+    # 노드/LLM/도구 지연 시간과 토큰 수를 Prometheus 메트릭으로 기록
+    return graph.with_config(callbacks=[metrics_callback])
+
+memory_saver = make_memory_saver()
+checkpointer = memory_saver
+
+# 각 워커의 lifespan(init_app_graph)에서 생성
+app_graph = None
+_initialized = False
+_init_lock = asyncio.Lock()
+
+async def init_app_graph():
+    """
+    Open the configured checkpointer, connect the MCP clients once and build
+    this worker's app_graph with the shared Grafana tools. A server that connects
+    later triggers a rebuild that adds its agent. Safe to call more than once and
+    concurrently: later callers wait for the first one, and a failed init is retried
+    by the next call.
+    """
+    global app_graph, checkpointer, _initialized
+    async with _init_lock:
+        if _initialized:
+            return get_app_graph()
+        # 모델 클라이언트와 그래프 모듈 로딩을 스레드에서 MCP 연결/체크포인터 준비와 겹쳐 실행
+        warm_up = asyncio.create_task(asyncio.to_thread(_warm_up))
+        try:
+            checkpointer = await open_checkpointer(memory_saver)
+            thread_expiry.start(lambda: checkpointer)
+            await mcp_registry.start()
+            await warm_up
+            app_graph = _build_with_mcp_tools()
+        except BaseException:
+            # 다음 호출이 처음부터 다시 시도하도록 열어 둔 세션과 체크포인터를 닫음
+            await _close()
+            raise
+        finally:
+            if not warm_up.done():
+                warm_up.cancel()
+            await asyncio.gather(warm_up, return_exceptions=True)
+        # 시작 시점에 연결되지 않은 MCP 서버가 나중에 연결되면 그 에이전트를 포함해 그래프를 다시 생성
+        mcp_registry.add_tools_listener(_on_mcp_tools_added)
+        if settings.checkpointer_prune:
+            # 실행이 끝난 스레드는 최신 체크포인트만 남김
+            run_registry.add_idle_listener(_prune_finished_thread)
+        _initialized = True
+        return app_graph
+
+def _build_with_mcp_tools():
+    return build_app_graph(
+        checkpointer=checkpointer,
+        grafana_tools=mcp_registry.get_tools(GRAFANA_MCP_SERVER),
+        grafana_renderer_tools=mcp_registry.get_tools(GRAFANA_RENDERER_MCP_SERVER),
+    )
+
+def _on_mcp_tools_added(server_name):
+    global app_graph
+    if app_graph is None:
+        return
+    # 실행 중인 요청은 이전 그래프로 끝나고, 이후 요청부터 새 그래프를 사용
+    app_graph = _build_with_mcp_tools()
+    logger.info("Rebuilt app_graph after MCP server '%s' registered new tools.", server_name)
+
+_prune_tasks = set()
+
+def _prune_finished_thread(thread_id):
+    task = asyncio.get_running_loop().create_task(_prune(thread_id))
+    _prune_tasks.add(task)
+    task.add_done_callback(_prune_tasks.discard)
+
+async def _prune(thread_id):
+    try:
+        removed = await prune_thread(checkpointer, thread_id)
+    except Exception as e:
+        logger.warning("Pruning checkpoints of thread %s failed: %s", thread_id, e)
+        return
+    if removed:
+        logger.debug("Pruned %d old checkpoints of thread %s.", removed, thread_id)
+
+async def close_app_graph():
+    """Close the MCP sessions and the checkpointer."""
+    async with _init_lock:
+        await _close()
+
+async def _close():
+    global app_graph, checkpointer, _initialized
+    await job_queue.stop()
+    mcp_registry.remove_tools_listener(_on_mcp_tools_added)
+    run_registry.remove_idle_listener(_prune_finished_thread)
+    if _prune_tasks:
+        await asyncio.gather(*_prune_tasks, return_exceptions=True)
+    await mcp_registry.stop()
+    await thread_expiry.stop()
+    if checkpointer is not memory_saver:
+        await close_checkpointer(checkpointer)
+    checkpointer = memory_saver
+    app_graph = None
+    _initialized = False
+
+async def make_app_graph():
+    """Graph factory for langgraph.json."""
+    return await init_app_graph()
 
-memory_saver = MemorySaver()
+def get_graph_fingerprint():
+    get_app_graph()
+    return graph_fingerprint
 
-app_graph = supervisor_graph.compile()
+def get_app_graph():
+    global app_graph
+    if app_graph is None:
+        # lifespan 없이 사용된 경우: MCP 도구 없이 server_info_agent만 포함된 그래프
+        app_graph = build_app_graph(checkpointer=checkpointer)
+    return app_graph
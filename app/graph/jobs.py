@@ -0,0 +1,350 @@
+import asyncio
+import itertools
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
+
+from app.core.config import settings
+from .runs import RunCancelled, run_registry
+
+logger = logging.getLogger(__name__)
+
+class QueueFull(Exception):
+    """Raised by JobQueue.submit when max_queued jobs are already waiting."""
+
+
+@dataclass
+class Job:
+    thread_id: str
+    graph_input: Any
+    priority: int = 0
+    events: Optional[List[str]] = None
+    include_names: Optional[List[str]] = None
+    job_id: str = field(default_factory=lambda: str(uuid.uuid4()))
+    status: str = "queued"
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Any = None
+    error: Optional[str] = None
+    # Stream events recorded for late subscribers (only when `events` is set)
+    event_log: List[tuple] = field(default_factory=list, repr=False)
+    dropped_events: int = 0
+    changed: asyncio.Condition = field(default_factory=asyncio.Condition, repr=False)
+    task: Optional[asyncio.Task] = field(default=None, repr=False)
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("succeeded", "failed", "cancelled")
+
+    def info(self) -> dict:
+        return {
+            "job_id": self.job_id,
+            "thread_id": self.thread_id,
+            "status": self.status,
+            "priority": self.priority,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+        }
+
+
+# Runs a job and returns its final state; may record stream events on the job.
+JobRunner = Callable[[Job], Awaitable[Any]]
+
+
+class JobStore:
+    """
+    Job status, results and recorded stream events in a SQLite table (WAL, shared by the
+    workers on this host), so any worker can answer /jobs for a job another one runs.
+
+    Results and event data are stored as the bytes the API would send. A worker asks the
+    one running a job to cancel it by setting `cancel_requested`, which the running
+    worker polls.
+    """
+
+    def __init__(self, sqlite_path: str, poll_interval: float):
+        self.sqlite_path = sqlite_path
+        self.poll_interval = poll_interval
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+
+    async def save(self, info: dict, result: Optional[bytes], expires_at: Optional[float]) -> None:
+        await asyncio.to_thread(self._save, info, result, expires_at)
+
+    async def load(self, job_id: str) -> Optional[Tuple[dict, Optional[bytes]]]:
+        return await asyncio.to_thread(self._load, job_id)
+
+    async def add_event(self, job_id: str, seq: int, event: str, data: bytes, keep: int) -> None:
+        await asyncio.to_thread(self._add_event, job_id, seq, event, data, keep)
+
+    async def events(self, job_id: str, after: int) -> List[Tuple[int, str, bytes]]:
+        """Recorded events with seq >= `after`, oldest first."""
+        return await asyncio.to_thread(self._events, job_id, after)
+
+    async def request_cancel(self, job_id: str) -> None:
+        await asyncio.to_thread(self._execute, "UPDATE jobs SET cancel_requested = 1 WHERE job_id = ?", (job_id,))
+
+    async def cancel_requested(self, job_ids: List[str]) -> List[str]:
+        return await asyncio.to_thread(self._cancel_requested, job_ids)
+
+    async def expire(self) -> None:
+        await asyncio.to_thread(self._expire)
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            self._db = sqlite3.connect(self.sqlite_path, check_same_thread=False, timeout=5.0)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS jobs (job_id TEXT PRIMARY KEY, info TEXT NOT NULL, result BLOB, "
+                "cancel_requested INTEGER NOT NULL DEFAULT 0, expires_at REAL)"
+            )
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS job_events (job_id TEXT NOT NULL, seq INTEGER NOT NULL, "
+                "event TEXT NOT NULL, data BLOB NOT NULL, PRIMARY KEY (job_id, seq))"
+            )
+        return self._db
+
+    def _execute(self, sql: str, params: tuple) -> None:
+        with self._db_lock:
+            db = self._connect()
+            db.execute(sql, params)
+            db.commit()
+
+    def _save(self, info: dict, result: Optional[bytes], expires_at: Optional[float]) -> None:
+        self._execute(
+            "INSERT INTO jobs (job_id, info, result, expires_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (job_id) DO UPDATE SET info = excluded.info, result = excluded.result, expires_at = excluded.expires_at",
+            (info["job_id"], json.dumps(info), result, expires_at),
+        )
+
+    def _load(self, job_id: str) -> Optional[Tuple[dict, Optional[bytes]]]:
+        with self._db_lock:
+            row = self._connect().execute(
+                "SELECT info, result FROM jobs WHERE job_id = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (job_id, time.time()),
+            ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1]
+
+    def _add_event(self, job_id: str, seq: int, event: str, data: bytes, keep: int) -> None:
+        with self._db_lock:
+            db = self._connect()
+            db.execute("INSERT INTO job_events (job_id, seq, event, data) VALUES (?, ?, ?, ?)", (job_id, seq, event, data))
+            db.execute("DELETE FROM job_events WHERE job_id = ? AND seq <= ?", (job_id, seq - keep))
+            db.commit()
+
+    def _events(self, job_id: str, after: int) -> List[Tuple[int, str, bytes]]:
+        with self._db_lock:
+            return self._connect().execute(
+                "SELECT seq, event, data FROM job_events WHERE job_id = ? AND seq >= ? ORDER BY seq", (job_id, after)
+            ).fetchall()
+
+    def _cancel_requested(self, job_ids: List[str]) -> List[str]:
+        if not job_ids:
+            return []
+        with self._db_lock:
+            rows = self._connect().execute(
+                f"SELECT job_id FROM jobs WHERE cancel_requested = 1 AND job_id IN ({','.join('?' * len(job_ids))})",
+                job_ids,
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def _expire(self) -> None:
+        with self._db_lock:
+            db = self._connect()
+            db.execute("DELETE FROM jobs WHERE expires_at <= ?", (time.time(),))
+            db.execute("DELETE FROM job_events WHERE job_id NOT IN (SELECT job_id FROM jobs)")
+            db.commit()
+
+
+class JobQueue:
+    """
+    Bounded priority queue of graph runs executed by a fixed pool of worker tasks.
+
+    Higher priority runs first, FIFO within a priority. submit() raises QueueFull
+    once `max_queued` jobs are waiting, so load is shed at admission instead of piling
+    up coroutines. Finished jobs are kept for `result_ttl` seconds (at most
+    `max_retained` of them) so clients can collect their results later.
+
+    With a `store`, every status change, result and recorded event is also written there
+    so the other workers can serve the job (see JobStore).
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        max_queued: int,
+        result_ttl: float,
+        max_retained: int,
+        max_events: int,
+        store: Optional[JobStore] = None,
+    ):
+        self.workers = workers
+        self.max_queued = max_queued
+        self.result_ttl = result_ttl
+        self.max_retained = max_retained
+        self.max_events = max_events
+        self.store = store
+        self._queue: asyncio.PriorityQueue = asyncio.PriorityQueue()
+        self._seq = itertools.count()
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._queued = 0
+        self._workers: List[asyncio.Task] = []
+        self._runner: Optional[JobRunner] = None
+        self._encode: Callable[[Any], bytes] = lambda value: json.dumps(value).encode()
+
+    @property
+    def queued(self) -> int:
+        return self._queued
+
+    @property
+    def running(self) -> int:
+        return sum(1 for job in self._jobs.values() if job.status == "running")
+
+    def start(self, runner: JobRunner, encode: Optional[Callable[[Any], bytes]] = None) -> None:
+        """Start the worker tasks; `encode` turns results and event data into the bytes kept in the store."""
+        if self._workers:
+            return
+        self._runner = runner
+        if encode is not None:
+            self._encode = encode
+        self._workers = [asyncio.create_task(self._work(), name=f"job-worker-{i}") for i in range(self.workers)]
+        if self.store is not None:
+            self._workers.append(asyncio.create_task(self._watch_store(), name="job-store-watcher"))
+
+    async def stop(self) -> None:
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def submit(self, job: Job) -> Job:
+        self._expire()
+        if self._queued >= self.max_queued:
+            raise QueueFull(f"Job queue is full ({self.max_queued} jobs waiting).")
+        self._jobs[job.job_id] = job
+        self._queued += 1
+        await self._persist(job)
+        self._queue.put_nowait((-job.priority, next(self._seq), job))
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        self._expire()
+        return self._jobs.get(job_id)
+
+    async def cancel(self, job: Job) -> bool:
+        """Cancel a queued or running job. Returns False if it already finished."""
+        if job.status == "queued":
+            self._queued -= 1
+            await self._finish(job, "cancelled")
+            return True
+        if job.status == "running" and job.task is not None:
+            return job.task.cancel()
+        return False
+
+    async def record_event(self, job: Job, event: str, data: Any) -> None:
+        if self.store is not None:
+            seq = job.dropped_events + len(job.event_log)
+            await self.store.add_event(job.job_id, seq, event, self._encode(data), keep=self.max_events)
+        if len(job.event_log) >= self.max_events:
+            job.event_log.pop(0)
+            job.dropped_events += 1
+        job.event_log.append((event, data))
+        async with job.changed:
+            job.changed.notify_all()
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "queued": self._queued,
+            "max_queued": self.max_queued,
+            "running": self.running,
+            "retained": len(self._jobs),
+        }
+
+    async def _work(self) -> None:
+        while True:
+            _, _, job = await self._queue.get()
+            if job.status != "queued":  # cancelled while waiting
+                continue
+            self._queued -= 1
+            job.status = "running"
+            job.started_at = time.time()
+            await self._persist(job)
+            job.task = asyncio.create_task(self._runner(job))
+            run_registry.register(job.thread_id, "job", job.task)
+            try:
+                job.result = await job.task
+                await self._finish(job, "succeeded")
+            except RunCancelled:
+                await self._finish(job, "cancelled")
+            except asyncio.CancelledError:
+                await self._finish(job, "cancelled")
+                # Cancelled through cancel() or the run registry: keep this worker alive.
+                if not asyncio.current_task().cancelling():
+                    continue
+                raise
+            except Exception as e:
+                logger.warning("Job %s on thread %s failed: %s", job.job_id, job.thread_id, e)
+                job.error = str(e)
+                await self._finish(job, "failed")
+
+    async def _finish(self, job: Job, status: str) -> None:
+        job.status = status
+        job.finished_at = time.time()
+        await self._persist(job)
+        async with job.changed:
+            job.changed.notify_all()
+
+    async def _persist(self, job: Job) -> None:
+        if self.store is None:
+            return
+        result = self._encode(job.result) if job.status == "succeeded" else None
+        expires_at = job.finished_at + self.result_ttl if job.done else None
+        try:
+            await self.store.save(job.info(), result, expires_at)
+        except Exception as e:
+            logger.warning("Could not store job %s: %s", job.job_id, e)
+
+    async def _watch_store(self) -> None:
+        """Cancel jobs of this worker that another worker asked to cancel, and drop expired ones."""
+        while True:
+            await asyncio.sleep(self.store.poll_interval)
+            try:
+                pending = [job.job_id for job in self._jobs.values() if not job.done]
+                for job_id in await self.store.cancel_requested(pending):
+                    job = self._jobs.get(job_id)
+                    if job is not None:
+                        await self.cancel(job)
+                await self.store.expire()
+            except Exception as e:
+                logger.warning("Job store poll failed: %s", e)
+
+    def _expire(self) -> None:
+        now = time.time()
+        finished = [job for job in self._jobs.values() if job.done]
+        excess = len(finished) - self.max_retained
+        for job in finished:
+            if excess > 0 or now - job.finished_at > self.result_ttl:
+                del self._jobs[job.job_id]
+                excess -= 1
+
+
+job_queue = JobQueue(
+    workers=settings.job_workers,
+    max_queued=settings.job_queue_max_size,
+    result_ttl=settings.job_result_ttl_seconds,
+    max_retained=settings.job_max_retained,
+    max_events=settings.job_max_events,
+    store=JobStore(settings.job_store_sqlite_path, settings.job_store_poll_seconds) if settings.job_store_sqlite_path else None,
+)
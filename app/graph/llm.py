@@ -0,0 +1,132 @@
+import asyncio
+import json
+import time
+import uuid
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+from app.core.config import settings
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Offline chat model for load tests and benchmarks: answers every prompt with
+    `response` after `latency` seconds, streamed at `tokens_per_second` (0: all at
+    once; non-streaming calls wait for the same total time).
+
+    Without `tool_calls` it never calls tools, so the supervisor finishes after a
+    single model call. Otherwise, at the start of a turn it calls every configured
+    tool that is bound to it, and answers once it has seen their results; e.g.
+    transfer_to_grafana_agent for the supervisor and an MCP tool for the agent.
+    """
+
+    response: str = "This is a canned response from the fake LLM."
+    latency: float = 0.0
+    tokens_per_second: float = 0.0
+    tool_calls: List[Dict[str, Any]] = []
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat-model"
+
+    def bind_tools(self, tools: Any, **kwargs: Any):
+        if not self.tool_calls:
+            return self
+        return self.bind(tools=[convert_to_openai_tool(tool) for tool in tools], **kwargs)
+
+    def _tokens(self) -> List[str]:
+        return [token + " " for token in self.response.split(" ")]
+
+    def _delay(self) -> float:
+        """Seconds a non-streaming call takes: latency plus generating the whole response."""
+        if not self.tokens_per_second:
+            return self.latency
+        return self.latency + len(self._tokens()) / self.tokens_per_second
+
+    def _calls_for(self, messages: List[BaseMessage], tools: Optional[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        bound = {tool["function"]["name"] for tool in tools or []}
+        for message in reversed(messages):
+            if isinstance(message, HumanMessage):
+                break
+            if isinstance(message, ToolMessage) and message.name in bound:
+                return [] # this turn's tools already answered
+        return [
+            {"name": call["name"], "args": call.get("args", {}), "id": f"call_{uuid.uuid4().hex[:12]}"}
+            for call in self.tool_calls if call["name"] in bound
+        ]
+
+    def _message(self, messages: List[BaseMessage], tools: Optional[List[Dict[str, Any]]]) -> AIMessage:
+        calls = self._calls_for(messages, tools)
+        if calls:
+            return AIMessage(content="", tool_calls=calls)
+        return AIMessage(content=self.response)
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, tools: Optional[List[Dict[str, Any]]] = None, **kwargs: Any) -> ChatResult:
+        message = self._message(messages, tools)
+        delay = self.latency if message.tool_calls else self._delay()
+        if delay:
+            time.sleep(delay)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, tools: Optional[List[Dict[str, Any]]] = None, **kwargs: Any) -> ChatResult:
+        message = self._message(messages, tools)
+        delay = self.latency if message.tool_calls else self._delay()
+        if delay:
+            await asyncio.sleep(delay)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    @staticmethod
+    def _tool_call_chunk(calls: List[Dict[str, Any]]) -> ChatGenerationChunk:
+        return ChatGenerationChunk(message=AIMessageChunk(content="", tool_call_chunks=[
+            {"name": call["name"], "args": json.dumps(call["args"]), "id": call["id"], "index": i, "type": "tool_call_chunk"}
+            for i, call in enumerate(calls)
+        ]))
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, tools: Optional[List[Dict[str, Any]]] = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        if self.latency:
+            time.sleep(self.latency)
+        calls = self._calls_for(messages, tools)
+        if calls:
+            yield self._tool_call_chunk(calls)
+            return
+        for token in self._tokens():
+            if self.tokens_per_second:
+                time.sleep(1 / self.tokens_per_second)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, tools: Optional[List[Dict[str, Any]]] = None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        calls = self._calls_for(messages, tools)
+        if calls:
+            yield self._tool_call_chunk(calls)
+            return
+        for token in self._tokens():
+            if self.tokens_per_second:
+                await asyncio.sleep(1 / self.tokens_per_second)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+
+def make_llm() -> BaseChatModel:
+    """Create the chat model selected by settings.llm_provider ("gemini" or "fake")."""
+    provider = settings.llm_provider
+    if provider == "gemini":
+        from langchain_google_genai import ChatGoogleGenerativeAI
+
+        return ChatGoogleGenerativeAI(
+            model=settings.llm_model,
+            google_api_key=settings.gemini_api_key,
+            temperature=0
+        )
+    if provider == "fake":
+        return FakeChatModel(
+            response=settings.fake_llm_response,
+            latency=settings.fake_llm_latency,
+            tokens_per_second=settings.fake_llm_tokens_per_second,
+            tool_calls=settings.fake_llm_tool_calls,
+        )
+    raise ValueError(f"Unknown LLM provider: {provider!r} (expected 'gemini' or 'fake')")
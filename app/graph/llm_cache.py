@@ -0,0 +1,312 @@
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, message_to_dict, messages_from_dict
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import ConfigDict
+
+from app.core.config import settings
+from app.core.metrics import cache_lookups
+
+
+class LLMCallCache:
+    """
+    Results of chat model calls keyed by a hash of the prompt, with an in-memory LRU in
+    front of an optional SQLite table (WAL, shared by the workers on this host).
+
+    Identical prompts that arrive while the first one is still running wait for its
+    result instead of calling the model again (single-flight).
+    """
+
+    def __init__(self, maxsize: int, ttl: float, sqlite_path: Optional[str] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.sqlite_path = sqlite_path
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._memory),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "inflight": len(self._inflight),
+        }
+
+    def get(self, key: str) -> Optional[AIMessage]:
+        entry = self._memory.get(key)
+        if entry is not None and entry[1] > time.time():
+            self._memory.move_to_end(key)
+            self.hits += 1
+            cache_lookups.labels("llm", "hit").inc()
+            return entry[0]
+        if entry is not None:
+            del self._memory[key]
+        stored = self._db_get(key) if self.sqlite_path else None
+        if stored is not None:
+            self.disk_hits += 1
+            cache_lookups.labels("llm", "disk_hit").inc()
+            self._remember(key, stored[0], stored[1])
+            return stored[0]
+        return None
+
+    def put(self, key: str, message: AIMessage) -> None:
+        expires_at = time.time() + self.ttl
+        self._remember(key, message, expires_at)
+        if self.sqlite_path:
+            self._db_put(key, message, expires_at)
+
+    async def aget(self, key: str) -> Optional[AIMessage]:
+        if key in self._memory or not self.sqlite_path:
+            return self.get(key)
+        return await asyncio.to_thread(self.get, key)
+
+    async def aput(self, key: str, message: AIMessage) -> None:
+        if not self.sqlite_path:
+            return self.put(key, message)
+        await asyncio.to_thread(self.put, key, message)
+
+    def begin(self, key: str) -> Optional[asyncio.Future]:
+        """
+        Claim an async call for `key`. Returns None when the caller should call the model
+        (and later resolve()), or a future for the result of the call already in flight.
+        """
+        future = self._inflight.get(key)
+        if future is not None:
+            self.coalesced += 1
+            cache_lookups.labels("llm", "coalesced").inc()
+            return future
+        self.misses += 1
+        cache_lookups.labels("llm", "miss").inc()
+        self._inflight[key] = asyncio.get_running_loop().create_future()
+        return None
+
+    def resolve(self, key: str, message: Optional[AIMessage] = None, error: Optional[BaseException] = None) -> None:
+        """
+        Publish the result of a claimed call. A cancelled call resolves to None, which
+        tells the waiters to call the model themselves.
+        """
+        future = self._inflight.pop(key, None)
+        if future is None or future.done():
+            return
+        if isinstance(error, asyncio.CancelledError):
+            future.set_result(None)
+        elif error is not None:
+            future.set_exception(error)
+            # Waiters re-raise it; don't warn about an exception nobody retrieved.
+            future.exception()
+        else:
+            future.set_result(message)
+
+    def _remember(self, key: str, message: AIMessage, expires_at: float) -> None:
+        self._memory[key] = (message, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.maxsize:
+            self._memory.popitem(last=False)
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            self._db = sqlite3.connect(self.sqlite_path, check_same_thread=False, timeout=5.0)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, message TEXT NOT NULL, expires_at REAL NOT NULL)")
+        return self._db
+
+    def _db_get(self, key: str) -> Optional[tuple]:
+        with self._db_lock:
+            row = self._connect().execute(
+                "SELECT message, expires_at FROM llm_cache WHERE key = ? AND expires_at > ?", (key, time.time())
+            ).fetchone()
+        if row is None:
+            return None
+        return messages_from_dict([json.loads(row[0])])[0], row[1]
+
+    def _db_put(self, key: str, message: AIMessage, expires_at: float) -> None:
+        with self._db_lock:
+            db = self._connect()
+            db.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, message, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(message_to_dict(message)), expires_at),
+            )
+            db.commit()
+
+
+def _message_key(message: BaseMessage) -> Dict[str, Any]:
+    # Ids and response metadata differ between otherwise identical prompts.
+    return message.model_dump(exclude={"id", "response_metadata", "usage_metadata"})
+
+
+class CachingChatModel(BaseChatModel):
+    """
+    Wraps a chat model and serves repeated prompts from an LLMCallCache.
+
+    The key covers the wrapped model's parameters, the prompt messages, stop words and
+    bound kwargs such as tool schemas, so a cached answer is only reused for the exact
+    same call. Cached messages get a fresh id and response_metadata["llm_cache"] = "hit".
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    model: BaseChatModel
+    call_cache: LLMCallCache
+
+    @property
+    def _llm_type(self) -> str:
+        return f"caching-{self.model._llm_type}"
+
+    def bind_tools(self, tools: Any, **kwargs: Any):
+        bound = self.model.bind_tools(tools, **kwargs)
+        if bound is self.model:
+            return self
+        if not hasattr(bound, "kwargs"):
+            return bound
+        # Reuse the wrapped model's tool formatting, but keep the calls going through the cache.
+        return self.bind(**bound.kwargs)
+
+    def _key(self, messages: List[BaseMessage], stop: Optional[List[str]], kwargs: Dict[str, Any]) -> str:
+        payload = {
+            "model": [self.model._llm_type, self.model._identifying_params],
+            "messages": [_message_key(m) for m in messages],
+            "stop": stop,
+            "kwargs": kwargs,
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+    @staticmethod
+    def _hit(message: AIMessage) -> AIMessage:
+        return message.model_copy(update={"id": None, "response_metadata": {**message.response_metadata, "llm_cache": "hit"}})
+
+    @staticmethod
+    def _to_store(message: AIMessage) -> AIMessage:
+        return AIMessage(
+            content=message.content,
+            name=message.name,
+            additional_kwargs=message.additional_kwargs,
+            response_metadata=message.response_metadata,
+            tool_calls=message.tool_calls,
+            invalid_tool_calls=message.invalid_tool_calls,
+            usage_metadata=message.usage_metadata,
+        )
+
+    @staticmethod
+    def _to_chunk(message: AIMessage) -> ChatGenerationChunk:
+        return ChatGenerationChunk(message=AIMessageChunk(
+            content=message.content,
+            name=message.name,
+            additional_kwargs=message.additional_kwargs,
+            response_metadata=message.response_metadata,
+            tool_call_chunks=[
+                {"name": call["name"], "args": json.dumps(call["args"]), "id": call["id"], "index": i, "type": "tool_call_chunk"}
+                for i, call in enumerate(message.tool_calls)
+            ],
+            usage_metadata=message.usage_metadata,
+        ))
+
+    def _model_streams(self) -> bool:
+        model_type = type(self.model)
+        return model_type._astream is not BaseChatModel._astream or model_type._stream is not BaseChatModel._stream
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        key = self._key(messages, stop, kwargs)
+        cached = self.call_cache.get(key)
+        if cached is not None:
+            return ChatResult(generations=[ChatGeneration(message=self._hit(cached))])
+        self.call_cache.misses += 1
+        cache_lookups.labels("llm", "miss").inc()
+        result = self.model._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        self.call_cache.put(key, self._to_store(result.generations[0].message))
+        return result
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        key = self._key(messages, stop, kwargs)
+        cached, owner = await self._await_cached(key)
+        if cached is not None:
+            return ChatResult(generations=[ChatGeneration(message=self._hit(cached))])
+        try:
+            result = await self.model._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        except BaseException as e:
+            if owner:
+                self.call_cache.resolve(key, error=e)
+            raise
+        message = self._to_store(result.generations[0].message)
+        if owner:
+            self.call_cache.resolve(key, message)
+        await self.call_cache.aput(key, message)
+        return result
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        result = self._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        yield self._to_chunk(result.generations[0].message)
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        if not self._model_streams():
+            result = await self._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+            yield self._to_chunk(result.generations[0].message)
+            return
+        key = self._key(messages, stop, kwargs)
+        cached, owner = await self._await_cached(key)
+        if cached is not None:
+            yield self._to_chunk(self._hit(cached))
+            return
+        merged: Optional[ChatGenerationChunk] = None
+        try:
+            async for chunk in self.model._astream(messages, stop=stop, run_manager=run_manager, **kwargs):
+                merged = chunk if merged is None else merged + chunk
+                yield chunk
+        except BaseException as e:
+            if owner:
+                self.call_cache.resolve(key, error=e)
+            raise
+        if merged is None:
+            if owner:
+                self.call_cache.resolve(key)
+            return
+        message = self._to_store(merged.message)
+        if owner:
+            self.call_cache.resolve(key, message)
+        await self.call_cache.aput(key, message)
+
+    async def _await_cached(self, key: str):
+        """
+        Returns (message, owner). message is a cached result or the result of an identical
+        call in flight; when it is None the caller calls the model, and resolves the
+        single-flight claim if it is the owner.
+        """
+        cached = await self.call_cache.aget(key)
+        if cached is not None:
+            return cached, False
+        inflight = self.call_cache.begin(key)
+        if inflight is None:
+            return None, True
+        # shield: a cancelled waiter must not cancel the shared result
+        return await asyncio.shield(inflight), False
+
+
+llm_call_cache = LLMCallCache(
+    maxsize=settings.llm_cache_size,
+    ttl=settings.llm_cache_ttl,
+    sqlite_path=settings.llm_cache_sqlite_path,
+)
+
+
+def with_llm_cache(model: BaseChatModel) -> BaseChatModel:
+    """Wrap `model` in the shared LLM call cache, unless it is disabled (LLM_CACHE_SIZE=0)."""
+    if settings.llm_cache_size <= 0:
+        return model
+    return CachingChatModel(model=model, call_cache=llm_call_cache)
@@ -0,0 +1,243 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, List
+
+from langchain_core.tools import BaseTool, StructuredTool, ToolException
+
+from app.core.config import settings
+from .grafana_mcp_agent import GRAFANA_MCP_SERVER, get_grafana_mcp_connection
+from .grafana_renderer_mcp_agent import GRAFANA_RENDERER_MCP_SERVER, get_grafana_renderer_mcp_connection
+
+logger = logging.getLogger(__name__)
+
+
+class MCPClientRegistry:
+    """
+    Keeps one long-lived session per MCP server for the lifetime of the app.
+
+    Each server runs in its own task that opens the session, discovers the tools
+    once and reconnects with exponential backoff when the session drops. Agents get
+    stable proxy tools that always call through the current session, so a reconnect
+    does not require rebuilding the graph. Listeners added with add_tools_listener()
+    are called when a server's tool set grows, e.g. when it first connects after
+    startup, so the graph can add the agents that use it.
+
+    Tool calls share the server's session and run concurrently, at most
+    `max_concurrent_calls` per server (0: no cap). Each call is bounded by
+    `tool_timeouts[tool]` or `tool_timeout` seconds (0: no timeout).
+    """
+
+    def __init__(
+        self,
+        connections: Dict[str, Dict[str, Any]],
+        connect_timeout: float = 10.0,
+        initial_backoff: float = 1.0,
+        max_backoff: float = 30.0,
+        health_check_interval: float = 30.0,
+        max_concurrent_calls: int = 0,
+        tool_timeout: float = 0.0,
+        tool_timeouts: Dict[str, float] | None = None,
+    ):
+        self.connections = connections
+        self.connect_timeout = connect_timeout
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.health_check_interval = health_check_interval
+        self.max_concurrent_calls = max_concurrent_calls
+        self.tool_timeout = tool_timeout
+        self.tool_timeouts = tool_timeouts or {}
+        self._client = None # created in start(); the MCP client stack is slow to import
+        self._live_tools: Dict[str, Dict[str, BaseTool]] = {}
+        self._proxy_tools: Dict[str, Dict[str, BaseTool]] = {}
+        self._ready: Dict[str, asyncio.Event] = {}
+        self._wake: Dict[str, asyncio.Event] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._call_slots: Dict[str, asyncio.Semaphore] = {
+            name: asyncio.Semaphore(max_concurrent_calls) for name in connections
+        } if max_concurrent_calls > 0 else {}
+        self._tools_listeners: List[Callable[[str], None]] = []
+        self._stopping = False
+
+    @property
+    def started(self) -> bool:
+        return bool(self._tasks)
+
+    def is_connected(self, server_name: str) -> bool:
+        return server_name in self._live_tools
+
+    async def start(self) -> None:
+        """Connect to every configured server and wait (bounded) for tool discovery."""
+        if self.started:
+            return
+        self._stopping = False
+        if self.connections and self._client is None:
+            from langchain_mcp_adapters.client import MultiServerMCPClient
+
+            self._client = MultiServerMCPClient(self.connections)
+        for server_name in self.connections:
+            self._ready[server_name] = asyncio.Event()
+            self._wake[server_name] = asyncio.Event()
+            self._tasks[server_name] = asyncio.create_task(
+                self._serve(server_name), name=f"mcp-session-{server_name}"
+            )
+        await asyncio.gather(*(self._wait_ready(name) for name in self.connections))
+
+    async def stop(self) -> None:
+        """Close all sessions."""
+        self._stopping = True
+        for event in self._wake.values():
+            event.set()
+        if self._tasks:
+            await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+        self._tasks.clear()
+        self._live_tools.clear()
+
+    def get_tools(self, server_name: str) -> List[BaseTool]:
+        """Return the proxy tools discovered for a server (empty if it never connected)."""
+        return list(self._proxy_tools.get(server_name, {}).values())
+
+    def add_tools_listener(self, listener: Callable[[str], None]) -> None:
+        """Call `listener(server_name)` whenever new proxy tools are registered for a server."""
+        if listener not in self._tools_listeners:
+            self._tools_listeners.append(listener)
+
+    def remove_tools_listener(self, listener: Callable[[str], None]) -> None:
+        if listener in self._tools_listeners:
+            self._tools_listeners.remove(listener)
+
+    def request_reconnect(self, server_name: str) -> None:
+        """Drop the current session of a server and reconnect in the background."""
+        if server_name in self._wake and not self._stopping:
+            self._wake[server_name].set()
+
+    async def _wait_ready(self, server_name: str) -> None:
+        try:
+            await asyncio.wait_for(self._ready[server_name].wait(), timeout=self.connect_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(
+                "MCP server '%s' did not become ready within %.1fs; its tools are unavailable until it connects.",
+                server_name,
+                self.connect_timeout,
+            )
+
+    async def _serve(self, server_name: str) -> None:
+        from langchain_mcp_adapters.tools import load_mcp_tools
+
+        backoff = self.initial_backoff
+        while not self._stopping:
+            try:
+                async with self._client.session(server_name) as session:
+                    tools = await load_mcp_tools(session, server_name=server_name)
+                    self._live_tools[server_name] = {tool.name: tool for tool in tools}
+                    self._register_proxies(server_name, tools)
+                    self._ready[server_name].set()
+                    backoff = self.initial_backoff
+                    logger.info("Connected to MCP server '%s' (%d tools).", server_name, len(tools))
+                    await self._watch_session(server_name, session)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("MCP server '%s' session failed: %s", server_name, e)
+            finally:
+                self._live_tools.pop(server_name, None)
+                self._wake[server_name].clear()
+
+            if self._stopping:
+                break
+            logger.info("Reconnecting to MCP server '%s' in %.1fs.", server_name, backoff)
+            try:
+                await asyncio.wait_for(self._wake[server_name].wait(), timeout=backoff)
+            except asyncio.TimeoutError:
+                pass
+            backoff = min(backoff * 2, self.max_backoff)
+
+    async def _watch_session(self, server_name: str, session) -> None:
+        """Return when a reconnect is requested or the server stops answering pings."""
+        while True:
+            try:
+                await asyncio.wait_for(self._wake[server_name].wait(), timeout=self.health_check_interval)
+                return
+            except asyncio.TimeoutError:
+                pass
+            try:
+                await asyncio.wait_for(session.send_ping(), timeout=self.connect_timeout)
+            except Exception as e:
+                logger.warning("MCP server '%s' failed health check: %s", server_name, e)
+                return
+
+    def _register_proxies(self, server_name: str, tools: List[BaseTool]) -> None:
+        proxies = self._proxy_tools.setdefault(server_name, {})
+        added = [tool for tool in tools if tool.name not in proxies]
+        for tool in added:
+            proxies[tool.name] = self._make_proxy(server_name, tool)
+        if not added:
+            return
+        for listener in list(self._tools_listeners):
+            try:
+                listener(server_name)
+            except Exception:
+                logger.exception("MCP tools listener failed for server '%s'.", server_name)
+
+    def _make_proxy(self, server_name: str, tool: BaseTool) -> BaseTool:
+        async def call_tool(**arguments: Any):
+            return await self._call_tool(server_name, tool.name, arguments)
+
+        return StructuredTool(
+            name=tool.name,
+            description=tool.description,
+            args_schema=tool.args_schema,
+            coroutine=call_tool,
+            response_format=tool.response_format,
+            metadata={**(tool.metadata or {}), "mcp_server": server_name},
+        )
+
+    async def _call_tool(self, server_name: str, tool_name: str, arguments: Dict[str, Any]):
+        live_tools = self._live_tools.get(server_name)
+        if live_tools is None or tool_name not in live_tools:
+            raise ToolException(f"MCP server '{server_name}' is not connected; try again shortly.")
+        timeout = self.tool_timeouts.get(tool_name, self.tool_timeout)
+        async with self._call_slot(server_name):
+            try:
+                return await asyncio.wait_for(live_tools[tool_name].coroutine(**arguments), timeout=timeout or None)
+            except asyncio.TimeoutError:
+                raise ToolException(
+                    f"Tool '{tool_name}' on MCP server '{server_name}' did not answer within {timeout:g}s."
+                ) from None
+            except ToolException:
+                raise
+            except Exception:
+                # Transport-level failure: reconnect so the next call gets a fresh session.
+                self.request_reconnect(server_name)
+                raise
+
+    @asynccontextmanager
+    async def _call_slot(self, server_name: str):
+        slots = self._call_slots.get(server_name)
+        if slots is None:
+            yield
+            return
+        async with slots:
+            yield
+
+
+def build_mcp_connections() -> Dict[str, Dict[str, Any]]:
+    """Connection settings for every MCP server configured in Settings."""
+    connections = {}
+    if settings.grafana_mcp_url:
+        connections[GRAFANA_MCP_SERVER] = get_grafana_mcp_connection(settings.grafana_mcp_url)
+    if settings.grafana_renderer_mcp_url:
+        connections[GRAFANA_RENDERER_MCP_SERVER] = get_grafana_renderer_mcp_connection(settings.grafana_renderer_mcp_url)
+    return connections
+
+
+mcp_registry = MCPClientRegistry(
+    build_mcp_connections(),
+    connect_timeout=settings.mcp_connect_timeout,
+    initial_backoff=settings.mcp_reconnect_initial_backoff,
+    max_backoff=settings.mcp_reconnect_max_backoff,
+    health_check_interval=settings.mcp_health_check_interval,
+    max_concurrent_calls=settings.mcp_max_concurrent_calls,
+    tool_timeout=settings.mcp_tool_timeout,
+    tool_timeouts=settings.mcp_tool_timeouts,
+)
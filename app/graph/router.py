@@ -0,0 +1,249 @@
+import logging
+import math
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.messages import HumanMessage, RemoveMessage
+
+from app.core.config import settings
+from app.core.metrics import fast_path_decisions
+from .history import HISTORY_NODE
+
+logger = logging.getLogger(__name__)
+
+# Node of the top-level graph that runs the whole supervisor graph
+SUPERVISOR_NODE = "supervisor_graph"
+# Supervisor model calls a routed question skips, per ANSWER_MODE: one to hand off,
+# and (unless the agent's answer ends the run) one after the agent returns.
+SUPERVISOR_CALLS_PER_ROUTE = {"supervisor": 2, "passthrough": 1}
+# The best embedding match must beat the best match of any other agent by this much.
+SIMILARITY_MARGIN = 0.05
+
+
+@dataclass
+class RouteRule:
+    agent: str
+    patterns: List[str] = field(default_factory=list) # regex, case-insensitive
+    examples: List[str] = field(default_factory=list) # questions compared by embedding similarity
+
+    def __post_init__(self):
+        self._compiled = [re.compile(p, re.IGNORECASE) for p in self.patterns]
+
+    def matches(self, text: str) -> Optional[str]:
+        """The first pattern that matches `text`, or None."""
+        for pattern in self._compiled:
+            if pattern.search(text):
+                return pattern.pattern
+        return None
+
+
+# SUPERVISOR_PROMPT의 라우팅 규칙 중 모호하지 않은 것만
+DEFAULT_RULES = [
+    RouteRule(
+        agent="server_info_agent",
+        patterns=[r"서버\s*정보", r"\bserver\s*info(rmation)?\b"],
+        examples=["서버 정보 알려줘", "서버 정보가 뭐야?", "What is the server info?"],
+    ),
+    RouteRule(
+        agent="grafana_renderer_agent",
+        patterns=[r"(대시보드|패널).*(보여|렌더링|그려)", r"\b(show|render|display)\b.*\b(dashboard|panel)s?\b"],
+        examples=["대시보드 보여줘", "CPU 패널 그려줘", "Show me the dashboard"],
+    ),
+]
+
+
+@dataclass
+class RouteDecision:
+    agent: str
+    method: str # "regex" or "embedding"
+    detail: str # matched pattern or similarity score
+
+
+class FastPathRouter:
+    """
+    Routes obvious questions straight to an agent so the supervisor model is not
+    called at all. A question is routed when the regex rules of exactly one agent
+    match it, or, with an embedding model, when its closest example belongs to one
+    agent with a similarity of at least `threshold` (and clearly ahead of the other
+    agents). Everything else goes to the supervisor.
+    """
+
+    def __init__(
+        self,
+        rules: List[RouteRule],
+        embeddings: Optional[Embeddings] = None,
+        threshold: float = 0.85,
+        calls_saved_per_route: int = SUPERVISOR_CALLS_PER_ROUTE["supervisor"],
+    ):
+        self.rules = rules
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.calls_saved_per_route = calls_saved_per_route
+        self._example_vectors: Optional[List[tuple]] = None
+        self.routed: Counter = Counter()
+        self.fallbacks = 0
+        self.llm_calls_saved = 0
+
+    def describe(self) -> List[Dict[str, Any]]:
+        return [{"agent": r.agent, "patterns": r.patterns, "examples": r.examples if self.embeddings else []} for r in self.rules]
+
+    def stats(self) -> dict:
+        return {
+            "routed": dict(self.routed),
+            "fallbacks": self.fallbacks,
+            "llm_calls_saved": self.llm_calls_saved,
+        }
+
+    async def route(self, text: str, agents: Iterable[str]) -> Optional[RouteDecision]:
+        """The agent to send `text` to, or None to use the supervisor."""
+        agents = set(agents)
+        rules = [rule for rule in self.rules if rule.agent in agents]
+        decision = self._match_patterns(text, rules)
+        if decision is None and self.embeddings is not None:
+            try:
+                decision = await self._match_examples(text, rules)
+            except Exception as e:
+                logger.warning("Fast-path embedding lookup failed, using the supervisor: %s", e)
+        if decision is None:
+            self.fallbacks += 1
+            fast_path_decisions.labels("supervisor").inc()
+            logger.info("Fast path: no confident match, routing to the supervisor.")
+            return None
+        self.routed[decision.agent] += 1
+        fast_path_decisions.labels(decision.agent).inc()
+        self.llm_calls_saved += self.calls_saved_per_route
+        logger.info(
+            "Fast path: routed to %s by %s (%s), skipped %d supervisor LLM calls (%d saved so far).",
+            decision.agent, decision.method, decision.detail, self.calls_saved_per_route, self.llm_calls_saved,
+        )
+        return decision
+
+    @staticmethod
+    def _match_patterns(text: str, rules: List[RouteRule]) -> Optional[RouteDecision]:
+        matches = {}
+        for rule in rules:
+            pattern = rule.matches(text)
+            if pattern is not None:
+                matches.setdefault(rule.agent, pattern)
+        if len(matches) != 1:
+            # Nothing matched, or several agents did and the supervisor has to decide.
+            return None
+        agent, pattern = next(iter(matches.items()))
+        return RouteDecision(agent=agent, method="regex", detail=pattern)
+
+    async def _match_examples(self, text: str, rules: List[RouteRule]) -> Optional[RouteDecision]:
+        if self._example_vectors is None:
+            examples = [(rule.agent, example) for rule in self.rules for example in rule.examples]
+            vectors = await self.embeddings.aembed_documents([example for _, example in examples]) if examples else []
+            self._example_vectors = [(agent, vector) for (agent, _), vector in zip(examples, vectors)]
+        agents = {rule.agent for rule in rules}
+        best: Dict[str, float] = {}
+        query = await self.embeddings.aembed_query(text)
+        for agent, vector in self._example_vectors:
+            if agent in agents:
+                best[agent] = max(best.get(agent, -1.0), _cosine(query, vector))
+        if not best:
+            return None
+        ranked = sorted(best.items(), key=lambda item: item[1], reverse=True)
+        agent, score = ranked[0]
+        runner_up = ranked[1][1] if len(ranked) > 1 else -1.0
+        if score < self.threshold or score - runner_up < SIMILARITY_MARGIN:
+            return None
+        return RouteDecision(agent=agent, method="embedding", detail=f"similarity {score:.3f}")
+
+
+def _cosine(a: List[float], b: List[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+def make_embeddings() -> Optional[Embeddings]:
+    """Embedding model for the similarity rules, or None when FAST_PATH_EMBEDDING_MODEL is unset."""
+    if not settings.fast_path_embedding_model or settings.llm_provider != "gemini":
+        return None
+    from langchain_google_genai import GoogleGenerativeAIEmbeddings
+
+    return GoogleGenerativeAIEmbeddings(
+        model=settings.fast_path_embedding_model,
+        google_api_key=settings.gemini_api_key,
+    )
+
+
+def make_router() -> Optional[FastPathRouter]:
+    """The router configured in settings, or None when the fast path is disabled."""
+    if not settings.fast_path_enabled:
+        return None
+    rules = DEFAULT_RULES + [RouteRule(**rule) for rule in settings.fast_path_rules]
+    return FastPathRouter(
+        rules,
+        embeddings=make_embeddings(),
+        threshold=settings.fast_path_similarity_threshold,
+        calls_saved_per_route=SUPERVISOR_CALLS_PER_ROUTE.get(settings.answer_mode, SUPERVISOR_CALLS_PER_ROUTE["supervisor"]),
+    )
+
+
+def _latest_question(messages: List[Any]) -> Optional[str]:
+    if not messages or not isinstance(messages[-1], HumanMessage) or not isinstance(messages[-1].content, str):
+        return None
+    return messages[-1].content
+
+
+def build_top_graph(supervisor_graph, agents: List[Any], router: Optional[FastPathRouter] = None, history_node=None):
+    """
+    Build the top-level graph around the compiled supervisor graph, which runs as a node.
+
+    `history_node` (see make_history_node) runs first and compacts the thread. With a
+    `router`, routed questions then run the agent alone and end with its final message,
+    like the supervisor's "last_message" output; everything else runs the supervisor.
+    """
+    from langchain_core.runnables import RunnableConfig
+    from langgraph.graph import END, START, MessagesState, StateGraph
+    from langgraph.graph.message import REMOVE_ALL_MESSAGES
+
+    builder = StateGraph(MessagesState)
+
+    async def run_supervisor(state: MessagesState, config: RunnableConfig):
+        result = await supervisor_graph.ainvoke({"messages": state["messages"]}, config)
+        # The result is the whole history plus this turn; replace the list instead of appending to it.
+        return {"messages": [RemoveMessage(id=REMOVE_ALL_MESSAGES), *result["messages"]]}
+
+    builder.add_node(SUPERVISOR_NODE, run_supervisor)
+    builder.add_edge(SUPERVISOR_NODE, END)
+
+    entry = START
+    if history_node is not None:
+        builder.add_node(HISTORY_NODE, history_node)
+        builder.add_edge(START, HISTORY_NODE)
+        entry = HISTORY_NODE
+
+    if router is None:
+        builder.add_edge(entry, SUPERVISOR_NODE)
+        return builder
+
+    def make_agent_node(agent):
+        async def run_agent(state: MessagesState, config: RunnableConfig):
+            result = await agent.ainvoke({"messages": state["messages"]}, config)
+            return {"messages": [result["messages"][-1]]}
+        return run_agent
+
+    for agent in agents:
+        builder.add_node(agent.name, make_agent_node(agent))
+        builder.add_edge(agent.name, END)
+
+    agent_names = [agent.name for agent in agents]
+
+    async def pre_route(state: MessagesState) -> str:
+        question = _latest_question(state["messages"])
+        if question is None:
+            return SUPERVISOR_NODE
+        decision = await router.route(question, agent_names)
+        return decision.agent if decision else SUPERVISOR_NODE
+
+    builder.add_conditional_edges(entry, pre_route, [SUPERVISOR_NODE, *agent_names])
+    return builder
+
+router = make_router()
@@ -0,0 +1,105 @@
+import asyncio
+import logging
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+from app.core.metrics import runs_in_flight
+
+logger = logging.getLogger(__name__)
+
+
+class RunCancelled(Exception):
+    """Raised in place of the result of a run that was cancelled through the run registry."""
+
+
+@dataclass
+class Run:
+    thread_id: str
+    kind: str  # "invoke", "stream", "ws", "resume", ...
+    task: asyncio.Task
+    run_id: str = field(default_factory=lambda: str(uuid.uuid4()))
+    started_at: float = field(default_factory=time.time)
+    _started_monotonic: float = field(default_factory=time.monotonic, repr=False)
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self._started_monotonic
+
+    def info(self) -> dict:
+        return {
+            "run_id": self.run_id,
+            "thread_id": self.thread_id,
+            "kind": self.kind,
+            "started_at": self.started_at,
+            "elapsed_seconds": round(self.elapsed, 3),
+        }
+
+
+class RunRegistry:
+    """
+    Active graph runs of this worker, keyed by run id and indexed by thread_id.
+    Runs remove themselves when their task finishes; idle listeners are then called
+    with the thread_id if no other run of that thread is active.
+    """
+
+    def __init__(self):
+        self._runs: Dict[str, Run] = {}
+        self._idle_listeners: List[Callable[[str], None]] = []
+
+    def add_idle_listener(self, listener: Callable[[str], None]) -> None:
+        if listener not in self._idle_listeners:
+            self._idle_listeners.append(listener)
+
+    def remove_idle_listener(self, listener: Callable[[str], None]) -> None:
+        if listener in self._idle_listeners:
+            self._idle_listeners.remove(listener)
+
+    def register(self, thread_id: str, kind: str, task: asyncio.Task) -> Run:
+        run = Run(thread_id=thread_id, kind=kind, task=task)
+        self._runs[run.run_id] = run
+        runs_in_flight.labels(kind).inc()
+        task.add_done_callback(lambda _: self._remove(run))
+        return run
+
+    def _remove(self, run: Run) -> None:
+        if self._runs.pop(run.run_id, None) is None:
+            return
+        runs_in_flight.labels(run.kind).dec()
+        if any(other.thread_id == run.thread_id for other in self._runs.values()):
+            return
+        for listener in list(self._idle_listeners):
+            try:
+                listener(run.thread_id)
+            except Exception:
+                logger.exception("Run idle listener failed for thread %s.", run.thread_id)
+
+    async def run(self, coro, thread_id: str, kind: str):
+        """Run `coro` as a registered task and return its result; raises RunCancelled if it is cancelled."""
+        task = asyncio.create_task(coro)
+        self.register(thread_id, kind, task)
+        try:
+            return await task
+        except asyncio.CancelledError:
+            # Only translate cancellations that came from cancel(), not from our own caller.
+            if task.cancelled() and not asyncio.current_task().cancelling():
+                raise RunCancelled(f"Run on thread '{thread_id}' was cancelled.") from None
+            raise
+
+    def list(self, thread_id: Optional[str] = None) -> List[Run]:
+        return [run for run in self._runs.values() if thread_id is None or run.thread_id == thread_id]
+
+    def cancel(self, thread_id: str, run_id: Optional[str] = None) -> List[Run]:
+        """Cancel the active runs of a thread (or one of them). Returns the cancelled runs."""
+        cancelled = []
+        for run in self.list(thread_id):
+            if run_id is not None and run.run_id != run_id:
+                continue
+            if run.task.cancel():
+                cancelled.append(run)
+                logger.info("Cancelled %s run %s of thread %s after %.1fs.", run.kind, run.run_id, thread_id, run.elapsed)
+        return cancelled
+
+
+run_registry = RunRegistry()
@@ -0,0 +1,94 @@
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Callable, Dict, Optional, Set
+
+from langgraph.checkpoint.base import BaseCheckpointSaver
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class ThreadExpiry:
+    """
+    Deletes the checkpoints of threads that have been idle for longer than `ttl` seconds.
+
+    Every sweep lists the threads stored in the checkpointer, so threads written by
+    other workers or before a restart expire too. Before a thread is deleted its latest
+    checkpoint timestamp is checked, so a thread that another worker is still using
+    survives. The last activity seen per thread skips that lookup for recent threads.
+    """
+
+    def __init__(self, ttl: float, sweep_interval: float = 300.0):
+        self.ttl = ttl
+        self.sweep_interval = sweep_interval
+        self._last_seen: Dict[str, float] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.expired_threads = 0
+
+    def touch(self, thread_id: str) -> None:
+        self._last_seen[thread_id] = time.time()
+
+    def start(self, get_checkpointer: Callable[[], BaseCheckpointSaver]) -> None:
+        if self.ttl <= 0 or self._task is not None:
+            return
+        self._task = asyncio.create_task(self._run(get_checkpointer), name="thread-expiry")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def sweep(self, checkpointer: BaseCheckpointSaver) -> int:
+        """Delete idle threads now. Returns the number of deleted threads."""
+        cutoff = time.time() - self.ttl
+        stored = await stored_thread_ids(checkpointer)
+        for thread_id in set(self._last_seen) - stored:
+            del self._last_seen[thread_id]
+        expired = 0
+        for thread_id in stored:
+            if self._last_seen.get(thread_id, 0.0) > cutoff:
+                continue
+            latest = await checkpointer.aget_tuple({"configurable": {"thread_id": thread_id}})
+            if latest is None:
+                continue
+            updated_at = datetime.fromisoformat(latest.checkpoint["ts"]).timestamp()
+            if updated_at > cutoff:
+                self._last_seen[thread_id] = updated_at
+                continue
+            await checkpointer.adelete_thread(thread_id)
+            self._last_seen.pop(thread_id, None)
+            expired += 1
+        if expired:
+            self.expired_threads += expired
+            logger.info("Expired %d idle threads.", expired)
+        return expired
+
+    async def _run(self, get_checkpointer: Callable[[], BaseCheckpointSaver]) -> None:
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                await self.sweep(get_checkpointer())
+            except Exception as e:
+                logger.warning("Thread expiry sweep failed: %s", e)
+
+
+async def stored_thread_ids(checkpointer: BaseCheckpointSaver) -> Set[str]:
+    """Ids of every thread that has checkpoints, without loading the checkpoints where possible."""
+    storage = getattr(checkpointer, "storage", None)
+    if storage is not None:
+        # MemorySaver (and LRUMemorySaver): thread_id -> namespaces -> checkpoints
+        return set(storage)
+    conn = getattr(checkpointer, "conn", None)
+    lock = getattr(checkpointer, "lock", None)
+    if conn is not None and isinstance(lock, asyncio.Lock):
+        # AsyncSqliteSaver: one query instead of deserializing every checkpoint
+        async with lock, conn.execute("SELECT DISTINCT thread_id FROM checkpoints") as cursor:
+            return {row[0] async for row in cursor}
+    return {item.config["configurable"]["thread_id"] async for item in checkpointer.alist(None)}
+
+
+thread_expiry = ThreadExpiry(ttl=settings.thread_ttl_seconds, sweep_interval=settings.thread_sweep_interval)
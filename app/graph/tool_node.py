@@ -0,0 +1,27 @@
+from typing import List
+
+from langchain_core.tools import BaseTool, ToolException
+
+
+def _tool_error_message(e: Exception) -> str:
+    from langgraph.prebuilt.tool_node import ToolInvocationError
+
+    # Failed, timed-out or unavailable MCP calls go back to the model; anything else is a bug.
+    if isinstance(e, (ToolException, ToolInvocationError)):
+        return f"Error: {getattr(e, 'message', None) or e}"
+    raise e
+
+
+def make_tool_node(tools: List[BaseTool]):
+    """
+    Tool node for the MCP agents.
+
+    create_react_agent runs every tool call of one model message as its own task, so
+    independent calls (e.g. several get_panel_data) run concurrently; the MCP registry
+    caps them per server and bounds each call with a timeout. A call that fails or
+    times out becomes an error ToolMessage for that call only, so its siblings still
+    return and the model can retry or answer with what it has.
+    """
+    from langgraph.prebuilt import ToolNode
+
+    return ToolNode(tools, handle_tool_errors=_tool_error_message)
@@ -1,12 +1,24 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.api.v1 import router as api_v1_router
+from app.core.metrics import MetricsMiddleware
+from app.graph import init_app_graph, close_app_graph
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Open the MCP sessions and discover tools once, then share them across requests
+    await init_app_graph()
+    yield
+    await close_app_graph()
 
 app = FastAPI(
     title="LangGraph Agent API",
     version="0.1.0",
-    description="API for serving a LangGraph agent."
+    description="API for serving a LangGraph agent.",
+    lifespan=lifespan
 )
 
 # CORS Middleware (optional, useful for web frontends on different origins)
@@ -18,6 +30,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request latency histogram for /api/v1/metrics
+app.add_middleware(MetricsMiddleware)
+
 app.include_router(api_v1_router, prefix="/api/v1")
 
 @app.get("/")
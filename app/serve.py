@@ -0,0 +1,30 @@
+"""
+Multi-process entrypoint: `python -m app.serve`.
+
+Each worker process imports app.main and builds its own graph, LLM client and MCP
+sessions in the lifespan hook. Thread state must live in a store every worker can
+read, so more than one worker requires CHECKPOINTER_BACKEND=sqlite.
+"""
+import logging
+
+import uvicorn
+
+from app.core.config import settings
+from app.core.metrics import reset_multiproc_dir
+
+logger = logging.getLogger(__name__)
+
+
+def main():
+    workers = max(settings.web_concurrency, 1)
+    if workers > 1 and settings.checkpointer_backend == "memory":
+        raise SystemExit(
+            "WEB_CONCURRENCY > 1 needs a shared checkpointer: set CHECKPOINTER_BACKEND=sqlite "
+            "so any worker can resume any thread_id."
+        )
+    reset_multiproc_dir()
+    uvicorn.run("app.main:app", host=settings.host, port=settings.port, workers=workers)
+
+
+if __name__ == "__main__":
+    main()
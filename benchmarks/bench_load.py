@@ -0,0 +1,392 @@
+"""
+Offline load benchmark of the graph and the streaming API.
+
+Starts a stub Grafana (benchmarks/stub_grafana.py), grafana_mcp_server.py in front
+of it (used for both GRAFANA_MCP_URL and GRAFANA_RENDERER_MCP_URL) and
+`python -m app.serve` with the fake LLM. The fake LLM is scripted so every
+question takes the full supervisor path: the supervisor hands off to
+grafana_agent, which calls get_dashboard_data through MCP, answers, and the
+supervisor answers again (not with --answer-mode passthrough). Model latency and
+token rate are configurable.
+
+For every target (app_graph in this process, /invocations, /stream, /ws/stream)
+and concurrency level it sends --requests questions, each on a new thread, from
+`concurrency` clients, and reports throughput, p50/p95/p99 latency, time to the
+first token and the resident memory each new thread adds to the serving process.
+
+Results are compared with a stored baseline (benchmarks/baseline.json); the run
+exits with status 1 when throughput dropped or latency, time to first token or
+memory per thread grew by more than the tolerance, or a request failed. The
+baseline is only comparable on the same host and with the same workload options.
+
+    python benchmarks/bench_load.py
+    python benchmarks/bench_load.py --targets stream ws --concurrency 1 8 32
+    python benchmarks/bench_load.py --save-baseline
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+import uuid
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MCP_DIR = os.path.join(ROOT, "mcp", "grafana", "dashboardview")
+DEFAULT_BASELINE = os.path.join(ROOT, "benchmarks", "baseline.json")
+
+TARGETS = ("graph", "invocations", "stream", "ws")
+# Must not match a fast-path rule, so the supervisor routes it.
+QUESTION = "How did CPU usage on the bench-1 dashboard change in the last hour?"
+# (metric, higher is better) checked against the baseline
+COMPARED = (("rps", True), ("p95_ms", False), ("ttft_p50_ms", False), ("mem_per_thread_kib", False))
+# Options that change the workload; a baseline recorded with other values is not comparable.
+WORKLOAD_OPTIONS = ("requests", "llm_latency", "tokens_per_second", "response_tokens", "grafana_latency", "points", "answer_mode")
+
+
+def fake_llm_env(args) -> Dict[str, str]:
+    tool_calls = [
+        {"name": "transfer_to_grafana_agent"},
+        {"name": "get_dashboard_data", "args": {"dashboard_uid": "bench-1", "time_range": {"from": "now-1h", "to": "now"}}},
+    ]
+    return {
+        "LLM_PROVIDER": "fake",
+        "FAKE_LLM_LATENCY": str(args.llm_latency),
+        "FAKE_LLM_TOKENS_PER_SECOND": str(args.tokens_per_second),
+        "FAKE_LLM_RESPONSE": " ".join(f"token{i}" for i in range(args.response_tokens)),
+        "FAKE_LLM_TOOL_CALLS": json.dumps(tool_calls),
+    }
+
+
+def app_env(args) -> Dict[str, str]:
+    mcp_url = f"http://127.0.0.1:{args.mcp_port}"
+    return {
+        **os.environ,
+        **fake_llm_env(args),
+        "GRAFANA_MCP_URL": mcp_url,
+        "GRAFANA_RENDERER_MCP_URL": mcp_url,
+        "ANSWER_MODE": args.answer_mode,
+        # Measure the graph, not the caches or the per-client limits.
+        "LLM_CACHE_SIZE": "0",
+        "RATE_LIMIT_PER_MINUTE": "0",
+        "MAX_IN_FLIGHT_RUNS": "0",
+        "CHECKPOINTER_BACKEND": "memory",
+        "WEB_CONCURRENCY": "1",
+        "HOST": "127.0.0.1",
+        "PORT": str(args.port),
+        "PYTHONPATH": ROOT,
+    }
+
+
+def spawn(command: List[str], cwd: str, env: Dict[str, str]) -> subprocess.Popen:
+    return subprocess.Popen(command, cwd=cwd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def stop(process: subprocess.Popen) -> None:
+    process.terminate()
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+async def wait_ready(url: str, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(timeout=1) as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get(url)).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.1)
+    raise RuntimeError(f"{url} did not become ready")
+
+
+def rss_kib(pid: int) -> Optional[int]:
+    """Resident memory of a process (Linux only)."""
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def percentile(samples: List[float], q: float) -> Optional[float]:
+    if not samples:
+        return None
+    samples = sorted(samples)
+    return samples[min(int(len(samples) * q), len(samples) - 1)]
+
+
+# Each session factory yields run(thread_id) -> seconds to the first token (or None), for one client.
+
+@asynccontextmanager
+async def graph_session(graph):
+    from langchain_core.messages import HumanMessage
+
+    async def run(thread_id: str) -> Optional[float]:
+        started, ttft = time.perf_counter(), None
+        config = {"configurable": {"thread_id": thread_id}}
+        async for event in graph.astream_events({"messages": [HumanMessage(QUESTION)]}, config=config, version="v2", include_types=["chat_model"]):
+            if ttft is None and event["event"] == "on_chat_model_stream" and event["data"]["chunk"].content:
+                ttft = time.perf_counter() - started
+        return ttft
+
+    yield run
+
+
+@asynccontextmanager
+async def invocations_session(client: httpx.AsyncClient):
+    async def run(thread_id: str) -> Optional[float]:
+        response = await client.post("/api/v1/invocations", json={"input": {"input": QUESTION}, "thread_id": thread_id})
+        response.raise_for_status()
+        return None
+
+    yield run
+
+
+@asynccontextmanager
+async def stream_session(client: httpx.AsyncClient):
+    async def run(thread_id: str) -> Optional[float]:
+        started, ttft = time.perf_counter(), None
+        body = {"input": {"input": QUESTION}, "thread_id": thread_id, "events": ["tokens"], "coalesce_ms": 0}
+        async with client.stream("POST", "/api/v1/stream", json=body) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if line == "event: token" and ttft is None:
+                    ttft = time.perf_counter() - started
+                elif line in ("event: error", "event: cancelled"):
+                    raise RuntimeError(f"stream ended with {line}")
+        return ttft
+
+    yield run
+
+
+@asynccontextmanager
+async def ws_session(url: str):
+    import websockets
+
+    async with websockets.connect(url, max_size=None) as websocket:
+        async def run(thread_id: str) -> Optional[float]:
+            started, ttft = time.perf_counter(), None
+            await websocket.send(json.dumps({
+                "id": thread_id, "input": {"input": QUESTION}, "thread_id": thread_id, "events": ["tokens"], "coalesce_ms": 0,
+            }))
+            while True:
+                message = json.loads(await websocket.recv())
+                if message["event"] == "token" and ttft is None:
+                    ttft = time.perf_counter() - started
+                elif message["event"] == "run_end":
+                    return ttft
+                elif message["event"] in ("error", "cancelled"):
+                    raise RuntimeError(f"run ended with {message['event']}: {message['data']}")
+
+        yield run
+
+
+async def run_level(session_factory, concurrency: int, requests: int, pid: int) -> Dict[str, Any]:
+    thread_ids = [str(uuid.uuid4()) for _ in range(requests)]
+    latencies: List[float] = []
+    ttfts: List[float] = []
+    errors = 0
+
+    async def client() -> None:
+        nonlocal errors
+        async with session_factory() as run:
+            while thread_ids:
+                thread_id = thread_ids.pop()
+                started = time.perf_counter()
+                try:
+                    ttft = await run(thread_id)
+                except Exception as e:
+                    errors += 1
+                    print(f"  request failed: {e!r}", file=sys.stderr)
+                    continue
+                latencies.append(time.perf_counter() - started)
+                if ttft is not None:
+                    ttfts.append(ttft)
+
+    rss_before = rss_kib(pid)
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    rss_after = rss_kib(pid)
+
+    def ms(value: Optional[float]) -> Optional[float]:
+        return None if value is None else round(value * 1000, 2)
+
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 2),
+        "p50_ms": ms(percentile(latencies, 0.50)),
+        "p95_ms": ms(percentile(latencies, 0.95)),
+        "p99_ms": ms(percentile(latencies, 0.99)),
+        "ttft_p50_ms": ms(percentile(ttfts, 0.50)),
+        "ttft_p95_ms": ms(percentile(ttfts, 0.95)),
+        # every request started a new thread
+        "mem_per_thread_kib": None if rss_before is None or rss_after is None else round((rss_after - rss_before) / requests, 1),
+    }
+
+
+async def bench_target(target: str, args, server_pid: Optional[int]) -> Dict[str, Dict[str, Any]]:
+    base_url = f"http://127.0.0.1:{args.port}"
+    limits = httpx.Limits(max_connections=max(args.concurrency) * 2)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        if target == "graph":
+            from app.graph import get_app_graph, init_app_graph
+
+            await init_app_graph()
+            graph = get_app_graph()
+            session_factory, pid = (lambda: graph_session(graph)), os.getpid()
+        elif target == "invocations":
+            session_factory, pid = (lambda: invocations_session(client)), server_pid
+        elif target == "stream":
+            session_factory, pid = (lambda: stream_session(client)), server_pid
+        else:
+            session_factory, pid = (lambda: ws_session(f"ws://127.0.0.1:{args.port}/api/v1/ws/stream")), server_pid
+
+        try:
+            if args.warmup:
+                await run_level(session_factory, min(args.warmup, 4), args.warmup, pid)
+            results = {}
+            for concurrency in args.concurrency:
+                results[f"{target}@{concurrency}"] = await run_level(session_factory, concurrency, args.requests, pid)
+            return results
+        finally:
+            if target == "graph":
+                from app.graph import close_app_graph
+
+                await close_app_graph()
+
+
+async def bench(args) -> Dict[str, Dict[str, Any]]:
+    grafana = spawn(
+        [sys.executable, os.path.join(ROOT, "benchmarks", "stub_grafana.py"), "--port", str(args.grafana_port),
+         "--latency", str(args.grafana_latency), "--points", str(args.points)],
+        ROOT, dict(os.environ),
+    )
+    mcp_env = {
+        **os.environ,
+        "GRAFANA_URL": f"http://127.0.0.1:{args.grafana_port}",
+        "MCP_HOST": "127.0.0.1",
+        "MCP_PORT": str(args.mcp_port),
+        "MCP_PUBLIC_URL": f"http://127.0.0.1:{args.mcp_port}",
+    }
+    mcp = spawn([sys.executable, "grafana_mcp_server.py"], MCP_DIR, mcp_env)
+    server = None
+    try:
+        await wait_ready(f"http://127.0.0.1:{args.grafana_port}/api/health")
+        await wait_ready(f"http://127.0.0.1:{args.mcp_port}/metrics")
+        env = app_env(args)
+        if any(target != "graph" for target in args.targets):
+            server = spawn([sys.executable, "-m", "app.serve"], ROOT, env)
+            await wait_ready(f"http://127.0.0.1:{args.port}/api/v1/health")
+        # app_graph runs in this process with the same settings as the server.
+        os.environ.update(env)
+        sys.path.insert(0, ROOT)
+
+        results = {}
+        for target in args.targets:
+            results.update(await bench_target(target, args, server.pid if server else None))
+        return results
+    finally:
+        for process in (server, mcp, grafana):
+            if process is not None:
+                stop(process)
+
+
+def workload(args) -> Dict[str, Any]:
+    return {option: getattr(args, option) for option in WORKLOAD_OPTIONS}
+
+
+def compare(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]], tolerance: float, memory_tolerance: float) -> List[str]:
+    regressions = []
+    for key, result in results.items():
+        if result["errors"]:
+            regressions.append(f"{key}: {result['errors']} failed requests")
+        previous = baseline.get(key)
+        if previous is None:
+            continue
+        for metric, higher_is_better in COMPARED:
+            old, new = previous.get(metric), result.get(metric)
+            if old is None or new is None:
+                continue
+            if metric == "mem_per_thread_kib":
+                # RSS moves in allocator-sized steps; only flag clear growth.
+                if new > max(old, 1.0) * (1 + memory_tolerance):
+                    regressions.append(f"{key} {metric}: {old} -> {new}")
+            elif (new < old * (1 - tolerance)) if higher_is_better else (new > old * (1 + tolerance)):
+                regressions.append(f"{key} {metric}: {old} -> {new}")
+    return regressions
+
+
+def print_table(results: Dict[str, Dict[str, Any]]) -> None:
+    def cell(value: Any, width: int) -> str:
+        return f"{'-':>{width}}" if value is None else f"{value:>{width}.1f}"
+
+    print(f"{'target':<18} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'ttft50':>8} {'ttft95':>8} {'KiB/thr':>8} {'errors':>6}")
+    for key, r in results.items():
+        print(
+            f"{key:<18} {cell(r['rps'], 8)} {cell(r['p50_ms'], 8)} {cell(r['p95_ms'], 8)} {cell(r['p99_ms'], 8)} "
+            f"{cell(r['ttft_p50_ms'], 8)} {cell(r['ttft_p95_ms'], 8)} {cell(r['mem_per_thread_kib'], 8)} {r['errors']:>6}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--targets", nargs="+", choices=TARGETS, default=list(TARGETS))
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=48, help="requests per target and concurrency level")
+    parser.add_argument("--warmup", type=int, default=4, help="requests per target before measuring")
+    parser.add_argument("--llm-latency", type=float, default=0.02, help="simulated seconds before each LLM response")
+    parser.add_argument("--tokens-per-second", type=float, default=400, help="fake LLM streaming rate")
+    parser.add_argument("--response-tokens", type=int, default=40, help="tokens in each fake LLM answer")
+    parser.add_argument("--grafana-latency", type=float, default=0.005, help="seconds per stub Grafana response")
+    parser.add_argument("--points", type=int, default=1000, help="points per series returned by the stub Grafana")
+    parser.add_argument("--answer-mode", choices=["supervisor", "passthrough"], default="supervisor", help="ANSWER_MODE of the server")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the baseline instead of comparing")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative change of throughput, p95 and TTFT")
+    parser.add_argument("--memory-tolerance", type=float, default=1.0, help="allowed relative growth of memory per thread")
+    parser.add_argument("--port", type=int, default=8767)
+    parser.add_argument("--mcp-port", type=int, default=8768)
+    parser.add_argument("--grafana-port", type=int, default=8769)
+    args = parser.parse_args()
+
+    results = asyncio.run(bench(args))
+    print_table(results)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump({"workload": workload(args), "results": results}, f, indent=2)
+            f.write("\n")
+        print(f"Baseline saved to {args.baseline}")
+        return
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one.")
+        return
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get("workload") != workload(args):
+        raise SystemExit(f"Baseline workload {baseline.get('workload')} differs from this run's {workload(args)}; not comparable.")
+    regressions = compare(results, baseline["results"], args.tolerance, args.memory_tolerance)
+    if regressions:
+        print("Regressions against the baseline:")
+        for regression in regressions:
+            print(f"  {regression}")
+        raise SystemExit(1)
+    print("No regressions against the baseline.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Cold start time of the API.
+
+Each run starts a fresh interpreter and measures the phases of a new replica:
+importing app.main, the lifespan (checkpointer, MCP sessions, LLM client, graph
+build) and the first /invocations answer, then the wall time from spawning
+`python -m app.serve` until /health answers. The fake LLM is used unless
+--provider gemini is given; then the client is created but no request is sent.
+
+    python benchmarks/bench_startup.py --runs 5
+    python benchmarks/bench_startup.py --provider gemini --mcp-url http://localhost:8091
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PHASES = """
+import asyncio, json, sys, time
+started = time.perf_counter()
+import app.main
+imported = time.perf_counter()
+
+async def main():
+    import httpx
+    from app.graph import init_app_graph
+    await init_app_graph()
+    ready = time.perf_counter()
+    if sys.argv[1] != "fake":
+        return ready, ready
+    transport = httpx.ASGITransport(app=app.main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        response = await client.post("/api/v1/invocations", json={"input": {"input": "hello"}})
+        response.raise_for_status()
+    return ready, time.perf_counter()
+
+ready, answered = asyncio.run(main())
+print(json.dumps({"import": imported - started, "lifespan": ready - imported, "first_request": answered - ready}))
+"""
+
+
+def bench_env(args) -> dict:
+    env = {
+        **os.environ,
+        "LLM_PROVIDER": args.provider,
+        "GRAFANA_MCP_URL": args.mcp_url or "",
+        "GRAFANA_RENDERER_MCP_URL": args.renderer_mcp_url or "",
+        "WEB_CONCURRENCY": "1",
+        "HOST": "127.0.0.1",
+        "PORT": str(args.port),
+        "PYTHONPATH": ROOT,
+    }
+    if args.provider == "gemini":
+        env.setdefault("GEMINI_API_KEY", "bench-startup")
+    return env
+
+
+def measure_phases(env: dict) -> dict:
+    output = subprocess.run(
+        [sys.executable, "-c", PHASES, env["LLM_PROVIDER"]], cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def measure_ready(env: dict, port: int, timeout: float = 60.0) -> float:
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "app.serve"], cwd=ROOT, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=1) as client:
+            while time.perf_counter() - started < timeout:
+                try:
+                    if client.get("/api/v1/health").status_code == 200:
+                        return time.perf_counter() - started
+                except httpx.TransportError:
+                    pass
+                time.sleep(0.01)
+        raise RuntimeError("server did not become ready")
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--provider", choices=["fake", "gemini"], default="fake")
+    parser.add_argument("--mcp-url", default=None, help="GRAFANA_MCP_URL for the runs")
+    parser.add_argument("--renderer-mcp-url", default=None, help="GRAFANA_RENDERER_MCP_URL for the runs")
+    parser.add_argument("--port", type=int, default=8766)
+    args = parser.parse_args()
+    env = bench_env(args)
+
+    results = {"import": [], "lifespan": [], "first_request": [], "spawn_to_ready": []}
+    for _ in range(args.runs):
+        for phase, seconds in measure_phases(env).items():
+            results[phase].append(seconds)
+        results["spawn_to_ready"].append(measure_ready(env, args.port))
+
+    print(f"{'phase':<16} {'median ms':>10} {'min ms':>8} {'max ms':>8}")
+    for phase, samples in results.items():
+        print(f"{phase:<16} {statistics.median(samples) * 1000:>10.1f} {min(samples) * 1000:>8.1f} {max(samples) * 1000:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Throughput of the API with 1..N worker processes.
+
+Starts `python -m app.serve` with the fake LLM and the shared SQLite checkpointer for
+each worker count, sends concurrent /invocations requests and reports requests/s.
+Every thread is invoked twice, so the second turn is usually served by a different
+worker and has to resume the thread from the shared store.
+
+    python benchmarks/bench_workers.py --workers 1 2 4 --requests 400 --concurrency 32
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+async def wait_ready(client: httpx.AsyncClient, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get("/api/v1/health")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("server did not become ready")
+
+
+async def run_load(client: httpx.AsyncClient, requests: int, concurrency: int) -> dict:
+    thread_ids = [str(uuid.uuid4()) for _ in range(requests // 2)]
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def invoke(thread_id: str, text: str) -> None:
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.post(
+                "/api/v1/invocations", json={"input": {"input": text}, "thread_id": thread_id}
+            )
+            latencies.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(invoke(t, "first turn") for t in thread_ids))
+    await asyncio.gather(*(invoke(t, "second turn") for t in thread_ids))
+    elapsed = time.perf_counter() - started
+
+    # Both turns must be visible from whichever worker answers the state request.
+    resumed = 0
+    for thread_id in thread_ids[:20]:
+        state = (await client.get(f"/api/v1/threads/{thread_id}/state")).json()
+        humans = [m for m in state["values"]["messages"] if m.get("type") == "human"]
+        resumed += len(humans) == 2
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / elapsed,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95)] * 1000,
+        "resumed": f"{resumed}/{min(len(thread_ids), 20)}",
+    }
+
+
+async def bench(workers: int, args) -> dict:
+    db_dir = tempfile.mkdtemp(prefix="bench-workers-")
+    env = {
+        **os.environ,
+        "LLM_PROVIDER": "fake",
+        "FAKE_LLM_LATENCY": str(args.llm_latency),
+        "CHECKPOINTER_BACKEND": "sqlite",
+        "CHECKPOINTER_SQLITE_PATH": os.path.join(db_dir, "checkpoints.sqlite"),
+        "GRAFANA_MCP_URL": "",
+        "GRAFANA_RENDERER_MCP_URL": "",
+        "WEB_CONCURRENCY": str(workers),
+        "HOST": "127.0.0.1",
+        "PORT": str(args.port),
+    }
+    server = subprocess.Popen(
+        [sys.executable, "-m", "app.serve"], cwd=ROOT, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        limits = httpx.Limits(max_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", timeout=60, limits=limits) as client:
+            await wait_ready(client)
+            await run_load(client, min(args.requests, 40), args.concurrency)  # warm-up
+            return await run_load(client, args.requests, args.concurrency)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="simulated seconds per LLM call")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    print(f"{'workers':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'errors':>6} {'resumed':>8}")
+    for workers in args.workers:
+        result = asyncio.run(bench(workers, args))
+        print(
+            f"{workers:>7} {result['rps']:>8.1f} {result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f} "
+            f"{result['errors']:>6} {result['resumed']:>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
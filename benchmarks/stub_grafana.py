@@ -0,0 +1,169 @@
+"""
+Stub Grafana HTTP API for offline benchmarks of grafana_mcp_server.py.
+
+Serves the endpoints the MCP server uses (search, dashboards and their versions,
+datasources, /api/ds/query and the renderer) from generated data: one dashboard
+per --dashboards with --panels time series panels, --points points per series and
+a solid PNG of the requested size for renders. Every response waits --latency
+seconds first.
+
+    python benchmarks/stub_grafana.py --port 3300 --latency 0.01
+    GRAFANA_URL=http://127.0.0.1:3300 python mcp/grafana/dashboardview/grafana_mcp_server.py
+"""
+import argparse
+import asyncio
+import math
+import struct
+import zlib
+from functools import lru_cache
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+DATASOURCE = {"id": 1, "uid": "bench-prometheus", "name": "Prometheus", "type": "prometheus", "url": "http://prometheus:9090", "access": "proxy", "isDefault": True}
+VERSION = 1
+POINT_INTERVAL_MS = 15_000
+
+
+def make_dashboard(uid: str, panels: int) -> dict:
+    return {
+        "dashboard": {
+            "uid": uid,
+            "title": f"Bench {uid}",
+            "version": VERSION,
+            "panels": [
+                {
+                    "id": panel_id,
+                    "title": f"Series {panel_id}",
+                    "type": "timeseries",
+                    "datasource": {"type": DATASOURCE["type"], "uid": DATASOURCE["uid"]},
+                    "targets": [{"refId": "A", "expr": f"bench_metric{{panel=\"{panel_id}\"}}"}],
+                }
+                for panel_id in range(1, panels + 1)
+            ],
+        },
+        "meta": {"slug": uid, "version": VERSION},
+    }
+
+
+def make_frame(ref_id: str, points: int, seed: int) -> dict:
+    start = 1_700_000_000_000
+    return {
+        "schema": {
+            "refId": ref_id,
+            "fields": [
+                {"name": "Time", "type": "time"},
+                {"name": "Value", "type": "number", "labels": {"instance": f"bench-{seed}"}},
+            ],
+        },
+        "data": {
+            "values": [
+                [start + i * POINT_INTERVAL_MS for i in range(points)],
+                [round(50 + 40 * math.sin((i + seed) / 20), 3) for i in range(points)],
+            ]
+        },
+    }
+
+
+@lru_cache(maxsize=16)
+def make_png(width: int, height: int) -> bytes:
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+
+    row = b"\x00" + b"\x2a\x6f\xd1" * width
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(row * height)) + chunk(b"IEND", b"")
+
+
+def make_app(dashboards: int, panels: int, points: int, latency: float) -> Starlette:
+    uids = [f"bench-{i}" for i in range(1, dashboards + 1)]
+    boards = {uid: make_dashboard(uid, panels) for uid in uids}
+
+    async def wait() -> None:
+        if latency:
+            await asyncio.sleep(latency)
+
+    async def health(request: Request):
+        return JSONResponse({"database": "ok", "version": "stub"})
+
+    async def search(request: Request):
+        await wait()
+        return JSONResponse([
+            {"uid": uid, "title": board["dashboard"]["title"], "type": "dash-db", "url": f"/d/{uid}"}
+            for uid, board in boards.items()
+        ])
+
+    async def dashboard(request: Request):
+        await wait()
+        board = boards.get(request.path_params["uid"])
+        if board is None:
+            return JSONResponse({"message": "Dashboard not found"}, status_code=404)
+        return JSONResponse(board, headers={"ETag": f'"{VERSION}"'})
+
+    async def versions(request: Request):
+        await wait()
+        return JSONResponse([{"version": VERSION}])
+
+    async def datasources(request: Request):
+        await wait()
+        return JSONResponse([DATASOURCE])
+
+    async def datasource(request: Request):
+        await wait()
+        key = request.path_params["key"]
+        if key not in (str(DATASOURCE["id"]), DATASOURCE["name"]):
+            return JSONResponse({"message": "Data source not found"}, status_code=404)
+        return JSONResponse(DATASOURCE)
+
+    async def datasource_health(request: Request):
+        await wait()
+        return JSONResponse({"status": "OK", "message": "Data source is working"})
+
+    async def query(request: Request):
+        body = await request.json()
+        await wait()
+        results = {
+            q["refId"]: {"status": 200, "frames": [make_frame(q["refId"], points, seed)]}
+            for seed, q in enumerate(body.get("queries", []))
+        }
+        return JSONResponse({"results": results})
+
+    async def render(request: Request):
+        await wait()
+        width = int(request.query_params.get("width", 1000))
+        height = int(request.query_params.get("height", 500))
+        return Response(make_png(width, height), media_type="image/png")
+
+    return Starlette(routes=[
+        Route("/api/health", health),
+        Route("/api/search", search),
+        Route("/api/dashboards/uid/{uid}", dashboard),
+        Route("/api/dashboards/uid/{uid}/versions", versions),
+        Route("/api/datasources", datasources),
+        Route("/api/datasources/{key:int}/health", datasource_health),
+        Route("/api/datasources/name/{key}", datasource),
+        Route("/api/datasources/{key}", datasource),
+        Route("/api/ds/query", query, methods=["POST"]),
+        Route("/render/d/{uid}", render),
+        Route("/render/d-solo/{uid}", render),
+    ])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=3300)
+    parser.add_argument("--dashboards", type=int, default=3)
+    parser.add_argument("--panels", type=int, default=8)
+    parser.add_argument("--points", type=int, default=1000, help="points per series returned by /api/ds/query")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds before every response")
+    args = parser.parse_args()
+    app = make_app(args.dashboards, args.panels, args.points, args.latency)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,22 @@
+# gunicorn -c gunicorn.conf.py app.main:app
+# Same settings as `python -m app.serve`; each worker builds its graph in the lifespan hook.
+from app.core.config import settings
+from app.core.metrics import mark_worker_dead, reset_multiproc_dir
+
+bind = f"{settings.host}:{settings.port}"
+workers = max(settings.web_concurrency, 1)
+worker_class = "uvicorn.workers.UvicornWorker"
+# Do not preload: the LLM client, MCP sessions and SQLite connection must be created per worker.
+preload_app = False
+
+if workers > 1 and settings.checkpointer_backend == "memory":
+    raise SystemExit("WEB_CONCURRENCY > 1 needs CHECKPOINTER_BACKEND=sqlite so any worker can resume any thread_id.")
+
+
+def on_starting(server):
+    # METRICS_MULTIPROC_DIR: start each run with empty metric files
+    reset_multiproc_dir()
+
+
+def child_exit(server, worker):
+    mark_worker_dead(worker.pid)
@@ -0,0 +1,122 @@
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Hashable, Optional
+
+
+@dataclass
+class CacheEntry:
+    """캐시에 저장된 값과 재검증에 필요한 메타데이터입니다."""
+    value: Any
+    expires_at: float
+    version: Any = None
+    etag: Optional[str] = None
+    size: int = 0
+    extra: Dict[str, Any] = field(default_factory=dict)
+
+    def is_fresh(self, now: Optional[float] = None) -> bool:
+        return (now if now is not None else time.monotonic()) < self.expires_at
+
+
+class TTLCache:
+    """TTL 만료와 항목 수/바이트 크기 제한을 가진 LRU 캐시입니다.
+
+    만료된 항목은 바로 지우지 않고 재검증(version/ETag 비교)에 쓸 수 있도록 남겨 두며,
+    용량을 넘으면 가장 오래 사용되지 않은 항목부터 제거합니다.
+    """
+
+    def __init__(self, maxsize: int = 128, ttl: float = 60.0, max_bytes: Optional[int] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Hashable, CacheEntry]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def get(self, key: Hashable) -> Any:
+        """만료되지 않은 값을 반환하고 hit/miss를 기록합니다. 없거나 만료되었으면 None."""
+        entry = self._entries.get(key)
+        if entry is None or not entry.is_fresh():
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry.value
+
+    def get_entry(self, key: Hashable) -> Optional[CacheEntry]:
+        """만료 여부와 관계없이 항목을 반환합니다. 통계는 기록하지 않습니다."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def set(self, key: Hashable, value: Any, *, version: Any = None, etag: Optional[str] = None,
+            size: int = 0, ttl: Optional[float] = None) -> CacheEntry:
+        """값을 저장하고 용량을 넘는 항목을 제거합니다."""
+        self._remove(key)
+        entry = CacheEntry(
+            value=value,
+            expires_at=time.monotonic() + (self.ttl if ttl is None else ttl),
+            version=version,
+            etag=etag,
+            size=size,
+        )
+        self._entries[key] = entry
+        self._bytes += size
+        self._evict()
+        return entry
+
+    def refresh(self, key: Hashable, ttl: Optional[float] = None) -> Optional[CacheEntry]:
+        """재검증 결과 변경이 없는 항목의 만료 시간을 연장합니다."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        entry.expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        self._entries.move_to_end(key)
+        self.revalidations += 1
+        return entry
+
+    def delete(self, key: Hashable) -> None:
+        self._remove(key)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """hit/miss 카운터와 현재 사용량을 반환합니다."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "revalidations": self.revalidations,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "max_entries": self.maxsize,
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+        }
+
+    def _remove(self, key: Hashable) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.size
+
+    def _evict(self) -> None:
+        while self._entries and (
+            len(self._entries) > self.maxsize
+            or (self.max_bytes is not None and self._bytes > self.max_bytes)
+        ):
+            _, entry = self._entries.popitem(last=False)
+            self._bytes -= entry.size
+            self.evictions += 1
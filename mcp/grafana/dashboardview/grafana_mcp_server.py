@@ -1,12 +1,22 @@
-from mcp.server.fastmcp import FastMCP
+from mcp.server.fastmcp import FastMCP, Image
+from starlette.requests import Request
+from starlette.responses import Response
 import logging
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Union
+from dataclasses import dataclass
+import asyncio
 import time
-import requests
+import httpx
 import base64
+import hashlib
 import os
 from urllib.parse import quote_plus
 from dotenv import load_dotenv
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Gauge, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+from grafana_cache import TTLCache
+from panel_summary import SUMMARY_MODES, summarize_query_response, summarize_results
 
 # .env 파일의 절대 경로 계산
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -35,8 +45,80 @@ logger.info(f"API Key configured: {'Yes' if GRAFANA_API_KEY else 'No'}")
 logger.info(f"Using .env from: {env_path}")
 logger.info(f"API Key: {GRAFANA_API_KEY[:5]}...{GRAFANA_API_KEY[-5:] if GRAFANA_API_KEY else ''}")
 
-# FastMCP 서버 생성
-mcp = FastMCP("GrafanaDashboardServer")
+# HTTP 클라이언트 설정 (엔드포인트 종류별 타임아웃, 커넥션 풀, 동시 요청 수 제한)
+GRAFANA_TIMEOUT = float(os.environ.get("GRAFANA_TIMEOUT", "10"))
+GRAFANA_QUERY_TIMEOUT = float(os.environ.get("GRAFANA_QUERY_TIMEOUT", "30"))
+GRAFANA_RENDER_TIMEOUT = float(os.environ.get("GRAFANA_RENDER_TIMEOUT", "60"))
+GRAFANA_CONNECT_TIMEOUT = float(os.environ.get("GRAFANA_CONNECT_TIMEOUT", "5"))
+GRAFANA_MAX_CONNECTIONS = int(os.environ.get("GRAFANA_MAX_CONNECTIONS", "20"))
+GRAFANA_MAX_KEEPALIVE_CONNECTIONS = int(os.environ.get("GRAFANA_MAX_KEEPALIVE_CONNECTIONS", "10"))
+GRAFANA_KEEPALIVE_EXPIRY = float(os.environ.get("GRAFANA_KEEPALIVE_EXPIRY", "30"))
+GRAFANA_MAX_CONCURRENCY = int(os.environ.get("GRAFANA_MAX_CONCURRENCY", "10"))
+
+# 캐시 설정 (대시보드는 만료 후 version으로 재검증, 데이터소스는 TTL만 사용)
+DASHBOARD_CACHE_SIZE = int(os.environ.get("DASHBOARD_CACHE_SIZE", "64"))
+DASHBOARD_CACHE_TTL = float(os.environ.get("DASHBOARD_CACHE_TTL", "30"))
+DATASOURCE_CACHE_SIZE = int(os.environ.get("DATASOURCE_CACHE_SIZE", "128"))
+DATASOURCE_CACHE_TTL = float(os.environ.get("DATASOURCE_CACHE_TTL", "300"))
+
+# 여러 패널을 한 번에 조회할 때 /api/ds/query 요청 하나에 담는 최대 쿼리 수
+PANEL_QUERY_BATCH_SIZE = int(os.environ.get("PANEL_QUERY_BATCH_SIZE", "50"))
+# Grafana 서버 측 표현식(Math, Reduce 등)의 데이터소스 UID
+EXPRESSION_DATASOURCE = "__expr__"
+
+# 패널 데이터 요약 설정 (mode: raw | downsample | stats, method: lttb | avg | minmax)
+PANEL_DATA_MODE = os.environ.get("PANEL_DATA_MODE", "downsample")
+PANEL_DATA_MAX_POINTS = int(os.environ.get("PANEL_DATA_MAX_POINTS", "200"))
+PANEL_DATA_DOWNSAMPLE_METHOD = os.environ.get("PANEL_DATA_DOWNSAMPLE_METHOD", "lttb")
+
+# 렌더링 캐시 설정 (시간 범위는 RENDER_TIME_QUANTUM초 단위로 맞춰 캐시 키를 만듦)
+RENDER_CACHE_SIZE = int(os.environ.get("RENDER_CACHE_SIZE", "64"))
+RENDER_CACHE_MAX_BYTES = int(os.environ.get("RENDER_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+RENDER_CACHE_TTL = float(os.environ.get("RENDER_CACHE_TTL", "300"))
+RENDER_TIME_QUANTUM = int(os.environ.get("RENDER_TIME_QUANTUM", "60"))
+# 렌더링 결과 전달 방식 (url: 짧게 유지되는 이미지 URL, image: MCP 이미지 콘텐츠, base64: base64 문자열)
+RENDER_OUTPUT = os.environ.get("RENDER_OUTPUT", "url")
+# 렌더링 이미지 URL을 만들 때 쓰는 이 서버의 외부 주소
+MCP_PUBLIC_URL = os.environ.get("MCP_PUBLIC_URL", "http://localhost:8000").rstrip("/")
+
+# Prometheus 메트릭 (/metrics)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+tool_call_duration = Histogram(
+    "mcp_tool_call_duration_seconds", "MCP 도구 호출 시간", ["tool", "status"], buckets=LATENCY_BUCKETS
+)
+grafana_request_duration = Histogram(
+    "grafana_request_duration_seconds", "Grafana HTTP 요청 시간 (동시 요청 제한 대기 포함)",
+    ["method", "endpoint", "status"], buckets=LATENCY_BUCKETS,
+)
+grafana_requests_in_flight = Gauge("grafana_requests_in_flight", "진행 중인 Grafana HTTP 요청 수")
+
+def _endpoint_label(path: str) -> str:
+    """메트릭 라벨용으로 경로의 uid/이름/숫자 ID를 ":id"로 바꿉니다 (예: /api/dashboards/uid/:id)."""
+    parts = path.split("/")
+    for i in range(1, len(parts)):
+        if parts[i - 1] in ("uid", "name", "d", "d-solo") or parts[i].isdigit():
+            parts[i] = ":id"
+    return "/".join(parts)
+
+class InstrumentedFastMCP(FastMCP):
+    """도구 호출마다 실행 시간을 기록하는 FastMCP입니다."""
+
+    async def call_tool(self, name: str, arguments: Dict[str, Any]):
+        started = time.perf_counter()
+        status = "error"
+        try:
+            result = await super().call_tool(name, arguments)
+            status = "ok"
+            return result
+        finally:
+            tool_call_duration.labels(name, status).observe(time.perf_counter() - started)
+
+# FastMCP 서버 생성 (SSE 서버 주소는 MCP_HOST, MCP_PORT 환경 변수로 지정)
+MCP_HOST = os.environ.get("MCP_HOST", "127.0.0.1")
+MCP_PORT = int(os.environ.get("MCP_PORT", "8000"))
+mcp = InstrumentedFastMCP("GrafanaDashboardServer", host=MCP_HOST, port=MCP_PORT)
 
 def get_grafana_headers():
     """Grafana API 요청에 사용할 헤더를 반환합니다."""
@@ -47,10 +129,154 @@ def get_grafana_headers():
             }
     return {}
 
+# 공유 HTTP 클라이언트
+
+_http_client: Optional[httpx.AsyncClient] = None
+_request_semaphore = asyncio.Semaphore(GRAFANA_MAX_CONCURRENCY)
+
+def get_http_client() -> httpx.AsyncClient:
+    """모든 도구가 공유하는 Grafana용 비동기 HTTP 클라이언트를 반환합니다.
+
+    커넥션 풀과 keep-alive를 사용하므로 도구 호출마다 TCP/TLS 핸드셰이크를 다시 하지 않습니다.
+    """
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            base_url=GRAFANA_URL,
+            headers=get_grafana_headers(),
+            timeout=httpx.Timeout(GRAFANA_TIMEOUT, connect=GRAFANA_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=GRAFANA_MAX_CONNECTIONS,
+                max_keepalive_connections=GRAFANA_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=GRAFANA_KEEPALIVE_EXPIRY,
+            ),
+        )
+    return _http_client
+
+async def grafana_request(method: str, path: str, timeout: float = GRAFANA_TIMEOUT, **kwargs) -> httpx.Response:
+    """Grafana API에 요청을 보냅니다.
+
+    동시에 Grafana로 나가는 요청 수는 GRAFANA_MAX_CONCURRENCY로 제한됩니다.
+
+    Args:
+        method: HTTP 메서드
+        path: Grafana 기준 경로 (예: "/api/datasources")
+        timeout: 이 요청의 타임아웃 (초)
+        **kwargs: httpx 요청 인자 (params, json 등)
+
+    Returns:
+        httpx.Response: Grafana 응답
+    """
+    timeout_config = httpx.Timeout(timeout, connect=GRAFANA_CONNECT_TIMEOUT)
+    started = time.perf_counter()
+    status = "error"
+    try:
+        async with _request_semaphore:
+            with grafana_requests_in_flight.track_inprogress():
+                response = await get_http_client().request(method, path, timeout=timeout_config, **kwargs)
+        status = str(response.status_code)
+        return response
+    finally:
+        grafana_request_duration.labels(method, _endpoint_label(path), status).observe(time.perf_counter() - started)
+
+# 대시보드/데이터소스 캐시
+
+dashboard_cache = TTLCache(maxsize=DASHBOARD_CACHE_SIZE, ttl=DASHBOARD_CACHE_TTL)
+datasource_cache = TTLCache(maxsize=DATASOURCE_CACHE_SIZE, ttl=DATASOURCE_CACHE_TTL)
+
+def _dashboard_version(dashboard: Dict[str, Any]) -> Any:
+    """대시보드 응답에서 version 값을 꺼냅니다."""
+    version = dashboard.get("dashboard", {}).get("version")
+    if version is None:
+        version = dashboard.get("meta", {}).get("version")
+    return version
+
+async def _fetch_latest_dashboard_version(uid: str) -> Any:
+    """대시보드 전체를 받지 않고 최신 version 번호만 조회합니다. 실패하면 None을 반환합니다."""
+    try:
+        response = await grafana_request("GET", f"/api/dashboards/uid/{uid}/versions", params={"limit": 1})
+        if response.status_code != 200:
+            return None
+        body = response.json()
+        # Grafana 11 이상은 {"versions": [...]} 형태, 이전 버전은 리스트를 반환
+        versions = body.get("versions", []) if isinstance(body, dict) else body
+        if versions:
+            return versions[0].get("version")
+    except Exception as e:
+        logger.warning(f"대시보드 버전 조회 오류: {str(e)}")
+    return None
+
+async def _revalidate_dashboard(uid: str) -> Optional[Dict[str, Any]]:
+    """만료된 캐시 항목의 version이 최신과 같으면 만료 시간을 연장하고 반환합니다."""
+    entry = dashboard_cache.get_entry(uid)
+    if entry is None or entry.version is None:
+        return None
+    latest_version = await _fetch_latest_dashboard_version(uid)
+    if latest_version is not None and latest_version == entry.version:
+        dashboard_cache.refresh(uid)
+        return entry.value
+    return None
+
+# 패널 인덱스
+
+@dataclass
+class PanelIndex:
+    """대시보드 한 버전에 대한 패널 ID 인덱스와 패널 요약 목록입니다."""
+    panels: Dict[int, Dict[str, Any]]
+    summaries: List[Dict[str, Any]]
+
+def build_panel_index(dashboard: Dict[str, Any]) -> PanelIndex:
+    """대시보드 모델에서 패널 인덱스를 만듭니다.
+
+    접힌(collapsed) row 패널 안에 중첩된 패널도 펼쳐서 함께 인덱싱합니다.
+    """
+    panels: Dict[int, Dict[str, Any]] = {}
+    summaries: List[Dict[str, Any]] = []
+
+    def add(panel: Dict[str, Any], row: Optional[Dict[str, Any]]) -> None:
+        if panel.get("id") is not None:
+            panels[panel["id"]] = panel
+        summary = {
+            "id": panel.get("id"),
+            "title": panel.get("title"),
+            "type": panel.get("type"),
+            "description": panel.get("description", ""),
+            "datasource": panel.get("datasource")
+        }
+        if row is not None:
+            summary["row"] = row.get("title")
+        summaries.append(summary)
+
+    for panel in dashboard.get("dashboard", {}).get("panels", []):
+        add(panel, None)
+        if panel.get("type") == "row":
+            for child in panel.get("panels", []):
+                add(child, panel)
+
+    return PanelIndex(panels=panels, summaries=summaries)
+
+def panel_index_for(dashboard_uid: str, dashboard: Dict[str, Any]) -> PanelIndex:
+    """가져온 대시보드에 대한 패널 인덱스를 반환합니다.
+
+    인덱스는 캐시 항목에 함께 저장되므로 대시보드 버전이 바뀔 때만 다시 만들어집니다.
+    """
+    entry = dashboard_cache.get_entry(dashboard_uid)
+    if entry is None or entry.value is not dashboard:
+        return build_panel_index(dashboard)
+    
+    index = entry.extra.get("panel_index")
+    if index is None:
+        index = build_panel_index(dashboard)
+        entry.extra["panel_index"] = index
+    return index
+
+def _datasource_cache_key(id_or_name: str) -> str:
+    return f"id:{id_or_name}" if id_or_name.isdigit() else f"name:{id_or_name}"
+
 # 데이터소스 조회 도구
 
 @mcp.tool()
-def list_datasources() -> List[Dict[str, Any]]:
+async def list_datasources() -> List[Dict[str, Any]]:
     """Grafana의 모든 데이터소스 목록을 반환합니다.
     
     Returns:
@@ -58,10 +284,8 @@ def list_datasources() -> List[Dict[str, Any]]:
     """
     logger.info("list_datasources 도구 호출")
 
-    url = f"{GRAFANA_URL}/api/datasources"
-    
     try:
-        response = requests.get(url, headers=get_grafana_headers())
+        response = await grafana_request("GET", "/api/datasources")
         
         if response.status_code == 200:
             return response.json()
@@ -74,7 +298,7 @@ def list_datasources() -> List[Dict[str, Any]]:
         return []
 
 @mcp.tool()
-def get_datasource(id_or_name: str) -> Dict[str, Any]:
+async def get_datasource(id_or_name: str) -> Dict[str, Any]:
     """특정 데이터소스의 상세 정보를 반환합니다.
     
     Args:
@@ -85,17 +309,25 @@ def get_datasource(id_or_name: str) -> Dict[str, Any]:
     """
     logger.info(f"get_datasource 도구 호출: id_or_name={id_or_name}")
     
+    cached = datasource_cache.get(_datasource_cache_key(id_or_name))
+    if cached is not None:
+        return cached
+    
     # ID인지 이름인지 확인 (숫자면 ID로 가정)
     if id_or_name.isdigit():
-        url = f"{GRAFANA_URL}/api/datasources/{id_or_name}"
+        path = f"/api/datasources/{id_or_name}"
     else:
-        url = f"{GRAFANA_URL}/api/datasources/name/{quote_plus(id_or_name)}"
+        path = f"/api/datasources/name/{quote_plus(id_or_name)}"
     
     try:
-        response = requests.get(url, headers=get_grafana_headers())
+        response = await grafana_request("GET", path)
         
         if response.status_code == 200:
-            return response.json()
+            datasource = response.json()
+            # ID와 이름 어느 쪽으로 조회해도 캐시를 쓸 수 있도록 두 키 모두에 저장
+            datasource_cache.set(f"id:{datasource.get('id')}", datasource)
+            datasource_cache.set(f"name:{datasource.get('name')}", datasource)
+            return datasource
         else:
             logger.error(f"데이터소스 정보 가져오기 실패: HTTP {response.status_code}, {response.text}")
             return {"error": f"데이터소스 정보 가져오기 실패: HTTP {response.status_code}"}
@@ -105,7 +337,7 @@ def get_datasource(id_or_name: str) -> Dict[str, Any]:
         return {"error": f"데이터소스 정보 가져오기 오류: {str(e)}"}
 
 @mcp.tool()
-def test_datasource(id_or_name: str) -> Dict[str, Any]:
+async def test_datasource(id_or_name: str) -> Dict[str, Any]:
     """데이터소스 연결을 테스트합니다.
     
     Args:
@@ -117,16 +349,16 @@ def test_datasource(id_or_name: str) -> Dict[str, Any]:
     logger.info(f"test_datasource 도구 호출: id_or_name={id_or_name}")
     
     # 먼저 데이터소스 정보 가져오기
-    datasource = get_datasource(id_or_name)
+    datasource = await get_datasource(id_or_name)
     
     if "error" in datasource:
         return datasource
     
     # 데이터소스 ID로 테스트 요청
-    url = f"{GRAFANA_URL}/api/datasources/{datasource.get('id')}/health"
+    path = f"/api/datasources/{datasource.get('id')}/health"
     
     try:
-        response = requests.get(url, headers=get_grafana_headers())
+        response = await grafana_request("GET", path)
         
         if response.status_code == 200:
             return response.json()
@@ -141,7 +373,7 @@ def test_datasource(id_or_name: str) -> Dict[str, Any]:
 # 대시보드 조회 도구
 
 @mcp.tool()
-def list_dashboards(folder_id: Optional[int] = None, query: Optional[str] = None) -> List[Dict[str, Any]]:
+async def list_dashboards(folder_id: Optional[int] = None, query: Optional[str] = None) -> List[Dict[str, Any]]:
     """대시보드 목록을 반환합니다.
     
     Args:
@@ -153,7 +385,6 @@ def list_dashboards(folder_id: Optional[int] = None, query: Optional[str] = None
     """
     logger.info(f"list_dashboards 도구 호출: folder_id={folder_id}, query={query}")
     
-    url = f"{GRAFANA_URL}/api/search"
     params = {}
     
     if folder_id is not None:
@@ -166,7 +397,7 @@ def list_dashboards(folder_id: Optional[int] = None, query: Optional[str] = None
     params["type"] = "dash-db"
     
     try:
-        response = requests.get(url, params=params, headers=get_grafana_headers())
+        response = await grafana_request("GET", "/api/search", params=params)
         
         if response.status_code == 200:
             return response.json()
@@ -179,7 +410,7 @@ def list_dashboards(folder_id: Optional[int] = None, query: Optional[str] = None
         return []
 
 @mcp.tool()
-def get_dashboard(uid: str) -> Dict[str, Any]:
+async def get_dashboard(uid: str) -> Dict[str, Any]:
     """특정 대시보드의 상세 정보를 반환합니다.
     
     Args:
@@ -190,13 +421,34 @@ def get_dashboard(uid: str) -> Dict[str, Any]:
     """
     logger.info(f"get_dashboard 도구 호출: uid={uid}")
     
-    url = f"{GRAFANA_URL}/api/dashboards/uid/{uid}"
+    cached = dashboard_cache.get(uid)
+    if cached is not None:
+        return cached
+    
+    # 만료된 항목은 version이 바뀌지 않았으면 다시 내려받지 않음
+    revalidated = await _revalidate_dashboard(uid)
+    if revalidated is not None:
+        return revalidated
+    
+    entry = dashboard_cache.get_entry(uid)
+    headers = {"If-None-Match": entry.etag} if entry is not None and entry.etag else None
     
     try:
-        response = requests.get(url, headers=get_grafana_headers())
+        response = await grafana_request("GET", f"/api/dashboards/uid/{uid}", headers=headers)
         
-        if response.status_code == 200:
-            return response.json()
+        if response.status_code == 304 and entry is not None:
+            dashboard_cache.refresh(uid)
+            return entry.value
+        elif response.status_code == 200:
+            dashboard = response.json()
+            dashboard_cache.set(
+                uid,
+                dashboard,
+                version=_dashboard_version(dashboard),
+                etag=response.headers.get("ETag"),
+                size=len(response.content),
+            )
+            return dashboard
         else:
             logger.error(f"대시보드 정보 가져오기 실패: HTTP {response.status_code}, {response.text}")
             return {"error": f"대시보드 정보 가져오기 실패: HTTP {response.status_code}"}
@@ -208,7 +460,7 @@ def get_dashboard(uid: str) -> Dict[str, Any]:
 # 패널 조회 도구
 
 @mcp.tool()
-def list_panels(dashboard_uid: str) -> List[Dict[str, Any]]:
+async def list_panels(dashboard_uid: str) -> List[Dict[str, Any]]:
     """특정 대시보드에 포함된 패널 목록을 반환합니다.
     
     Args:
@@ -220,82 +472,83 @@ def list_panels(dashboard_uid: str) -> List[Dict[str, Any]]:
     logger.info(f"list_panels 도구 호출: dashboard_uid={dashboard_uid}")
     
     # 대시보드 정보 가져오기
-    dashboard = get_dashboard(dashboard_uid)
+    dashboard = await get_dashboard(dashboard_uid)
     
     if "error" in dashboard:
         return []
     
     try:
-        panels = []
-        # 대시보드 모델에서 패널 추출
-        dashboard_data = dashboard.get("dashboard", {})
-        
-        for panel in dashboard_data.get("panels", []):
-            panels.append({
-                "id": panel.get("id"),
-                "title": panel.get("title"),
-                "type": panel.get("type"),
-                "description": panel.get("description", ""),
-                "datasource": panel.get("datasource")
-            })
-        
-        return panels
+        # 대시보드 버전별로 한 번만 만들어지는 패널 인덱스 사용
+        return panel_index_for(dashboard_uid, dashboard).summaries
     
     except Exception as e:
         logger.error(f"패널 목록 추출 오류: {str(e)}")
         return []
 
 @mcp.tool()
-def get_panel_data(dashboard_uid: str, panel_id: int, time_range: Dict[str, str]) -> Dict[str, Any]:
+async def get_panel_data(dashboard_uid: str, panel_id: int, time_range: Dict[str, str], mode: Optional[str] = None, max_points: int = PANEL_DATA_MAX_POINTS) -> Dict[str, Any]:
     """특정 패널의 데이터를 쿼리합니다.
     
     Args:
         dashboard_uid: 대시보드 UID
         panel_id: 패널 ID
         time_range: 시간 범위 (딕셔너리 형태: {"from": "now-6h", "to": "now"} 등)
+        mode: 결과 형태 ("downsample": 시계열을 max_points개로 줄이고 통계 포함, "stats": 통계만, "raw": 원본 전체)
+        max_points: downsample 모드에서 시계열마다 남길 최대 점 수
         
     Returns:
         Dict[str, Any]: 패널 데이터
     """
-    logger.info(f"get_panel_data 도구 호출: dashboard_uid={dashboard_uid}, panel_id={panel_id}, time_range={time_range}")
+    logger.info(f"get_panel_data 도구 호출: dashboard_uid={dashboard_uid}, panel_id={panel_id}, time_range={time_range}, mode={mode}")
+    
+    mode = mode or PANEL_DATA_MODE
+    if mode not in SUMMARY_MODES:
+        return {"error": f"지원하지 않는 mode입니다: {mode} (가능한 값: {', '.join(SUMMARY_MODES)})"}
     
     # 대시보드 정보 가져오기
-    dashboard = get_dashboard(dashboard_uid)
+    dashboard = await get_dashboard(dashboard_uid)
     
     if "error" in dashboard:
         return {"error": dashboard.get("error")}
     
-    # 패널 찾기
-    panel = None
-    dashboard_data = dashboard.get("dashboard", {})
-    
-    for p in dashboard_data.get("panels", []):
-        if p.get("id") == panel_id:
-            panel = p
-            break
+    # 패널 인덱스에서 패널 찾기 (row 안에 중첩된 패널 포함)
+    panel = panel_index_for(dashboard_uid, dashboard).panels.get(panel_id)
     
     if not panel:
         return {"error": f"패널 ID {panel_id}를 찾을 수 없습니다"}
     
-    # 패널의 데이터소스와 쿼리 추출
-    datasource = panel.get("datasource")
+    # 패널의 쿼리 추출
     targets = panel.get("targets", [])
     
     if not targets:
         return {"error": "패널에 데이터 쿼리가 없습니다"}
     
-    # 쿼리 요청 준비
-    url = f"{GRAFANA_URL}/api/ds/query"
+    response = await query_datasource(targets, time_range)
+    
+    if "error" in response:
+        return response
+    
+    return summarize_query_response(response, mode, max_points, PANEL_DATA_DOWNSAMPLE_METHOD)
+
+async def query_datasource(queries: List[Dict[str, Any]], time_range: Dict[str, str]) -> Dict[str, Any]:
+    """/api/ds/query로 쿼리 목록을 실행합니다.
     
+    Args:
+        queries: Grafana 쿼리(target) 목록
+        time_range: 시간 범위 (딕셔너리 형태: {"from": "now-6h", "to": "now"} 등)
+        
+    Returns:
+        Dict[str, Any]: /api/ds/query 응답 또는 {"error": ...}
+    """
     # 요청 데이터 구성
     request_data = {
-        "queries": targets,
+        "queries": queries,
         "from": time_range.get("from", "now-1h"),
         "to": time_range.get("to", "now")
     }
     
     try:
-        response = requests.post(url, json=request_data, headers=get_grafana_headers())
+        response = await grafana_request("POST", "/api/ds/query", timeout=GRAFANA_QUERY_TIMEOUT, json=request_data)
         
         if response.status_code == 200:
             return response.json()
@@ -307,10 +560,216 @@ def get_panel_data(dashboard_uid: str, panel_id: int, time_range: Dict[str, str]
         logger.error(f"패널 데이터 쿼리 오류: {str(e)}")
         return {"error": f"패널 데이터 쿼리 오류: {str(e)}"}
 
-# 스크린샷 도구
+def _is_expression(query: Dict[str, Any]) -> bool:
+    """서버 측 표현식(datasource "__expr__") 쿼리인지 확인합니다."""
+    datasource = query.get("datasource")
+    if isinstance(datasource, dict):
+        return EXPRESSION_DATASOURCE in (datasource.get("uid"), datasource.get("type"))
+    return datasource == EXPRESSION_DATASOURCE
+
+def _datasource_group_key(datasource: Any) -> str:
+    """쿼리를 데이터소스별로 묶기 위한 키를 반환합니다."""
+    if isinstance(datasource, dict):
+        return str(datasource.get("uid") or datasource.get("type") or "default")
+    return str(datasource or "default")
 
 @mcp.tool()
-def render_dashboard(dashboard_uid: str, time_range: Dict[str, str], width: int = 1000, height: int = 500, theme: str = "light") -> str:
+async def get_dashboard_data(dashboard_uid: str, panel_ids: Optional[List[int]] = None, time_range: Optional[Dict[str, str]] = None, mode: Optional[str] = None, max_points: int = PANEL_DATA_MAX_POINTS) -> Dict[str, Any]:
+    """여러 패널의 데이터를 한 번에 쿼리합니다.
+    
+    패널들의 쿼리를 데이터소스별로 묶어 /api/ds/query 요청 몇 개로 합치고, 요청들은 동시에 실행합니다.
+    서버 측 표현식($A 등으로 다른 쿼리를 참조)이 있는 패널은 get_panel_data처럼 패널 단위로 따로 요청합니다.
+    
+    Args:
+        dashboard_uid: 대시보드 UID
+        panel_ids: 패널 ID 목록 (생략하면 쿼리가 있는 모든 패널)
+        time_range: 시간 범위 (딕셔너리 형태: {"from": "now-6h", "to": "now"} 등)
+        mode: 결과 형태 ("downsample": 시계열을 max_points개로 줄이고 통계 포함, "stats": 통계만, "raw": 원본 전체)
+        max_points: downsample 모드에서 시계열마다 남길 최대 점 수
+        
+    Returns:
+        Dict[str, Any]: {"panels": {패널 ID: {"title": ..., "results": {refId: 결과}}}, "errors": {패널 ID: 오류}}
+    """
+    logger.info(f"get_dashboard_data 도구 호출: dashboard_uid={dashboard_uid}, panel_ids={panel_ids}, time_range={time_range}, mode={mode}")
+    
+    mode = mode or PANEL_DATA_MODE
+    if mode not in SUMMARY_MODES:
+        return {"error": f"지원하지 않는 mode입니다: {mode} (가능한 값: {', '.join(SUMMARY_MODES)})"}
+    
+    # 대시보드 정보 가져오기
+    dashboard = await get_dashboard(dashboard_uid)
+    
+    if "error" in dashboard:
+        return {"error": dashboard.get("error")}
+    
+    index = panel_index_for(dashboard_uid, dashboard)
+    if not panel_ids:
+        panel_ids = [panel_id for panel_id, panel in index.panels.items() if panel.get("targets")]
+    
+    panels: Dict[str, Dict[str, Any]] = {}
+    errors: Dict[str, str] = {}
+    # 데이터소스별 쿼리 목록, 병합된 refId -> (패널 ID, 원래 refId)
+    groups: Dict[str, List[Dict[str, Any]]] = {}
+    ref_map: Dict[str, tuple] = {}
+    # 표현식이 있는 패널: (쿼리 목록, refId -> (패널 ID, refId))
+    standalone: List[tuple] = []
+    
+    for panel_id in panel_ids:
+        panel = index.panels.get(panel_id)
+        if not panel:
+            errors[str(panel_id)] = f"패널 ID {panel_id}를 찾을 수 없습니다"
+            continue
+        
+        targets = panel.get("targets", [])
+        if not targets:
+            errors[str(panel_id)] = "패널에 데이터 쿼리가 없습니다"
+            continue
+        
+        panels[str(panel_id)] = {"title": panel.get("title"), "results": {}}
+        if any(_is_expression(target) for target in targets):
+            # 표현식은 같은 요청 안의 refId를 참조하므로 refId를 바꾸거나 다른 패널과 섞지 않음
+            queries = [
+                dict(target, datasource=panel.get("datasource")) if "datasource" not in target and panel.get("datasource") is not None else target
+                for target in targets
+            ]
+            refs = {query.get("refId", "A"): (str(panel_id), query.get("refId", "A")) for query in queries}
+            standalone.append((queries, refs))
+            continue
+        for target in targets:
+            # 캐시된 패널 정의를 건드리지 않도록 복사한 뒤 refId를 패널별로 고유하게 변경
+            original_ref_id = target.get("refId", "A")
+            merged_ref_id = f"p{panel_id}_{original_ref_id}"
+            query = dict(target, refId=merged_ref_id)
+            if "datasource" not in query and panel.get("datasource") is not None:
+                query["datasource"] = panel.get("datasource")
+            groups.setdefault(_datasource_group_key(query.get("datasource")), []).append(query)
+            ref_map[merged_ref_id] = (str(panel_id), original_ref_id)
+    
+    # 데이터소스별로 최대 PANEL_QUERY_BATCH_SIZE개씩 묶어 동시에 요청
+    batches = [
+        (queries[i:i + PANEL_QUERY_BATCH_SIZE], ref_map)
+        for queries in groups.values()
+        for i in range(0, len(queries), PANEL_QUERY_BATCH_SIZE)
+    ] + standalone
+    responses = await asyncio.gather(*(query_datasource(batch, time_range or {}) for batch, _ in batches))
+    
+    for (batch, refs), response in zip(batches, responses):
+        if "error" in response:
+            for query in batch:
+                panel_key, _ = refs[query.get("refId", "A")]
+                errors[panel_key] = response["error"]
+            continue
+        for merged_ref_id, result in response.get("results", {}).items():
+            if merged_ref_id not in refs:
+                continue
+            panel_key, original_ref_id = refs[merged_ref_id]
+            panels[panel_key]["results"][original_ref_id] = summarize_results(
+                result, mode, max_points, PANEL_DATA_DOWNSAMPLE_METHOD
+            )
+    
+    for panel_key in errors:
+        panels.pop(panel_key, None)
+    
+    return {"panels": panels, "errors": errors}
+
+# 렌더링 캐시
+
+RENDER_OUTPUTS = ("url", "image", "base64")
+
+render_cache = TTLCache(maxsize=RENDER_CACHE_SIZE, ttl=RENDER_CACHE_TTL, max_bytes=RENDER_CACHE_MAX_BYTES)
+_render_inflight: Dict[str, asyncio.Future] = {}
+
+def _quantize_time(value: str) -> str:
+    """캐시 키용으로 시간 값을 RENDER_TIME_QUANTUM 단위로 맞춥니다.
+
+    epoch ms 값은 구간 시작으로 내리고, "now-1h" 같은 상대 시간은 현재 구간 번호를 붙여
+    같은 구간 안의 반복 요청이 같은 키를 쓰도록 합니다.
+    """
+    quantum_ms = max(RENDER_TIME_QUANTUM, 1) * 1000
+    if value.isdigit():
+        return str(int(value) // quantum_ms * quantum_ms)
+    return f"{value}@{int(time.time() * 1000) // quantum_ms}"
+
+def _render_handle(*key_parts: Any) -> str:
+    """렌더링 캐시 키로 쓰는 짧은 핸들을 만듭니다."""
+    return hashlib.sha256(repr(key_parts).encode("utf-8")).hexdigest()[:24]
+
+async def _render(path: str, params: Dict[str, Any], handle: str) -> Optional[bytes]:
+    """렌더링 결과를 캐시에서 찾거나 Grafana에 요청합니다.
+
+    같은 핸들에 대한 동시 요청은 Grafana 렌더링 한 번을 공유합니다. 실패하면 None을 반환합니다.
+    """
+    cached = render_cache.get(handle)
+    if cached is not None:
+        return cached
+    
+    inflight = _render_inflight.get(handle)
+    if inflight is not None:
+        return await asyncio.shield(inflight)
+    
+    future = asyncio.get_running_loop().create_future()
+    _render_inflight[handle] = future
+    png = None
+    try:
+        # Grafana에 HTTP 요청
+        logger.info(f"Grafana 렌더링 요청 전송: {path}")
+        response = await grafana_request("GET", path, timeout=GRAFANA_RENDER_TIMEOUT, params=params)
+        
+        # 응답 확인
+        if response.status_code == 200:
+            png = response.content
+            render_cache.set(handle, png, size=len(png))
+        else:
+            logger.error(f"렌더링 실패: HTTP {response.status_code}, {response.text}")
+    
+    except Exception as e:
+        logger.error(f"렌더링 오류: {str(e)}")
+    
+    finally:
+        future.set_result(png)
+        _render_inflight.pop(handle, None)
+    
+    return png
+
+def _render_result(png: Optional[bytes], handle: str, output: str) -> Union[Dict[str, Any], Image, str]:
+    """렌더링 결과를 요청한 전달 방식으로 변환합니다."""
+    if output == "base64":
+        # PNG 데이터를 Base64로 인코딩
+        return base64.b64encode(png).decode('utf-8') if png is not None else ""
+    
+    if png is None:
+        return {"error": "이미지 렌더링에 실패했습니다"}
+    
+    if output == "image":
+        return Image(data=png, format="png")
+    
+    entry = render_cache.get_entry(handle)
+    expires_in = max(0, int(entry.expires_at - time.monotonic())) if entry is not None else 0
+    return {
+        "handle": handle,
+        "url": f"{MCP_PUBLIC_URL}/renders/{handle}",
+        "content_type": "image/png",
+        "bytes": len(png),
+        "expires_in": expires_in,
+    }
+
+@mcp.custom_route("/renders/{handle}", methods=["GET"])
+async def get_render(request: Request) -> Response:
+    """캐시된 렌더링 이미지를 PNG로 반환합니다. 만료되었으면 404."""
+    entry = render_cache.get_entry(request.path_params["handle"])
+    if entry is None or not entry.is_fresh():
+        return Response(status_code=404)
+    return Response(
+        content=entry.value,
+        media_type="image/png",
+        headers={"Cache-Control": f"private, max-age={max(0, int(entry.expires_at - time.monotonic()))}"},
+    )
+
+# 스크린샷 도구
+
+# 반환 타입에 Image가 포함되어 있어 구조화된 출력 스키마는 만들지 않음
+@mcp.tool(structured_output=False)
+async def render_dashboard(dashboard_uid: str, time_range: Dict[str, str], width: int = 1000, height: int = 500, theme: str = "light", output: Optional[str] = None) -> Union[Dict[str, Any], Image, str]:
     """대시보드 이미지를 렌더링합니다.
     
     Args:
@@ -319,14 +778,19 @@ def render_dashboard(dashboard_uid: str, time_range: Dict[str, str], width: int
         width: 이미지 너비 (픽셀)
         height: 이미지 높이 (픽셀)
         theme: 테마 ("light" 또는 "dark")
+        output: 전달 방식 ("url": 이미지 URL과 핸들, "image": MCP 이미지 콘텐츠, "base64": base64 문자열)
         
     Returns:
-        str: base64로 인코딩된 이미지 데이터
+        Union[Dict[str, Any], Image, str]: 이미지 URL 정보, 이미지 콘텐츠 또는 base64로 인코딩된 이미지 데이터
     """
     logger.info(f"render_dashboard 도구 호출: dashboard_uid={dashboard_uid}, time_range={time_range}")
     
-    # 렌더링 URL 구성
-    url = f"{GRAFANA_URL}/render/d/{dashboard_uid}"
+    output = output or RENDER_OUTPUT
+    if output not in RENDER_OUTPUTS:
+        return {"error": f"지원하지 않는 output입니다: {output} (가능한 값: {', '.join(RENDER_OUTPUTS)})"}
+    
+    # 렌더링 경로 구성
+    path = f"/render/d/{dashboard_uid}"
     
     params = {
         "from": time_range.get("from", "now-1h"),
@@ -336,26 +800,15 @@ def render_dashboard(dashboard_uid: str, time_range: Dict[str, str], width: int
         "theme": theme
     }
     
-    try:
-        # Grafana에 HTTP 요청
-        logger.info(f"Grafana 렌더링 요청 전송: {url}")
-        response = requests.get(url, params=params, headers=get_grafana_headers())
-        
-        # 응답 확인
-        if response.status_code == 200:
-            # PNG 데이터를 Base64로 인코딩
-            png_base64 = base64.b64encode(response.content).decode('utf-8')
-            return png_base64
-        else:
-            logger.error(f"대시보드 렌더링 실패: HTTP {response.status_code}, {response.text}")
-            return ""
-    
-    except Exception as e:
-        logger.error(f"대시보드 렌더링 오류: {str(e)}")
-        return ""
+    handle = _render_handle(
+        dashboard_uid, None, _quantize_time(params["from"]), _quantize_time(params["to"]), width, height, theme
+    )
+    png = await _render(path, params, handle)
+    return _render_result(png, handle, output)
 
-@mcp.tool()
-def render_panel(dashboard_uid: str, panel_id: int, time_range: Dict[str, str], width: int = 500, height: int = 300, theme: str = "light") -> str:
+# 반환 타입에 Image가 포함되어 있어 구조화된 출력 스키마는 만들지 않음
+@mcp.tool(structured_output=False)
+async def render_panel(dashboard_uid: str, panel_id: int, time_range: Dict[str, str], width: int = 500, height: int = 300, theme: str = "light", output: Optional[str] = None) -> Union[Dict[str, Any], Image, str]:
     """패널 이미지를 렌더링합니다.
     
     Args:
@@ -365,14 +818,19 @@ def render_panel(dashboard_uid: str, panel_id: int, time_range: Dict[str, str],
         width: 이미지 너비 (픽셀)
         height: 이미지 높이 (픽셀)
         theme: 테마 ("light" 또는 "dark")
+        output: 전달 방식 ("url": 이미지 URL과 핸들, "image": MCP 이미지 콘텐츠, "base64": base64 문자열)
         
     Returns:
-        str: base64로 인코딩된 이미지 데이터
+        Union[Dict[str, Any], Image, str]: 이미지 URL 정보, 이미지 콘텐츠 또는 base64로 인코딩된 이미지 데이터
     """
     logger.info(f"render_panel 도구 호출: dashboard_uid={dashboard_uid}, panel_id={panel_id}, time_range={time_range}")
     
-    # 렌더링 URL 구성 (solo 모드로 패널만 렌더링)
-    url = f"{GRAFANA_URL}/render/d-solo/{dashboard_uid}"
+    output = output or RENDER_OUTPUT
+    if output not in RENDER_OUTPUTS:
+        return {"error": f"지원하지 않는 output입니다: {output} (가능한 값: {', '.join(RENDER_OUTPUTS)})"}
+    
+    # 렌더링 경로 구성 (solo 모드로 패널만 렌더링)
+    path = f"/render/d-solo/{dashboard_uid}"
     
     params = {
         "panelId": panel_id,
@@ -383,23 +841,53 @@ def render_panel(dashboard_uid: str, panel_id: int, time_range: Dict[str, str],
         "theme": theme
     }
     
-    try:
-        # Grafana에 HTTP 요청
-        logger.info(f"Grafana 패널 렌더링 요청 전송: {url}")
-        response = requests.get(url, params=params, headers=get_grafana_headers())
-        
-        # 응답 확인
-        if response.status_code == 200:
-            # PNG 데이터를 Base64로 인코딩
-            png_base64 = base64.b64encode(response.content).decode('utf-8')
-            return png_base64
-        else:
-            logger.error(f"패널 렌더링 실패: HTTP {response.status_code}, {response.text}")
-            return ""
+    handle = _render_handle(
+        dashboard_uid, panel_id, _quantize_time(params["from"]), _quantize_time(params["to"]), width, height, theme
+    )
+    png = await _render(path, params, handle)
+    return _render_result(png, handle, output)
+
+# 캐시 상태 도구
+
+@mcp.tool()
+async def get_cache_stats() -> Dict[str, Any]:
+    """대시보드/데이터소스/렌더링 캐시의 hit/miss 통계를 반환합니다.
     
-    except Exception as e:
-        logger.error(f"패널 렌더링 오류: {str(e)}")
-        return ""
+    Returns:
+        Dict[str, Any]: 캐시별 hits, misses, hit_rate, revalidations, evictions, entries
+    """
+    logger.info("get_cache_stats 도구 호출")
+    
+    return {
+        "dashboards": dashboard_cache.stats(),
+        "datasources": datasource_cache.stats(),
+        "renders": render_cache.stats(),
+    }
+
+# 캐시 통계 메트릭 (스크레이프 시점의 값)
+
+class CacheStatsCollector:
+    """대시보드/데이터소스/렌더링 캐시의 hit/miss와 항목 수를 Prometheus 메트릭으로 내보냅니다."""
+
+    def collect(self):
+        lookups = CounterMetricFamily("grafana_cache_lookups", "캐시 조회 수", labels=["cache", "result"])
+        revalidations = CounterMetricFamily("grafana_cache_revalidations", "만료 후 재검증으로 유지된 항목 수", labels=["cache"])
+        entries = GaugeMetricFamily("grafana_cache_entries", "캐시 항목 수", labels=["cache"])
+        for name, cache in (("dashboards", dashboard_cache), ("datasources", datasource_cache), ("renders", render_cache)):
+            lookups.add_metric([name, "hit"], cache.hits)
+            lookups.add_metric([name, "miss"], cache.misses)
+            revalidations.add_metric([name], cache.revalidations)
+            entries.add_metric([name], len(cache))
+        yield lookups
+        yield revalidations
+        yield entries
+
+REGISTRY.register(CacheStatsCollector())
+
+@mcp.custom_route("/metrics", methods=["GET"])
+async def metrics(request: Request) -> Response:
+    """Prometheus 메트릭: 도구 호출/Grafana 요청 시간, 진행 중인 요청 수, 캐시 hit/miss."""
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
 
 if __name__ == "__main__":
     # HTTP 모드로 서버 실행
@@ -0,0 +1,220 @@
+import math
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+# 추세 판단 시 전체 구간 변화량이 값 크기 대비 이 비율보다 작으면 flat으로 봅니다.
+TREND_FLAT_RATIO = 0.05
+
+SUMMARY_MODES = ("raw", "downsample", "stats")
+
+
+def _to_float_array(values: List[Any]) -> np.ndarray:
+    """Grafana 프레임 값 목록을 float 배열로 바꿉니다. null은 NaN이 됩니다."""
+    try:
+        return np.asarray(values, dtype=float)
+    except (TypeError, ValueError):
+        return np.full(len(values), np.nan)
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets로 남길 점의 인덱스를 고릅니다.
+
+    각 버킷 안의 삼각형 넓이 계산은 NumPy로 벡터화되어 있고, 버킷 수만큼만 반복합니다.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    selected = np.empty(threshold, dtype=int)
+    selected[0] = 0
+    selected[-1] = n - 1
+    prev = 0
+
+    for i in range(threshold - 2):
+        start, end = edges[i], max(edges[i + 1], edges[i] + 1)
+        # 다음 버킷의 평균점 (마지막 버킷이면 마지막 점)
+        next_start, next_end = end, edges[i + 2] if i + 2 < len(edges) else n
+        if next_start >= next_end:
+            avg_x, avg_y = x[-1], y[-1]
+        else:
+            avg_x = x[next_start:next_end].mean()
+            avg_y = y[next_start:next_end].mean()
+
+        bucket_x = x[start:end]
+        bucket_y = y[start:end]
+        area = np.abs(
+            (x[prev] - avg_x) * (bucket_y - y[prev])
+            - (x[prev] - bucket_x) * (avg_y - y[prev])
+        )
+        prev = start + int(np.argmax(area))
+        selected[i + 1] = prev
+
+    return selected
+
+
+def _reshape_buckets(values: np.ndarray, bucket_size: int) -> np.ndarray:
+    """배열을 NaN으로 채워 (버킷 수, 버킷 크기) 모양으로 바꿉니다."""
+    n_buckets = math.ceil(len(values) / bucket_size)
+    padded = np.full(n_buckets * bucket_size, np.nan)
+    padded[:len(values)] = values
+    return padded.reshape(n_buckets, bucket_size)
+
+
+def bucket_downsample(x: np.ndarray, ys: List[np.ndarray], threshold: int, method: str = "avg"):
+    """버킷 단위로 값을 줄입니다. 여러 값 필드가 같은 시간 축을 공유할 때 사용합니다.
+
+    avg는 버킷마다 평균 한 점을, minmax는 버킷마다 최소/최대 두 점(시간순)을 남깁니다.
+
+    Returns:
+        (x, ys): 줄어든 시간 축과 값 필드 목록
+    """
+    n = len(x)
+    points_per_bucket = 2 if method == "minmax" else 1
+    if n <= threshold or threshold < points_per_bucket:
+        return x, ys
+
+    bucket_size = math.ceil(n / (threshold // points_per_bucket))
+    x2 = _reshape_buckets(x, bucket_size)
+
+    if method == "minmax":
+        # 첫 번째 값 필드를 기준으로 최소/최대 위치를 고르고 다른 필드도 같은 위치의 값을 사용
+        y2 = _reshape_buckets(ys[0], bucket_size)
+        valid = ~np.isnan(y2)
+        has_value = valid.any(axis=1)
+        idx_min = np.where(valid, y2, np.inf).argmin(axis=1)
+        idx_max = np.where(valid, y2, -np.inf).argmax(axis=1)
+        pair = np.sort(np.stack([idx_min, idx_max], axis=1), axis=1)
+        flat = (pair + (np.arange(len(x2)) * bucket_size)[:, None])[has_value].ravel()
+        flat = flat[flat < n]
+        return x[flat], [y[flat] for y in ys]
+
+    counts = [(~np.isnan(_reshape_buckets(y, bucket_size))).sum(axis=1) for y in ys]
+    sums = [np.nansum(_reshape_buckets(y, bucket_size), axis=1) for y in ys]
+    new_ys = [
+        np.where(count > 0, total / np.maximum(count, 1), np.nan)
+        for total, count in zip(sums, counts)
+    ]
+    return x2[:, 0], new_ys
+
+
+def series_stats(x: np.ndarray, y: np.ndarray) -> Dict[str, Any]:
+    """시계열 하나의 요약 통계(min, max, mean, p95, last, trend)를 계산합니다."""
+    mask = ~np.isnan(y)
+    if not mask.any():
+        return {"count": 0}
+
+    xv, yv = x[mask], y[mask]
+    mean = float(yv.mean())
+    stats: Dict[str, Any] = {
+        "count": int(mask.sum()),
+        "min": float(yv.min()),
+        "max": float(yv.max()),
+        "mean": mean,
+        "p95": float(np.percentile(yv, 95)),
+        "last": float(yv[-1]),
+    }
+
+    if len(yv) >= 2 and xv[-1] != xv[0]:
+        # 시간 축은 epoch ms이므로 시간(hour) 단위 기울기로 환산
+        hours = (xv - xv[0]) / 3_600_000.0
+        slope = float(np.polyfit(hours, yv, 1)[0])
+        change = slope * hours[-1]
+        scale = max(abs(mean), float(np.abs(yv).max()), 1e-12)
+        if abs(change) < scale * TREND_FLAT_RATIO:
+            direction = "flat"
+        else:
+            direction = "up" if change > 0 else "down"
+        stats["trend"] = direction
+        stats["slope_per_hour"] = slope
+    else:
+        stats["trend"] = "flat"
+
+    return stats
+
+
+def _field_label(field: Dict[str, Any]) -> str:
+    """필드 표시 이름을 만듭니다 (displayName > name{labels})."""
+    config = field.get("config") or {}
+    if config.get("displayNameFromDS") or config.get("displayName"):
+        return config.get("displayNameFromDS") or config.get("displayName")
+    labels = field.get("labels") or {}
+    name = field.get("name", "")
+    if labels:
+        return name + "{" + ",".join(f"{k}={v}" for k, v in sorted(labels.items())) + "}"
+    return name
+
+
+def summarize_frame(frame: Dict[str, Any], mode: str, max_points: int, method: str = "lttb") -> Dict[str, Any]:
+    """데이터 프레임 하나를 다운샘플링하거나 통계로 요약합니다.
+
+    시간 필드가 없는 프레임(테이블, 로그 등)은 값 목록만 max_points로 잘라 반환합니다.
+    """
+    schema = frame.get("schema", {})
+    fields = schema.get("fields", [])
+    values = frame.get("data", {}).get("values", [])
+    if not fields or not values:
+        return frame
+
+    time_idx = next((i for i, f in enumerate(fields) if f.get("type") == "time"), None)
+    number_idx = [i for i, f in enumerate(fields) if f.get("type") == "number" and i < len(values)]
+    total_points = len(values[0]) if values else 0
+
+    if time_idx is None or not number_idx:
+        if mode == "stats":
+            return {"schema": schema, "points": total_points}
+        return {"schema": schema, "data": {"values": [column[:max_points] for column in values]},
+                "points": total_points, "truncated": total_points > max_points}
+
+    x = _to_float_array(values[time_idx])
+    ys = [_to_float_array(values[i]) for i in number_idx]
+    stats = {_field_label(fields[i]): series_stats(x, y) for i, y in zip(number_idx, ys)}
+
+    if mode == "stats":
+        return {"schema": schema, "points": total_points, "stats": stats}
+
+    if total_points > max_points:
+        if method == "lttb" and len(ys) == 1:
+            mask = ~np.isnan(ys[0])
+            keep = np.flatnonzero(mask)[lttb_indices(x[mask], ys[0][mask], max_points)]
+            x, ys = x[keep], [ys[0][keep]]
+        else:
+            x, ys = bucket_downsample(x, ys, max_points, "minmax" if method == "minmax" else "avg")
+
+    new_values: List[Optional[List[Any]]] = [None] * len(values)
+    new_values[time_idx] = x.astype(np.int64).tolist()
+    for i, y in zip(number_idx, ys):
+        new_values[i] = [None if math.isnan(v) else v for v in y.tolist()]
+    # 시간/숫자가 아닌 필드는 남은 점 수에 맞출 수 없으므로 비워 둡니다.
+    new_values = [v if v is not None else [] for v in new_values]
+
+    return {
+        "schema": schema,
+        "data": {"values": new_values},
+        "points": total_points,
+        "downsampled_points": len(x),
+        "stats": stats,
+    }
+
+
+def summarize_query_response(response: Dict[str, Any], mode: str, max_points: int,
+                             method: str = "lttb") -> Dict[str, Any]:
+    """/api/ds/query 응답의 모든 프레임을 요약합니다. mode가 raw면 그대로 반환합니다."""
+    if mode == "raw" or "results" not in response:
+        return response
+    return {
+        "results": {
+            ref_id: summarize_results(result, mode, max_points, method)
+            for ref_id, result in response.get("results", {}).items()
+        }
+    }
+
+
+def summarize_results(result: Dict[str, Any], mode: str, max_points: int, method: str = "lttb") -> Dict[str, Any]:
+    """refId 하나의 결과(frames 포함)를 요약합니다."""
+    if mode == "raw":
+        return result
+    summarized = {k: v for k, v in result.items() if k != "frames"}
+    summarized["frames"] = [summarize_frame(frame, mode, max_points, method) for frame in result.get("frames", [])]
+    return summarized
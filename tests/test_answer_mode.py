@@ -0,0 +1,41 @@
+import asyncio
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.graph import END
+from langgraph_supervisor import create_supervisor
+
+from app.graph.instance import _end_on_agent_answers
+from app.graph.llm import FakeChatModel
+from app.graph.server_info_agent import make_server_info_agent
+
+
+def _supervisor(passthrough: bool):
+    agent = make_server_info_agent(FakeChatModel(response="server info"))
+    model = FakeChatModel(response="restated", tool_calls=[{"name": "transfer_to_server_info_agent"}])
+    builder = create_supervisor(agents=[agent], model=model, add_handoff_back_messages=not passthrough)
+    if passthrough:
+        _end_on_agent_answers(builder, [agent])
+    return builder
+
+
+def test_passthrough_ends_the_run_at_the_agent():
+    edges = {(edge.source, edge.target) for edge in _supervisor(passthrough=True).compile().get_graph().edges}
+
+    assert ("server_info_agent", END) in edges
+    assert ("server_info_agent", "supervisor") not in edges
+
+
+def test_supervisor_mode_keeps_the_edge_back_to_the_supervisor():
+    # The edge passthrough replaces; if a release stops adding it, passthrough needs updating.
+    edges = {(edge.source, edge.target) for edge in _supervisor(passthrough=False).compile().get_graph().edges}
+
+    assert ("server_info_agent", "supervisor") in edges
+
+
+def test_passthrough_answer_is_the_agents_message():
+    graph = _supervisor(passthrough=True).compile()
+
+    result = asyncio.run(graph.ainvoke({"messages": [HumanMessage(content="server info?")]}))
+
+    answers = [m for m in result["messages"] if isinstance(m, AIMessage) and m.content]
+    assert [(m.name, m.content) for m in answers] == [("server_info_agent", "server info")]
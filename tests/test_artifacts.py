@@ -0,0 +1,24 @@
+import os
+import time
+
+from app.graph.artifacts import ArtifactStore
+
+
+def test_artifact_written_by_one_worker_is_served_by_another(tmp_path):
+    writer = ArtifactStore(max_bytes=1 << 20, ttl=60, directory=str(tmp_path))
+    reader = ArtifactStore(max_bytes=1 << 20, ttl=60, directory=str(tmp_path))
+
+    image = writer.put(b"\x89PNG\n...", "image/png", 9)
+    compacted = writer.put([{"type": "text", "text": "panels"}], "application/json", 30)
+
+    assert reader.get(image.id).content == b"\x89PNG\n..."
+    assert reader.get(image.id).content_type == "image/png"
+    assert reader.get(compacted.id).content == b'[{"type": "text", "text": "panels"}]'
+    assert reader.get("../" + image.id) is None
+
+
+def test_shared_artifacts_expire_with_the_ttl(tmp_path):
+    artifact = ArtifactStore(ttl=60, directory=str(tmp_path)).put("text", "text/plain", 4)
+    os.utime(tmp_path / artifact.id, (time.time() - 120, time.time() - 120))
+
+    assert ArtifactStore(ttl=60, directory=str(tmp_path)).get(artifact.id) is None
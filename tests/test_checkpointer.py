@@ -0,0 +1,36 @@
+import asyncio
+
+from langchain_core.messages import AIMessage
+from langgraph.graph import END, START, MessagesState, StateGraph
+
+from app.graph.checkpointer import LRUMemorySaver, prune_thread
+
+
+def _echo_graph(checkpointer):
+    def answer(state: MessagesState):
+        return {"messages": [AIMessage(content=f"answer {len(state['messages'])}")]}
+
+    builder = StateGraph(MessagesState)
+    builder.add_node("answer", answer)
+    builder.add_edge(START, "answer")
+    builder.add_edge("answer", END)
+    return builder.compile(checkpointer=checkpointer)
+
+
+def test_prune_thread_keeps_only_the_latest_checkpoint():
+    async def run():
+        saver = LRUMemorySaver()
+        graph = _echo_graph(saver)
+        config = {"configurable": {"thread_id": "t1"}}
+        for i in range(3):
+            await graph.ainvoke({"messages": [("user", f"question {i}")]}, config)
+            await prune_thread(saver, "t1")
+        checkpoints = [item async for item in saver.alist(config)]
+        state = await graph.aget_state(config)
+        return saver, checkpoints, state
+
+    saver, checkpoints, state = asyncio.run(run())
+
+    assert len(checkpoints) == 1
+    assert [m.content for m in state.values["messages"]][-2:] == ["question 2", "answer 5"]
+    assert saver.stats()["bytes"] == saver._thread_size("t1")
@@ -0,0 +1,73 @@
+import asyncio
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.graph import END, START, MessagesState, StateGraph
+
+from app.graph.artifacts import ArtifactStore
+from app.graph.history import HISTORY_NODE, compact_messages, make_history_hook, make_history_node
+from app.graph.router import SUPERVISOR_NODE, build_top_graph
+
+
+def _tool_turn(question: str, payload: str, call_id: str):
+    return [
+        HumanMessage(content=question),
+        AIMessage(content="", tool_calls=[{"name": "get_dashboard", "args": {}, "id": call_id}]),
+        ToolMessage(content=payload, tool_call_id=call_id, name="get_dashboard"),
+    ]
+
+
+def test_current_turn_tool_result_stays_inline():
+    payload = "x" * 5000
+    messages = _tool_turn("show the dashboard", payload, "call-1")
+
+    kept = compact_messages(messages, 0, 0, 4000, store=ArtifactStore(max_bytes=1 << 20, ttl=60))
+
+    assert kept[-1].content == payload
+
+
+def test_earlier_turn_tool_results_are_compacted():
+    store = ArtifactStore(max_bytes=1 << 20, ttl=60)
+    messages = [
+        *_tool_turn("first", "a" * 5000, "call-1"),
+        AIMessage(content="done"),
+        *_tool_turn("second", "b" * 5000, "call-2"),
+    ]
+
+    kept = compact_messages(messages, 0, 0, 4000, store=store)
+
+    assert kept[2].content.startswith("[tool output of 5000 chars stored as artifact")
+    assert kept[-1].content == "b" * 5000
+
+
+def test_history_hook_sends_the_new_tool_result_to_the_model():
+    payload = "x" * 5000
+    update = make_history_hook(max_messages=0, max_tokens=0, max_tool_payload_chars=4000)(
+        {"messages": _tool_turn("show the dashboard", payload, "call-1")}
+    )
+
+    assert update["llm_input_messages"][-1].content == payload
+
+
+def test_top_graph_compacts_the_checkpointed_thread_before_the_supervisor():
+    def answer(state: MessagesState):
+        return {"messages": [AIMessage(content="answer")]}
+
+    supervisor = StateGraph(MessagesState)
+    supervisor.add_node("answer", answer)
+    supervisor.add_edge(START, "answer")
+    supervisor.add_edge("answer", END)
+    top = build_top_graph(supervisor.compile(), [], history_node=make_history_node(4, 0, 0))
+    graph = top.compile(checkpointer=InMemorySaver())
+    config = {"configurable": {"thread_id": "t1"}}
+
+    async def run():
+        for i in range(3):
+            await graph.ainvoke({"messages": [HumanMessage(content=f"question {i}")]}, config)
+        return await graph.aget_state(config)
+
+    state = asyncio.run(run())
+
+    assert {(START, HISTORY_NODE), (HISTORY_NODE, SUPERVISOR_NODE), (SUPERVISOR_NODE, END)} <= set(top.edges)
+    # Before the third run the history is cut to at most 4 messages starting on a question.
+    assert [m.content for m in state.values["messages"]] == ["question 1", "answer", "question 2", "answer"]
@@ -0,0 +1,51 @@
+import asyncio
+import json
+
+from app.graph.jobs import Job, JobQueue, JobStore
+
+
+def _queue(path):
+    return JobQueue(workers=1, max_queued=10, result_ttl=60, max_retained=10, max_events=10,
+                    store=JobStore(str(path), poll_interval=0.01))
+
+
+def test_another_worker_reads_status_events_and_result(tmp_path):
+    async def run():
+        owner, other = _queue(tmp_path / "jobs.sqlite"), _queue(tmp_path / "jobs.sqlite")
+
+        async def runner(job):
+            await owner.record_event(job, "token", {"content": "hi"})
+            return {"answer": 42}
+
+        owner.start(runner)
+        job = await owner.submit(Job(thread_id="t1", graph_input={}))
+        while not job.done:
+            await asyncio.sleep(0.01)
+        await owner.stop()
+        return job, await other.store.load(job.job_id), await other.store.events(job.job_id, 0)
+
+    job, (info, result), events = asyncio.run(run())
+
+    assert info == job.info() and info["status"] == "succeeded"
+    assert json.loads(result) == {"answer": 42}
+    assert [(seq, event, json.loads(data)) for seq, event, data in events] == [(0, "token", {"content": "hi"})]
+
+
+def test_cancel_requested_by_another_worker_stops_the_job(tmp_path):
+    async def run():
+        owner, other = _queue(tmp_path / "jobs.sqlite"), _queue(tmp_path / "jobs.sqlite")
+        owner.start(lambda job: asyncio.sleep(60))
+        job = await owner.submit(Job(thread_id="t1", graph_input={}))
+        while job.status != "running":
+            await asyncio.sleep(0.01)
+        await other.store.request_cancel(job.job_id)
+        await asyncio.wait_for(_until_done(job), timeout=5)
+        await owner.stop()
+        return (await other.store.load(job.job_id))[0]
+
+    assert asyncio.run(run())["status"] == "cancelled"
+
+
+async def _until_done(job):
+    while not job.done:
+        await asyncio.sleep(0.01)
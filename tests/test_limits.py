@@ -0,0 +1,32 @@
+import asyncio
+
+import pytest
+
+from app.api.v1.limits import AdmissionController, AdmissionRejected
+
+
+def test_zero_wait_timeout_admits_while_slots_are_free_and_then_waits():
+    async def run():
+        admission = AdmissionController(max_in_flight=1, wait_timeout=0)
+        await admission.acquire()
+        waiter = asyncio.create_task(admission.acquire())
+        await asyncio.sleep(0.05)
+        assert not waiter.done()
+        admission.release()
+        await asyncio.wait_for(waiter, 1)
+        return admission.stats()
+
+    stats = asyncio.run(run())
+
+    assert stats["admitted"] == 2
+    assert stats["rejected"] == 0
+
+
+def test_wait_timeout_rejects_when_no_slot_frees_up():
+    async def run():
+        admission = AdmissionController(max_in_flight=1, wait_timeout=0.01)
+        await admission.acquire()
+        await admission.acquire()
+
+    with pytest.raises(AdmissionRejected):
+        asyncio.run(run())